@@ -0,0 +1,243 @@
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import numpy as np
+from necklace_model import Necklace
+from simulated_annealing import Annealer
+from genetic_algorithm import GeneticAlgorithm
+from kernels import HAVE_NUMBA
+
+
+def measure(func, min_time=0.2, repeat=3):
+    """
+    Measures the run time of a function, which is called often enough to run at least min_time seconds
+    :param func: Function without arguments
+    :param min_time: Minimum time of one measurement in seconds
+    :param repeat: Number of measurements, the fastest one is used
+    :return: Seconds per call
+    """
+    # Find the number of calls per measurement
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 2**20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(int(min_time / elapsed) + 1, 10))
+
+    best = elapsed / number
+    for r in range(repeat - 1):
+        start = time.perf_counter()
+        for i in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def peak_memory(func):
+    """
+    Measures the peak memory allocated by Python and NumPy during one call of a function
+    :param func: Function without arguments
+    :return: Peak memory in bytes
+    """
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+# Benchmark cases: name, setup(m, ensemble_size) -> (function, units per call), unit, uses ensemble_size
+
+def _calc_energy(m, size):
+    nkl = Necklace(m, 2)
+    return nkl.calc_energy, 1
+
+
+def _get_energy(m, size):
+    nkl = Necklace(m, 2)
+    return nkl.get_energy, 1
+
+
+def _pair_exchange(m, size):
+    nkl = Necklace(m, 2)
+    return nkl.pair_exchange_random, 1
+
+
+def _crossover(m, size):
+    nkl = Necklace(m, 2)
+    other = Necklace(m, 2)
+    return lambda: nkl.crossover(other), 1
+
+
+def _expand_collapse(m, size):
+    nkl = Necklace(m, 2)
+
+    def func():
+        nkl.expand()
+        nkl.collapse()
+    return func, 1
+
+
+def _annealer_run(vectorized=False, backend=None, steps=100, temps=(5, 0.1), rejection_free=0):
+    def setup(m, size):
+        annealer = Annealer()
+        annealer.set_model(Necklace(m, 2))
+        annealer.set_temps(np.linspace(temps[0], temps[1], steps))
+        return (lambda: annealer.run(ensemble_size=size, vectorized=vectorized, seed=1, backend=backend,
+                                     rejection_free=rejection_free), steps * size)
+    return setup
+
+
+def _annealer_run_adapted(vectorized=False, steps=100):
+    def setup(m, size):
+        annealer = Annealer()
+        annealer.set_model(Necklace(m, 2))
+        return (lambda: annealer.run_adapted(ensemble_size=size, therm_speed=10**-6, start_temp=5, max_steps=steps,
+                                             vectorized=vectorized, seed=1), steps * size)
+    return setup
+
+
+def _ga_run(vectorized=False, expanded=False, gens=5, islands=0):
+    def setup(m, size):
+        ga = GeneticAlgorithm()
+        ga.set_model(Necklace(m, 2))
+        if islands:
+            return lambda: ga.run_islands(population_size=size, num_gens=gens, num_islands=islands,
+                                          migration_interval=2, seed=1, num_workers=islands), gens
+        if expanded:
+            return lambda: ga.run_expanded(population_size=size, num_gens=gens), gens
+        return lambda: ga.run(population_size=size, num_gens=gens, vectorized=vectorized, seed=1), gens
+    return setup
+
+
+BENCHMARKS = [
+    ('necklace.calc_energy', _calc_energy, 'calls/s', False),
+    ('necklace.get_energy', _get_energy, 'calls/s', False),
+    ('necklace.pair_exchange_random', _pair_exchange, 'exchanges/s', False),
+    ('necklace.crossover', _crossover, 'calls/s', False),
+    ('necklace.expand_collapse', _expand_collapse, 'calls/s', False),
+    ('annealer.run', _annealer_run(), 'walker steps/s', True),
+    ('annealer.run_vectorized', _annealer_run(vectorized=True), 'walker steps/s', True),
+    ('annealer.run_multispin', _annealer_run(vectorized='multispin'), 'walker steps/s', True),
+    ('annealer.run_kernel', _annealer_run(backend='numba' if HAVE_NUMBA else 'python'), 'walker steps/s', True),
+    ('annealer.run_cold', _annealer_run(steps=1000, temps=(0.5, 0.1)), 'walker steps/s', True),
+    ('annealer.run_rejection_free', _annealer_run(steps=1000, temps=(0.5, 0.1), rejection_free=1), 'walker steps/s',
+     True),
+    ('annealer.run_adapted', _annealer_run_adapted(), 'walker steps/s', True),
+    ('annealer.run_adapted_vectorized', _annealer_run_adapted(vectorized=True), 'walker steps/s', True),
+    ('annealer.run_adapted_multispin', _annealer_run_adapted(vectorized='multispin'), 'walker steps/s', True),
+    ('ga.run', _ga_run(), 'generations/s', True),
+    ('ga.run_vectorized', _ga_run(vectorized=True), 'generations/s', True),
+    ('ga.run_expanded', _ga_run(expanded=True), 'generations/s', True),
+    ('ga.run_islands', _ga_run(islands=4), 'generations/s', True),
+]
+
+
+def write_results(path, results):
+    """
+    Writes benchmark results together with the environment to a JSON file
+    :param path: Path of the JSON file
+    :param results: Results of run_benchmarks
+    """
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+
+
+def run_benchmarks(sizes=(20, 100, 500), ensemble_sizes=(10, 100), select=None, min_time=0.2, repeat=3, output=None):
+    """
+    Runs all benchmarks for all sizes, a failing benchmark is reported and skipped
+    :param sizes: Numbers of sites m of the necklaces
+    :param ensemble_sizes: Ensemble or population sizes of the optimisers
+    :param select: Only run benchmarks whose name contains this string
+    :param min_time: Minimum time of one measurement in seconds
+    :param repeat: Number of measurements per benchmark
+    :param output: JSON file that is rewritten after every benchmark, None to not write one
+    :return: Dictionary of results by benchmark key
+    """
+    results = {}
+    for name, setup, unit, uses_ensemble in BENCHMARKS:
+        if select is not None and select not in name:
+            continue
+        for m in sizes:
+            for size in (ensemble_sizes if uses_ensemble else (1,)):
+                key = name + '[m=' + str(m) + (',size=' + str(size) if uses_ensemble else '') + ']'
+                random.seed(1)
+                try:
+                    func, units = setup(m, size)
+                    seconds = measure(func, min_time, repeat)
+                    memory = peak_memory(func)
+                except Exception as e:
+                    print('%-55s failed: %s: %s' % (key, type(e).__name__, e))
+                    continue
+                results[key] = {'name': name, 'm': m, 'size': size, 'seconds': seconds,
+                                'throughput': units / seconds, 'unit': unit, 'peak_memory': memory}
+                print('%-55s %14.1f %-15s %10.1f KiB' % (key, units / seconds, unit, memory / 1024))
+                if output is not None:
+                    write_results(output, results)
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Compares results with a baseline
+    :param results: Results of run_benchmarks
+    :param baseline: Results of an earlier run
+    :param threshold: Relative loss of throughput that counts as regression
+    :return: List of (key, baseline throughput, throughput) of all regressions
+    """
+    regressions = []
+    for key, res in results.items():
+        if key not in baseline:
+            continue
+        old = baseline[key]['throughput']
+        if res['throughput'] < (1 - threshold) * old:
+            regressions.append((key, old, res['throughput']))
+    return regressions
+
+
+def environment():
+    """
+    Describes the machine and code version the benchmarks ran on
+    :return: Dictionary
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'numba': HAVE_NUMBA, 'commit': commit,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the necklace model and the optimisers')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 500], help='Numbers of sites m')
+    parser.add_argument('--ensemble-sizes', type=int, nargs='+', default=[10, 100], help='Ensemble sizes')
+    parser.add_argument('--select', default=None, help='Only run benchmarks whose name contains this string')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per measurement')
+    parser.add_argument('--repeat', type=int, default=3, help='Measurements per benchmark')
+    parser.add_argument('--output', default='benchmarks.json', help='JSON file for the results')
+    parser.add_argument('--baseline', default=None, help='JSON file of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative loss of throughput for a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.ensemble_sizes, args.select, args.min_time, args.repeat, args.output)
+    write_results(args.output, results)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for key, old, new in regressions:
+            print('Regression: %s %.1f -> %.1f (%.0f%%)' % (key, old, new, 100 * (new / old - 1)))
+        if len(regressions) > 0:
+            sys.exit(1)
+        print('No regressions against ' + args.baseline)
@@ -0,0 +1,302 @@
+import sys
+import random
+import numpy as np
+from scipy.special import binom
+from necklace_model import lumped_index_table
+
+
+class BitNecklace:
+    """
+    A necklace model for large rings and cliques of any size, stored in NumPy uint64 words.
+    Every site of the ring holds a fully connected graph of n nodes, of which node 0 is connected to
+    node 0 of the neighbouring sites. For n = 2 the energies are the same as for Necklace.
+    The node at position pos is node pos // m of site pos % m, as in Necklace.
+    """
+
+    def __init__(self, m, n=2):
+        """
+        Initializes the necklace model
+        :param m: Number of sites in the ring
+        :param n: Number of nodes in each fully connected graph on the ring
+        """
+        if n * m % 2 != 0:
+            sys.exit('Initialization of BitNecklace: The number of sites is not even. Please give even number of sites!')
+
+        # Store size variables
+        self.__m = m
+        self.__n = n
+        self.__words = (m + 63) // 64
+
+        # Initialize last swapped nodes
+        self.__lastPos1 = 0
+        self.__lastPos2 = 0
+
+        # All energies that the necklace can take
+        if n <= 2 and m % 2 == 0:
+            self.allEnergies = np.arange(2, m * n + 1, 2)
+        elif n <= 2:
+            self.allEnergies = np.arange(2, m * n + 1, 1)
+        else:
+            self.allEnergies = np.arange(2, m + m * (n // 2) * (n - n // 2) + 1)
+
+        # Set dimension of state space and lumped state space
+        self.dims_states = binom(int(m * n), int(m * n / 2))
+        self.dims_lumped = len(self.allEnergies)
+
+        # Direct lookup of the lumped index by energy, other energies go to the overflow bin dims_lumped
+        self._lumped_table = lumped_index_table(self.allEnergies)
+        self.overflow_count = 0
+
+        # One row of words for each node of the sites, row 0 is the ring
+        self._planes = np.zeros([n, self.__words], dtype=np.uint64)
+        self.__energy = 0
+        self.__ones = 0
+
+        # Random generator, the random module unless set_rng is used
+        self._rng = random
+
+        self.shuffle_state()
+
+    def get_size(self):
+        """
+        Returns the size parameters of the necklace
+        :return: Number of sites m, number of nodes per site n
+        """
+        return self.__m, self.__n
+
+    def set_rng(self, rng):
+        """
+        Sets the random generator of the necklace
+        :param rng: Object with a random() method, e.g. a RandomStream or the random module
+        """
+        self._rng = rng
+
+    def shuffle_state(self):
+        """
+        Shuffles the state of the necklace randomly.
+        """
+        size = self.__m * self.__n
+        order = np.argsort([self._rng.random() for i in range(size)])
+        nodes = np.zeros(size, dtype=bool)
+        nodes[order[:int(size / 2)]] = True
+        self.set_nodes(nodes)
+
+    def set_nodes(self, nodes):
+        """
+        Sets the state from a boolean array over all node positions
+        :param nodes: Boolean array of length m*n
+        """
+        padded = np.zeros([self.__n, self.__words * 64], dtype=bool)
+        padded[:, :self.__m] = np.asarray(nodes, dtype=bool).reshape(self.__n, self.__m)
+        packed = np.packbits(padded, axis=1, bitorder='little')
+        self._planes = packed.view('<u8').astype(np.uint64)
+        self.__ones = int(popcount(self._planes).sum())
+        self.__energy = self.calc_energy()
+
+    def get_nodes(self):
+        """
+        Returns the state as boolean array over all node positions
+        :return: Boolean array of length m*n
+        """
+        raw = self._planes.astype('<u8').view(np.uint8)
+        bits = np.unpackbits(raw, axis=1, bitorder='little')[:, :self.__m]
+        return bits.reshape(-1).astype(bool)
+
+    def get_energy(self):
+        """
+        Returns the energy of the current necklace setup
+        :return: Energy of the current necklace setup
+        """
+        return self.__energy
+
+    def calc_energy(self):
+        """
+        Calculates the energy of the current necklace setup from scratch with word-wise popcounts
+        :return: Energy of the current necklace setup
+        """
+        planes = self._planes
+
+        # Connections in the ring, compare every ring node with the next one
+        ring = planes[0]
+        shifted = ring >> np.uint64(1)
+        shifted[:-1] |= ring[1:] << np.uint64(63)
+        last = self.__m - 1
+        shifted[last // 64] |= (ring[0] & np.uint64(1)) << np.uint64(last % 64)
+        ring_energy = int(popcount(ring ^ shifted).sum())
+
+        # Connections inside the fully connected graphs of the sites
+        clique_energy = 0
+        for a in range(1, self.__n):
+            clique_energy += int(popcount(planes[:a] ^ planes[a]).sum())
+
+        # Give a quadratic energy penalty if the number of nodes of both classes is not equal
+        c1 = int(popcount(planes).sum())
+        c1_exp = int(self.__m * self.__n / 2)
+        return ring_energy + clique_energy + (c1 - c1_exp)**2
+
+    def val_at_pos(self, pos):
+        """
+        Returns the value/class (0 or 1) at a given position in the necklace
+        :param pos: Position
+        :return: Class of node at position pos
+        """
+        if pos >= self.__m * self.__n:
+            sys.exit('Position in val_at_pos too big!')
+        return self.__bit(pos // self.__m, pos % self.__m)
+
+    def __bit(self, plane, site):
+        return (int(self._planes[plane, site >> 6]) >> (site & 63)) & 1
+
+    def __flip_delta(self, pos):
+        """
+        Energy change of flipping the class of a single node, evaluated on its neighbourhood only
+        :param pos: Position of the node
+        :return: Energy difference
+        """
+        plane = pos // self.__m
+        site = pos % self.__m
+        b = self.__bit(plane, site)
+
+        de = 0
+        # Ring connections to both neighbours
+        if plane == 0:
+            for nb in ((site - 1) % self.__m, (site + 1) % self.__m):
+                if nb != site:
+                    de += 1 - 2 * (b ^ self.__bit(0, nb))
+        # Connections to the other nodes of the site
+        k = sum(self.__bit(a, site) for a in range(self.__n))
+        k_new = k + 1 - 2 * b
+        de += k_new * (self.__n - k_new) - k * (self.__n - k)
+        # Balance penalty
+        c = self.__ones - int(self.__m * self.__n / 2)
+        de += (c + 1 - 2 * b)**2 - c**2
+        return de
+
+    def change_class(self, pos):
+        """
+        Changes the class of node at position pos
+        :param pos: position
+        """
+        if pos >= self.__m * self.__n:
+            sys.exit('Pos too big in change_class!')
+        plane = pos // self.__m
+        site = pos % self.__m
+        self.__energy += self.__flip_delta(pos)
+        self.__ones += 1 - 2 * self.__bit(plane, site)
+        self._planes[plane, site >> 6] ^= np.uint64(1 << (site & 63))
+
+    def delta_energy(self, pos1, pos2):
+        """
+        Calculates the energy change of exchanging two nodes without performing the exchange
+        :param pos1: position of first node
+        :param pos2: position of second node
+        :return: Energy difference of the exchange
+        """
+        e = self.__energy
+        self.pair_exchange(pos1, pos2)
+        de = self.__energy - e
+        self.pair_exchange(pos1, pos2)
+        return de
+
+    def pair_exchange(self, pos1, pos2):
+        """
+        Exchanges two given positions in the necklace
+        :param pos1: position of first node
+        :param pos2: position of second node
+        """
+        if pos1 == pos2:
+            return
+        self.change_class(pos1)
+        self.change_class(pos2)
+
+    def pair_exchange_random(self):
+        """
+        Exchanges the classes of two random nodes of opposite class in the necklace.
+        Without nodes of both classes there is nothing to exchange and the necklace is not changed.
+        """
+        size = self.__m * self.__n
+        pos1 = int(size * self._rng.random())
+        pos2 = pos1
+        if 0 < self.__ones < size:
+            pos2 = int(size * self._rng.random())
+            val1 = self.val_at_pos(pos1)
+            while pos1 == pos2 or self.val_at_pos(pos2) == val1:
+                pos2 = int(size * self._rng.random())
+
+        self.pair_exchange(pos1, pos2)
+        self.__lastPos1 = pos1
+        self.__lastPos2 = pos2
+
+    def undo_random_exchange(self):
+        """
+        Undoes the previous random exchange
+        """
+        self.pair_exchange(self.__lastPos1, self.__lastPos2)
+
+    def mutate(self):
+        """
+        Mutates a random node of the necklace to the other class
+        """
+        self.change_class(int(self.__m * self.__n * self._rng.random()))
+
+    def get_lumped_index(self, e=0):
+        """
+        Returns the index of the state in the lumped model
+        :param e: Energy of the state, if not set it will be calculated automatically
+        :return: Index in allEnergies, dims_lumped (overflow bin) if the energy is not in allEnergies
+        """
+        if e == 0:
+            e = self.__energy
+        idx = self._lumped_table[min(e, len(self._lumped_table) - 1)]
+        if idx == self.dims_lumped:
+            self.overflow_count += 1
+        return idx
+
+    def get_lumped_indices(self, energies):
+        """
+        Returns the indices of many states in the lumped model
+        :param energies: Array of energies
+        :return: Array of indices, dims_lumped (overflow bin) where the energy is not in allEnergies
+        """
+        idx = self._lumped_table[np.minimum(energies, len(self._lumped_table) - 1)]
+        self.overflow_count += int(np.count_nonzero(idx == self.dims_lumped))
+        return idx
+
+    def get_copy(self):
+        """Returns a copy of it self."""
+        nkl = BitNecklace.__new__(BitNecklace)
+        nkl.__dict__.update(self.__dict__)
+        nkl._planes = self._planes.copy()
+        return nkl
+
+    def print(self):
+        """
+        Prints the current config of the necklace, one line per node of the sites
+        """
+        nodes = self.get_nodes().reshape(self.__n, self.__m)
+        for a in range(self.__n):
+            print(('ring: ' if a == 0 else 'ext' + str(a) + ': ') + ''.join(str(int(x)) for x in nodes[a]))
+
+
+def popcount(words):
+    """
+    Counts the set bits of every uint64 word
+    :param words: Array of uint64 words
+    :return: Array of bit counts
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    raw = np.ascontiguousarray(words).view(np.uint8)
+    counts = _BYTE_COUNTS[raw].reshape(words.shape + (8,))
+    return counts.sum(axis=-1)
+
+
+_BYTE_COUNTS = np.array([bin(x).count('1') for x in range(256)], dtype=np.uint8)
+
+
+if __name__ == '__main__':
+    nkl = BitNecklace(5000, 4)
+    print(nkl.get_energy())
+    for i in range(1000):
+        nkl.pair_exchange_random()
+    print(nkl.get_energy(), nkl.calc_energy())
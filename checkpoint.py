@@ -0,0 +1,102 @@
+import io
+import os
+import pickle
+import random
+import threading
+import time
+
+
+class Checkpointer:
+    """
+    A class for writing the state of a long run to a file at regular time intervals.
+    The state is pickled in the calling thread and written to disk in a background thread,
+    so the run only pays for the snapshot. The file is replaced atomically.
+    """
+
+    def __init__(self, path, interval=60):
+        """
+        Initializes the checkpointer
+        :param path: Path of the checkpoint file
+        :param interval: Minimum number of seconds between two checkpoints
+        """
+        self.path = path
+        self.interval = interval
+        self.__last = time.monotonic()
+        self.__thread = None
+
+    def due(self):
+        """
+        Checks if the next checkpoint should be written
+        :return: True if at least interval seconds passed since the last checkpoint
+        """
+        return time.monotonic() - self.__last >= self.interval
+
+    def save(self, state):
+        """
+        Writes a checkpoint in the background, the state of the random module is added automatically
+        :param state: Dictionary with the state of the run
+        """
+        state = dict(state)
+        state['random_state'] = random.getstate()
+        data = dumps(state)
+        self.wait()
+        self.__thread = threading.Thread(target=_write, args=(self.path, data), daemon=True)
+        self.__thread.start()
+        self.__last = time.monotonic()
+
+    def wait(self):
+        """
+        Waits until the last checkpoint is written
+        """
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+
+class _Pickler(pickle.Pickler):
+    # Walkers without an own stream refer to the random module, which is stored by reference
+    def persistent_id(self, obj):
+        if obj is random:
+            return 'random'
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid == 'random':
+            return random
+        raise pickle.UnpicklingError('Unknown persistent id ' + str(pid))
+
+
+def dumps(state):
+    """
+    Serializes the state of a run
+    :param state: Dictionary with the state of the run
+    :return: Bytes
+    """
+    buffer = io.BytesIO()
+    _Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(state)
+    return buffer.getvalue()
+
+
+def load_checkpoint(path, restore_random=True):
+    """
+    Loads a checkpoint written by Checkpointer
+    :param path: Path of the checkpoint file
+    :param restore_random: Set the state of the random module to the one of the checkpoint
+    :return: Dictionary with the state of the run
+    """
+    with open(path, 'rb') as f:
+        state = _Unpickler(f).load()
+    if restore_random:
+        random.setstate(state['random_state'])
+    return state
+
+
+def _write(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
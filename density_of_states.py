@@ -0,0 +1,139 @@
+import os
+import json
+import numpy as np
+from scipy.special import comb, logsumexp
+
+# Directory of the on-disk cache of exact degeneracies
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dos_cache')
+
+# In-process cache of energy histograms, keyed by (m, n)
+_histograms = {}
+
+
+def energy_histogram(m, n=2, use_disk=True):
+    """
+    Counts exactly how many balanced states of a necklace have each energy.
+    The ring is traversed site by site with a transfer matrix over (first ring node, current ring node,
+    number of class 1 nodes). The counts for all energies are packed into one Python integer, where the
+    count of energy e sits at bit e*B, so that adding an energy is a shift.
+    :param m: Number of sites in the ring
+    :param n: Number of nodes in each fully connected graph on the ring
+    :param use_disk: Read and write the on-disk cache
+    :return: Array of energies, array of counts as Python integers
+    """
+    key = (m, n)
+    if key in _histograms:
+        return _histograms[key]
+
+    path = os.path.join(CACHE_DIR, 'dos_m' + str(m) + '_n' + str(n) + '.json')
+    if use_disk and os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        result = np.array(data['energies']), np.array([int(x) for x in data['counts']], dtype=object)
+        _histograms[key] = result
+        return result
+
+    size = m * n
+    bits = size + 1
+    # Ways to put k nodes of a site in class 1 if the ring node has class r, and their energy
+    site_terms = []
+    for r in range(2):
+        for k in range(r, r + n):
+            ways = int(comb(n - 1, k - r, exact=True))
+            if ways > 0:
+                site_terms.append((r, k, ways, k * (n - k)))
+
+    # dp[r0][r] holds the packed energy counts for each number of class 1 nodes
+    dp = [[np.zeros(size + 1, dtype=object) for r in range(2)] for r0 in range(2)]
+    for r, k, ways, e in site_terms:
+        dp[r][r][k] += ways << (bits * e)
+    for site in range(1, m):
+        new = [[np.zeros(size + 1, dtype=object) for r in range(2)] for r0 in range(2)]
+        for r0 in range(2):
+            for rp in range(2):
+                old = dp[r0][rp]
+                for r, k, ways, e in site_terms:
+                    shift = bits * (e + (r != rp))
+                    new[r0][r][k:] += (old[:size + 1 - k] * ways) << shift
+        dp = new
+
+    # Close the ring and keep the balanced states
+    packed = 0
+    for r0 in range(2):
+        for r in range(2):
+            packed += dp[r0][r][size // 2] << (bits * (r != r0))
+
+    # Unpack the counts of all energies
+    energies = []
+    counts = []
+    e = 0
+    mask = (1 << bits) - 1
+    while packed > 0:
+        c = packed & mask
+        if c > 0:
+            energies.append(e)
+            counts.append(c)
+        packed >>= bits
+        e += 1
+    result = np.array(energies), np.array(counts, dtype=object)
+
+    _histograms[key] = result
+    if use_disk:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'m': m, 'n': n, 'energies': energies, 'counts': [str(c) for c in counts]}, f)
+    return result
+
+
+def exact_degeneracies(model, normalized=False):
+    """
+    Returns the exact degeneracies of all energies of a necklace model
+    :param model: Necklace or BitNecklace, for Necklace the physical model with n = 2 is used
+    :param normalized: If True, the degeneracies are divided by the number of states (dims_states)
+    :return: Degeneracies aligned with model.allEnergies, as Python integers unless normalized
+    """
+    m, n = model.get_size()
+    energies, counts = energy_histogram(m, n)
+    lookup = dict(zip(energies.tolist(), counts.tolist()))
+    degs = np.array([lookup.get(int(e), 0) for e in model.allEnergies], dtype=object)
+    if normalized:
+        total = sum(counts.tolist())
+        return np.array([d / total for d in degs], dtype=float)
+    return degs
+
+
+def log_degeneracies(degs):
+    """
+    Natural logarithm of degeneracies given as (big) integers, -inf where the degeneracy is zero
+    :param degs: Degeneracies
+    :return: Array of logarithms
+    """
+    out = np.full(len(degs), -np.inf)
+    for i, d in enumerate(degs):
+        d = int(d)
+        if d > 0:
+            shift = max(d.bit_length() - 1000, 0)
+            out[i] = np.log(float(d >> shift)) + shift * np.log(2)
+    return out
+
+
+def thermal_quantities(T, energies, degs):
+    """
+    Calculates thermodynamic quantities of the lumped model from the degeneracies
+    :param T: Temperature
+    :param energies: Energies of the lumped states
+    :param degs: Degeneracies of the lumped states
+    :return: Free energy, mean energy, heat capacity
+    """
+    log_w = log_degeneracies(degs) - np.asarray(energies) / T
+    log_z = logsumexp(log_w)
+    p = np.exp(log_w - log_z)
+    e_mean = np.sum(p * energies)
+    heat_cap = np.sum(p * (energies - e_mean)**2) / T**2
+    return -T * log_z, e_mean, heat_cap
+
+
+if __name__ == '__main__':
+    energies, counts = energy_histogram(20, 2)
+    for e, c in zip(energies, counts):
+        print(e, c)
@@ -0,0 +1,225 @@
+import os
+import sys
+import time
+import numpy as np
+from math import comb
+from concurrent.futures import ProcessPoolExecutor
+from kernels import njit, HAVE_NUMBA
+from density_of_states import energy_histogram, thermal_quantities
+
+
+def revolving_door_rank(c):
+    """
+    Returns the rank of a combination in revolving-door order (Knuth, TAOCP 7.2.1.3)
+    :param c: Sorted positions c_1 < ... < c_t of the combination
+    :return: Rank
+    """
+    t = len(c)
+    rank = 0
+    for j in range(t, 0, -1):
+        rank += (-1)**(t - j) * comb(c[j - 1] + 1, j)
+    return rank - t % 2
+
+
+def revolving_door_unrank(rank, t):
+    """
+    Returns the combination of a rank in revolving-door order, the inverse of revolving_door_rank
+    :param rank: Rank
+    :param t: Number of positions in the combination
+    :return: Sorted positions c_1 < ... < c_t
+    """
+    c = [0] * t
+    for j in range(t, 0, -1):
+        # c_j is the largest position with comb(c_j, j) <= rank
+        x = j - 1
+        while comb(x + 1, j) <= rank:
+            x += 1
+        c[j - 1] = x
+        rank = comb(x + 1, j) - 1 - rank
+    return c
+
+
+@njit(cache=True)
+def _revolving_door_next(c, t):
+    """
+    Steps to the next combination in revolving-door order (Algorithm R), which exchanges one position
+    :param c: Positions c_1..c_t followed by the number of positions as sentinel, changed in place
+    :param t: Number of positions in the combination
+    :return: Removed position, added position, -1 and -1 after the last combination
+    """
+    if t % 2 == 1:
+        if c[0] + 1 < c[1]:
+            c[0] += 1
+            return c[0] - 1, c[0]
+        increase = False
+    else:
+        if c[0] > 0:
+            c[0] -= 1
+            return c[0] + 1, c[0]
+        increase = True
+    j = 2
+    while j <= t:
+        if not increase:
+            # Try to decrease c_j, here c_j = c_{j-1} + 1
+            if c[j - 1] >= j:
+                removed = c[j - 1]
+                c[j - 1] = c[j - 2]
+                c[j - 2] = j - 2
+                return removed, j - 2
+        else:
+            # Try to increase c_j, here c_{j-1} = j - 2
+            if c[j - 1] + 1 < c[j]:
+                c[j - 2] = c[j - 1]
+                c[j - 1] += 1
+                return j - 2, c[j - 1]
+        j += 1
+        increase = not increase
+    return -1, -1
+
+
+@njit(cache=True)
+def _enumerate_kernel(c, t, x, bits, neighbours, energy, count, hist, ground):
+    """
+    Visits count combinations in revolving-door order and updates the energy with the exchanged pair
+    :param c: First combination with sentinel, changed in place
+    :param t: Number of positions in the combination
+    :param x: Classes of the bits [ring bits, external bits] of the first combination, changed in place
+    :param bits: Bit of every node position
+    :param neighbours: Connected bits of every bit, padded with -1
+    :param energy: Energy of the first combination
+    :param count: Number of combinations
+    :param hist: Counts of all energies, changed in place
+    :param ground: Buffer for the bit masks of the states with lowest energy
+    :return: Lowest energy, number of states with lowest energy
+    """
+    e_min = hist.shape[0]
+    n_ground = 0
+    for i in range(count):
+        hist[energy] += 1
+        if energy < e_min:
+            e_min = energy
+            n_ground = 0
+        if energy == e_min:
+            if n_ground < ground.shape[0]:
+                mask = 0
+                for k in range(t):
+                    mask |= 1 << c[k]
+                ground[n_ground] = mask
+            n_ground += 1
+        if i == count - 1:
+            break
+
+        # Connections between the two exchanged nodes stay unequal, all others change
+        removed, added = _revolving_door_next(c, t)
+        b1 = bits[removed]
+        b2 = bits[added]
+        for b, other in ((b1, b2), (b2, b1)):
+            for nb in neighbours[b]:
+                if nb >= 0 and nb != other:
+                    energy += 1 if x[b] == x[nb] else -1
+        x[b1] = 0
+        x[b2] = 1
+    return e_min, n_ground
+
+
+def _necklace_graph(m, n):
+    """
+    Returns the bit of every node position and the connected bits of every bit, as in Necklace
+    :return: Array of bits, array of neighbours padded with -1
+    """
+    half = int(m * n / 2)
+    pos = np.arange(int(m * n))
+    bits = np.where(pos < half, pos, m + pos - half)
+    neighbours = [[] for b in range(2 * m)]
+    for a, b in [(t, (t + 1) % m) for t in range(m)] + [(t, m + t) for t in range(m)]:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    table = np.full([2 * m, max(len(x) for x in neighbours)], -1, dtype=np.int64)
+    for b, x in enumerate(neighbours):
+        table[b, :len(x)] = x
+    return bits.astype(np.int64), table
+
+
+def enumerate_chunk(m, n, start, count, max_ground_states=1000):
+    """
+    Enumerates count balanced states of a Necklace(m, n) from rank start on in revolving-door order
+    :param m: Number of sites
+    :param n: Number of nodes per site
+    :param start: Rank of the first state
+    :param count: Number of states, at most the number of states from rank start on
+    :param max_ground_states: Maximum number of stored states with lowest energy
+    :return: Energy histogram, lowest energy, bit masks of the stored states with lowest energy,
+             number of states with lowest energy
+    """
+    size = int(m * n)
+    t = size // 2
+    # The kernel must not step past the last combination
+    count = min(count, comb(size, t) - start)
+    bits, neighbours = _necklace_graph(m, n)
+    c = np.array(revolving_door_unrank(start, t) + [size], dtype=np.int64)
+    x = np.zeros(2 * m, dtype=np.int64)
+    x[bits[c[:t]]] = 1
+
+    # Energy of the first state, balanced states have no penalty
+    energy = int(np.sum(x[:, None] != x[np.maximum(neighbours, 0)], where=neighbours >= 0)) // 2
+    hist = np.zeros(2 * m + 1, dtype=np.int64)
+    ground = np.zeros(max_ground_states, dtype=np.int64)
+    e_min, n_ground = _enumerate_kernel(c, t, x, bits, neighbours, energy, count, hist, ground)
+    return hist, e_min, ground[:min(n_ground, max_ground_states)].tolist(), n_ground
+
+
+def enumerate_spectrum(m, n=2, temps=(), workers=1, chunk_size=2**24, max_ground_states=1000):
+    """
+    Enumerates all balanced states of a Necklace(m, n) in revolving-door (Gray code) order, where two
+    successive states differ by one pair exchange. The rank space is split into chunks, which run in a
+    process pool if workers > 1.
+    :param m: Number of sites
+    :param n: Number of nodes per site
+    :param temps: Temperatures for the exact mean energies
+    :param workers: Number of worker processes
+    :param chunk_size: Number of states of a chunk
+    :param max_ground_states: Maximum number of returned ground states
+    :return: Energies, number of states with each energy, ground states as (ring, ext) of Necklace.set_state,
+             exact mean energies at temps
+    """
+    size = int(m * n)
+    if n > 2:
+        sys.exit('enumerate_spectrum: Currently only n < 3 is implemented, as in Necklace')
+    if size % 2 != 0 or size > 62:
+        sys.exit('enumerate_spectrum: m*n has to be even and at most 62')
+    if not HAVE_NUMBA:
+        print('Numba is not installed, the enumeration runs in plain Python')
+    total = comb(size, size // 2)
+    chunks = [(start, min(chunk_size, total - start)) for start in range(0, total, chunk_size)]
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(enumerate_chunk, *zip(*[(m, n, s, k, max_ground_states) for s, k in chunks])))
+    else:
+        results = [enumerate_chunk(m, n, s, k, max_ground_states) for s, k in chunks]
+
+    # Merge the chunks, ground states stay in rank order
+    hist = np.sum([r[0] for r in results], axis=0)
+    e_min = min(r[1] for r in results)
+    masks = [mask for r in results if r[1] == e_min for mask in r[2]][:max_ground_states]
+    half = size // 2
+    ground_states = [(mask & ((1 << half) - 1), mask >> half) for mask in masks]
+
+    energies = np.flatnonzero(hist)
+    counts = hist[energies]
+    mean_energies = np.array([thermal_quantities(T, energies, counts)[1] for T in temps])
+    return energies, counts, ground_states, mean_energies
+
+
+if __name__ == '__main__':
+    # Compare the enumeration with the transfer matrix histogram
+    for m in [8, 12, 16]:
+        start = time.perf_counter()
+        energies, counts, ground_states, mean_energies = enumerate_spectrum(m, 2, temps=[0.5, 1, 5],
+                                                                           workers=os.cpu_count())
+        seconds = time.perf_counter() - start
+        e_ref, c_ref = energy_histogram(m, 2, use_disk=False)
+        same = np.array_equal(energies, e_ref) and np.array_equal(counts, c_ref.astype(np.int64))
+        print('m = %d: %d states in %.2f s, ground energy %d (%d states), mean energies %s, transfer matrix %s'
+              % (m, np.sum(counts), seconds, energies[0], counts[0], np.round(mean_energies, 4),
+                 'identical' if same else 'different'))
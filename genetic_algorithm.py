@@ -1,5 +1,11 @@
-from necklace_model import Necklace
+from necklace_model import Necklace, NecklacePool, int_to_bits, bits_to_int
+from necklace_ensemble import NecklaceEnsemble
+from checkpoint import Checkpointer, load_checkpoint
+from stopping import as_list, reset_all, check_all, Diversity
+from rng import RandomStream
+import sys
 import random
+import multiprocessing
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -9,71 +15,305 @@ class GeneticAlgorithm():
         # Set standard model
         self.__model = Necklace(4, 1)
         population = [self.__model]
+        self.__profiler = None
+        self.__stopping = []
+        self.__stop_reason = None
+        self.__island_traces = None
+
+        # Recycled necklaces of discarded individuals, used for the clones
+        self.__pool = NecklacePool()
 
         # Rates for updating population
 
     def set_model(self, model):
         self.__model = model
 
-    def run(self,population_size=100,num_gens=1,crossover_rate=0.1,mutation_rate=0.1,clone_rate=0.1):
+    def set_profiler(self, profiler):
+        """
+        Sets a profiler that times crossover, mutation and selection, e.g. instrumentation.Profiler
+        :param profiler: Profiler, None to switch profiling off
+        """
+        self.__profiler = profiler
+
+    def set_stopping(self, criteria):
+        """
+        Sets stopping criteria that end run and run_expanded early, e.g. stopping.TargetEnergy or stopping.Diversity.
+        The result arrays then end with the generation in which a criterion stopped the run.
+        :param criteria: StoppingCriterion or list of them, None to always run all generations
+        """
+        self.__stopping = as_list(criteria)
+
+    def get_stop_reason(self):
+        """
+        Returns why the last run stopped early
+        :return: Reason of the stopping criterion, None if all generations were run
+        """
+        return self.__stop_reason
+
+    def get_island_traces(self):
+        """
+        Returns the traces of the single islands of the last run_islands
+        :return: Mean energies and best energies so far, arrays with one row per island
+        """
+        return self.__island_traces
+
+    def __check_stopping(self,gen,population,mean_energy,best_energy):
+        """
+        Checks the stopping criteria after a generation
+        :return: Reason for stopping, None to continue
+        """
+        if not self.__stopping:
+            return None
+        return check_all(self.__stopping,{'step': gen, 'energy': mean_energy, 'best_energy': best_energy,
+                                          'population': population})
+
+    def run(self,population_size=100,num_gens=1,crossover_rate=0.1,mutation_rate=0.1,clone_rate=0.1,
+            vectorized=False,seed=None,checkpoint=None,checkpoint_interval=60):
         """
         Runs the genetic algorithm with given parameters
-        :return:
+        :param vectorized: Store the population in one NecklaceEnsemble and update it in batches
+        :param seed: Seed for the random generator of the vectorized population
+        :param checkpoint: Path of a checkpoint file, the run can be continued with GeneticAlgorithm.resume
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :return: Mean energy, Best energy, truncated if the run stopped early (see get_stop_reason)
         """
         # Create population
-        population = []
-        for k in range(population_size):
-            nkl = self.__model.get_copy()
-            nkl.shuffle_state()
-            population.append(nkl)
+        if vectorized:
+            population = NecklaceEnsemble(self.__model,population_size,rng=np.random.default_rng(seed))
+        else:
+            population = []
+            for k in range(population_size):
+                nkl = self.__model.get_copy()
+                nkl.shuffle_state()
+                population.append(nkl)
 
         energiesArr = np.empty(num_gens)
         energiesVBSFArr = np.empty(num_gens)
 
+        params = {'population_size': population_size, 'num_gens': num_gens, 'crossover_rate': crossover_rate,
+                  'mutation_rate': mutation_rate, 'clone_rate': clone_rate, 'vectorized': vectorized}
+        checkpointer = Checkpointer(checkpoint,checkpoint_interval) if checkpoint is not None else None
+        return self.__evolve(population,0,energiesArr,energiesVBSFArr,params,checkpointer)
+
+    def resume(self,checkpoint,checkpoint_interval=60):
+        """
+        Continues a run of GeneticAlgorithm.run or GeneticAlgorithm.run_expanded from its checkpoint file
+        :param checkpoint: Path of the checkpoint file, new checkpoints are written to the same file
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :return: Mean energy, Best energy
+        """
+        state = load_checkpoint(checkpoint)
+        self.__model = state['model']
+        params = state['params']
+        gen = state['gen']
+
+        energiesArr = np.empty(params['num_gens'])
+        energiesVBSFArr = np.empty(params['num_gens'])
+        energiesArr[:gen] = state['energiesArr']
+        energiesVBSFArr[:gen] = state['energiesVBSFArr']
+
+        checkpointer = Checkpointer(checkpoint,checkpoint_interval)
+        return self.__evolve(state['population'],gen,energiesArr,energiesVBSFArr,params,checkpointer)
+
+    def __evolve(self,population,gen,energiesArr,energiesVBSFArr,params,checkpointer):
+        """
+        Iterates over the generations, starting at generation gen
+        :param params: Parameters of run that are needed for the generations
+        :param checkpointer: Checkpointer, or None if no checkpoints are written
+        :return: Mean energy, Best energy
+        """
+        self.__stop_reason = None
+        reset_all(self.__stopping)
+        end = params['num_gens']
+
         # Iterate over all generations
-        for o in range(num_gens):
-
-            # Crossovers
-            idx_cross1 = random.sample(range(0,population_size),int(crossover_rate/2*population_size))
-            idx_cross2 = random.sample(range(0,population_size),int(crossover_rate/2*population_size))
-            for i,j in zip(idx_cross1,idx_cross2):
-                population[i].crossover(population[j])
-
-            # Mutants
-            idx_mutants = random.sample(range(0,population_size),int(mutation_rate*population_size))
-            for i in idx_mutants:
-                population[i].mutate()
-
-            # Clone the individuals with lowest energy
-            pop_energies = [x.get_energy() for x in population]
-            sort_idx = np.argsort(pop_energies)
-            for i in range(int(clone_rate*population_size)):
-                population.append(population[sort_idx[i]].get_copy())
-                pop_energies.append(population[sort_idx[i]].get_energy())
-
-            # Reduce population size to original one
-            pop_energies = [indiv.get_energy() for indiv in population]
-            sort_idx = np.argsort(pop_energies)
-            new_generation = []
-            sum_energy = 0
-            for i in range(population_size):
-                new_generation.append(population[sort_idx[i]])
-                sum_energy += pop_energies[sort_idx[i]]
-            population = new_generation
+        for o in range(gen,params['num_gens']):
+            # Write a checkpoint before the generation
+            if checkpointer is not None and checkpointer.due():
+                self.__save(checkpointer,population,o,energiesArr,energiesVBSFArr,params)
 
+            if params['vectorized']:
+                population,mean_energy,min_energy = self.__generation_vectorized(population,params)
+            elif params.get('expanded',False):
+                population,mean_energy,min_energy = self.__generation_expanded(population,params)
+            else:
+                population,mean_energy,min_energy = self.__generation(population,params)
 
             # Set energies
-            energiesArr[o] = sum_energy / population_size
-            if o == 0: energiesVBSFArr[o] = np.min(pop_energies)
-            elif energiesVBSFArr[o-1] > np.min(pop_energies): energiesVBSFArr[o] = np.min(pop_energies)
-            else: energiesVBSFArr[o] = energiesVBSFArr[o-1]
+            energiesArr[o] = mean_energy
+            if o == 0: energiesVBSFArr[o] = min_energy
+            else: energiesVBSFArr[o] = min(energiesVBSFArr[o-1],min_energy)
+            if self.__profiler is not None:
+                self.__profiler.count('generations')
+                self.__profiler.tick(o)
+
+            self.__stop_reason = self.__check_stopping(o,population,energiesArr[o],energiesVBSFArr[o])
+            if self.__stop_reason is not None:
+                end = o+1
+                break
+
+        if checkpointer is not None:
+            self.__save(checkpointer,population,end,energiesArr,energiesVBSFArr,params)
+            checkpointer.wait()
+        if self.__profiler is not None:
+            self.__profiler.end_run('GeneticAlgorithm.run_expanded' if params.get('expanded',False)
+                                    else 'GeneticAlgorithm.run')
+
+        return energiesArr[:end], energiesVBSFArr[:end]
+
+    def __save(self,checkpointer,population,gen,energiesArr,energiesVBSFArr,params):
+        """
+        Writes the state of GeneticAlgorithm.run or GeneticAlgorithm.run_expanded to a checkpoint
+        """
+        checkpointer.save({'model': self.__model, 'params': params, 'population': population, 'gen': gen,
+                           'energiesArr': energiesArr[:gen], 'energiesVBSFArr': energiesVBSFArr[:gen]})
+
+    def __generation(self,population,params,rng=random):
+        """
+        Creates the next generation of a population of necklaces
+        :param population: List of necklaces
+        :param params: Parameters of run
+        :param rng: random module or random.Random instance that selects the individuals
+        :return: New population, mean energy, lowest energy
+        """
+        population_size = params['population_size']
+        prof = self.__profiler
+        if prof is not None:
+            t = prof.clock()
+
+        # Crossovers
+        idx_cross1 = rng.sample(range(0,population_size),int(params['crossover_rate']/2*population_size))
+        idx_cross2 = rng.sample(range(0,population_size),int(params['crossover_rate']/2*population_size))
+        for i,j in zip(idx_cross1,idx_cross2):
+            population[i].crossover(population[j])
+        if prof is not None:
+            t = prof.add('crossover',t)
+
+        # Mutants
+        idx_mutants = rng.sample(range(0,population_size),int(params['mutation_rate']*population_size))
+        for i in idx_mutants:
+            population[i].mutate()
+        if prof is not None:
+            t = prof.add('mutation',t)
+
+        # Clone the individuals with lowest energy
+        pop_energies = [x.get_energy() for x in population]
+        sort_idx = np.argsort(pop_energies)
+        for i in range(int(params['clone_rate']*population_size)):
+            population.append(self.__pool.copy(population[sort_idx[i]]))
+            pop_energies.append(population[sort_idx[i]].get_energy())
+
+        # Reduce population size to original one, the discarded individuals go back to the pool
+        pop_energies = [indiv.get_energy() for indiv in population]
+        sort_idx = np.argsort(pop_energies)
+        new_generation = []
+        sum_energy = 0
+        for i in range(population_size):
+            new_generation.append(population[sort_idx[i]])
+            sum_energy += pop_energies[sort_idx[i]]
+        self.__pool.release(population[i] for i in sort_idx[population_size:])
+        if prof is not None:
+            prof.add('selection',t)
+
+        return new_generation, sum_energy / population_size, np.min(pop_energies)
+
+    def __generation_expanded(self,population,params,rng=random):
+        """
+        Creates the next generation of a population of expanded necklaces
+        :param population: List of necklaces
+        :param params: Parameters of run or run_expanded
+        :param rng: random module or random.Random instance that selects the individuals
+        :return: New population, mean energy, lowest energy
+        """
+        population_size = params['population_size']
+        prof = self.__profiler
+        if prof is not None:
+            t = prof.clock()
+
+        # Crossovers
+        idx_cross1 = rng.sample(range(0,population_size),int(params['crossover_rate']/2*population_size))
+        idx_cross2 = rng.sample(range(0,population_size),int(params['crossover_rate']/2*population_size))
+        for i,j in zip(idx_cross1,idx_cross2):
+            population[j] = population[i].crossover_expanded(population[j])
+        if prof is not None:
+            t = prof.add('crossover',t)
+
+        # Mutants
+        idx_mutants = rng.sample(range(0,population_size),int(params['mutation_rate']*population_size))
+        for i in idx_mutants:
+            population[i].mutate_expanded()
+        if prof is not None:
+            t = prof.add('mutation',t)
+
+        # Clone the individuals with lowest energy
+        pop_energies = [x.get_energy() for x in population]
+        sort_idx = np.argsort(pop_energies)
+        for i in range(int(params['clone_rate']*population_size)):
+            population.append(self.__pool.copy(population[sort_idx[i]]))
+            pop_energies.append(population[sort_idx[i]].get_energy())
+
+        # Reduce population size to original one, the discarded individuals go back to the pool
+        pop_energies = [indiv.get_energy() for indiv in population]
+        sort_idx = np.argsort(pop_energies)
+        new_generation = []
+        sum_energy = 0
+        for i in range(population_size):
+            new_generation.append(population[sort_idx[i]])
+            sum_energy += pop_energies[sort_idx[i]]
+        self.__pool.release(population[i] for i in sort_idx[population_size:])
+        if prof is not None:
+            prof.add('selection',t)
+
+        return new_generation, sum_energy / population_size, np.min(pop_energies)
+
+    def __generation_vectorized(self,population,params):
+        """
+        Creates the next generation of a population stored as one boolean node matrix
+        :param population: NecklaceEnsemble
+        :param params: Parameters of run
+        :return: Population, mean energy, lowest energy
+        """
+        population_size = params['population_size']
+        rng = population.rng
 
-        return energiesArr, energiesVBSFArr
+        n_cross = int(params['crossover_rate']/2*population_size)
+        n_mutants = int(params['mutation_rate']*population_size)
+        n_clones = int(params['clone_rate']*population_size)
+        prof = self.__profiler
+        if prof is not None:
+            t = prof.clock()
 
-    def run_expanded(self,population_size=100,num_gens=1,crossover_rate=0.1,mutation_rate=0.1,clone_rate=0.1):
+        # Crossovers between disjoint pairs
+        idx_cross = rng.permutation(population_size)[:2*n_cross]
+        population.crossover(idx_cross[:n_cross],idx_cross[n_cross:])
+        if prof is not None:
+            t = prof.add('crossover',t)
+
+        # Mutants
+        population.mutate(rng.choice(population_size,n_mutants,replace=False))
+        if prof is not None:
+            t = prof.add('mutation',t)
+
+        # Clone the individuals with lowest energy
+        sort_idx = np.argsort(population.energies,kind='stable')[:n_clones]
+        nodes = np.concatenate([population.nodes,population.nodes[sort_idx]])
+        pop_energies = np.concatenate([population.energies,population.energies[sort_idx]])
+
+        # Reduce population size to original one
+        keep = np.argsort(pop_energies,kind='stable')[:population_size]
+        population.set_walkers(nodes[keep],pop_energies[keep])
+        if prof is not None:
+            prof.add('selection',t)
+
+        return population, np.mean(population.energies), np.min(pop_energies)
+
+    def run_expanded(self,population_size=100,num_gens=1,crossover_rate=0.1,mutation_rate=0.1,clone_rate=0.1,
+                     checkpoint=None,checkpoint_interval=60):
         """
         Runs the genetic algorithm with given parameters on the expanded necklace model
-        :return:
+        :param checkpoint: Path of a checkpoint file, the run can be continued with GeneticAlgorithm.resume
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :return: Mean energy, Best energy, truncated if the run stopped early (see get_stop_reason)
         """
         # Create population
         population = []
@@ -86,44 +326,358 @@ class GeneticAlgorithm():
         energiesArr = np.empty(num_gens)
         energiesVBSFArr = np.empty(num_gens)
 
-        # Iterate over all generations
-        for o in range(num_gens):
-
-            # Crossovers
-            idx_cross1 = random.sample(range(0,population_size),int(crossover_rate/2*population_size))
-            idx_cross2 = random.sample(range(0,population_size),int(crossover_rate/2*population_size))
-            for i,j in zip(idx_cross1,idx_cross2):
-                population[j] = population[i].crossover_expanded(population[j])
-
-            # Mutants
-            idx_mutants = random.sample(range(0,population_size),int(mutation_rate*population_size))
-            for i in idx_mutants:
-                population[i].mutate_expanded()
-
-            # Clone the individuals with lowest energy
-            pop_energies = [x.get_energy() for x in population]
-            sort_idx = np.argsort(pop_energies)
-            for i in range(int(clone_rate*population_size)):
-                population.append(population[sort_idx[i]].get_copy())
-                pop_energies.append(population[sort_idx[i]].get_energy())
-
-            # Reduce population size to original one
-            pop_energies = [indiv.get_energy() for indiv in population]
-            sort_idx = np.argsort(pop_energies)
-            new_generation = []
-            sum_energy = 0
-            for i in range(population_size):
-                new_generation.append(population[sort_idx[i]])
-                sum_energy += pop_energies[sort_idx[i]]
-            population = new_generation
+        params = {'population_size': population_size, 'num_gens': num_gens, 'crossover_rate': crossover_rate,
+                  'mutation_rate': mutation_rate, 'clone_rate': clone_rate, 'vectorized': False, 'expanded': True}
+        checkpointer = Checkpointer(checkpoint,checkpoint_interval) if checkpoint is not None else None
+        return self.__evolve(population,0,energiesArr,energiesVBSFArr,params,checkpointer)
 
-            # Set energies
-            energiesArr[o] = sum_energy / population_size
-            if o == 0: energiesVBSFArr[o] = np.min(pop_energies)
-            elif energiesVBSFArr[o-1] > np.min(pop_energies): energiesVBSFArr[o] = np.min(pop_energies)
-            else: energiesVBSFArr[o] = energiesVBSFArr[o-1]
+    def run_islands(self,population_size=100,num_gens=1,crossover_rate=0.1,mutation_rate=0.1,clone_rate=0.1,
+                    num_islands=4,migration_interval=10,migration_size=2,topology='ring',expanded=False,
+                    vectorized=False,seed=None,num_workers=1,checkpoint=None,checkpoint_interval=60):
+        """
+        Runs the genetic algorithm as island model. The population is split into num_islands sub-populations
+        that evolve independently, each with its own random streams. After every migration_interval generations
+        the best individuals of every island replace the worst individuals of its neighbours in the topology.
+        Migrants are sent as packed node bits, as in NecklaceEnsemble.nodes.
+        :param population_size: Size of the whole population, split across the islands
+        :param num_islands: Number of islands
+        :param migration_interval: Number of generations between two migrations
+        :param migration_size: Number of individuals an island sends to each neighbour
+        :param topology: 'ring', 'full' (fully connected) or a list with the receiving islands of every island
+        :param expanded: Evolve expanded necklaces as run_expanded
+        :param vectorized: Store every island in one NecklaceEnsemble, not together with expanded
+        :param seed: Seed for the random streams of the islands
+        :param num_workers: Number of processes the islands are split across, 1 runs all islands in this process
+        :param checkpoint: Path of a checkpoint file, the run can be continued with GeneticAlgorithm.resume_islands.
+                           Checkpoints are written before a migration interval and only if num_workers is 1.
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :return: Mean energy, Best energy of the whole population, truncated if the run stopped early.
+                 Stopping criteria are checked after every migration interval, stopping.Diversity on the packed
+                 genomes of all islands. The traces of the single islands are returned by get_island_traces.
+        """
+        sizes = [len(x) for x in np.array_split(np.arange(population_size),num_islands)]
+        if min(sizes) == 0:
+            sys.exit('GeneticAlgorithm.run_islands: More islands than individuals')
+        if expanded and vectorized:
+            sys.exit('GeneticAlgorithm.run_islands: Expanded islands can not be vectorized')
+        seeds = np.random.SeedSequence(seed).spawn(num_islands)
+        params = {'population_size': population_size, 'num_gens': num_gens, 'crossover_rate': crossover_rate,
+                  'mutation_rate': mutation_rate, 'clone_rate': clone_rate, 'expanded': expanded,
+                  'vectorized': vectorized, 'migration_interval': migration_interval,
+                  'migration_size': migration_size, 'sizes': sizes,
+                  'targets': migration_targets(topology,num_islands)}
+
+        # Split the islands across the workers, with one worker the islands stay in this process
+        groups = [x for x in np.array_split(np.arange(num_islands),min(num_workers,num_islands)) if len(x) > 0]
+        if len(groups) > 1:
+            if checkpoint is not None:
+                print('GeneticAlgorithm: Checkpoints are not written if num_workers > 1')
+            islands = (groups,seeds)
+            checkpointer = None
+        else:
+            islands = [self._create_island(size,ss,params) for size,ss in zip(sizes,seeds)]
+            checkpointer = Checkpointer(checkpoint,checkpoint_interval) if checkpoint is not None else None
+
+        means = np.empty([num_islands,num_gens])
+        bests = np.empty([num_islands,num_gens])
+        energiesArr = np.empty(num_gens)
+        energiesVBSFArr = np.empty(num_gens)
+        immigrants = [[] for i in range(num_islands)]
+        return self.__evolve_islands(islands,0,means,bests,energiesArr,energiesVBSFArr,immigrants,params,
+                                     checkpointer)
+
+    def resume_islands(self,checkpoint,checkpoint_interval=60):
+        """
+        Continues a run of GeneticAlgorithm.run_islands from its checkpoint file, the islands are evolved in
+        this process
+        :param checkpoint: Path of the checkpoint file, new checkpoints are written to the same file
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :return: Mean energy, Best energy of the whole population
+        """
+        state = load_checkpoint(checkpoint)
+        self.__model = state['model']
+        params = state['params']
+        gen = state['gen']
+        num_islands = len(params['sizes'])
+
+        means = np.empty([num_islands,params['num_gens']])
+        bests = np.empty([num_islands,params['num_gens']])
+        energiesArr = np.empty(params['num_gens'])
+        energiesVBSFArr = np.empty(params['num_gens'])
+        means[:,:gen] = state['means']
+        bests[:,:gen] = state['bests']
+        energiesArr[:gen] = state['energiesArr']
+        energiesVBSFArr[:gen] = state['energiesVBSFArr']
+
+        checkpointer = Checkpointer(checkpoint,checkpoint_interval)
+        return self.__evolve_islands(state['islands'],gen,means,bests,energiesArr,energiesVBSFArr,
+                                     state['immigrants'],params,checkpointer)
+
+    def __evolve_islands(self,islands,gen,means,bests,energiesArr,energiesVBSFArr,immigrants,params,checkpointer):
+        """
+        Main loop of run_islands, starting at generation gen
+        :param islands: List of islands of _create_island, or the groups of islands and their seed sequences
+                        for the worker processes
+        :param immigrants: List of packed node matrices that the islands take in first
+        :param params: Parameters of run_islands
+        :param checkpointer: Checkpointer, or None if no checkpoints are written
+        :return: Mean energy, Best energy of the whole population
+        """
+        num_gens = params['num_gens']
+        sizes = params['sizes']
+        self.__stop_reason = None
+        reset_all(self.__stopping)
+        end = num_gens
+        prof = self.__profiler
+        # The genomes of all individuals are only gathered if a criterion needs the population
+        params['gather'] = any(isinstance(x,Diversity) for x in self.__stopping)
+
+        conns = []
+        procs = []
+        if isinstance(islands,tuple):
+            groups,seeds = islands
+            ctx = multiprocessing.get_context()
+            for group in groups:
+                parent,child = ctx.Pipe()
+                proc = ctx.Process(target=_island_worker,args=(child,self.__model,[sizes[i] for i in group],
+                                                               [seeds[i] for i in group],params),daemon=True)
+                proc.start()
+                conns.append(parent)
+                procs.append(proc)
+
+        try:
+            while gen < num_gens:
+                # Write a checkpoint before the migration interval
+                if checkpointer is not None and checkpointer.due():
+                    self.__save_islands(checkpointer,islands,gen,means,bests,energiesArr,energiesVBSFArr,
+                                        immigrants,params)
+
+                # Evolve all islands until the next migration
+                n_gens = min(params['migration_interval'],num_gens-gen)
+                if prof is not None:
+                    t = prof.clock()
+                if conns:
+                    for conn,group in zip(conns,groups):
+                        conn.send(([immigrants[i] for i in group],n_gens))
+                    results = [r for conn in conns for r in conn.recv()]
+                else:
+                    results = self._island_epoch(islands,immigrants,n_gens,params)
+                if prof is not None:
+                    t = prof.add('islands',t)
+
+                # Merge the traces, the mean is weighted by the island sizes
+                for i,(mean,best,emigrants,genomes) in enumerate(results):
+                    means[i,gen:gen+n_gens] = mean
+                    bests[i,gen:gen+n_gens] = best
+                energiesArr[gen:gen+n_gens] = np.dot(sizes,means[:,gen:gen+n_gens]) / params['population_size']
+                best = np.min(bests[:,gen:gen+n_gens],axis=0)
+                if gen > 0:
+                    best = np.minimum(best,energiesVBSFArr[gen-1])
+                energiesVBSFArr[gen:gen+n_gens] = np.minimum.accumulate(best)
+                gen += n_gens
+
+                # Send the best individuals of every island to its neighbours
+                immigrants = [[] for i in range(len(sizes))]
+                for i,result in enumerate(results):
+                    for j in params['targets'][i]:
+                        immigrants[j].append(result[2])
+                if prof is not None:
+                    prof.add('migration',t)
+                    prof.count('generations',n_gens)
+                    prof.tick(gen-1)
+
+                if self.__stopping:
+                    population = np.concatenate([r[3] for r in results]) if params['gather'] else None
+                    self.__stop_reason = self.__check_stopping(gen-1,population,energiesArr[gen-1],
+                                                               energiesVBSFArr[gen-1])
+                    if self.__stop_reason is not None:
+                        end = gen
+                        break
+        finally:
+            for conn in conns:
+                conn.send(None)
+            for proc in procs:
+                proc.join()
 
-        return energiesArr, energiesVBSFArr
+        if checkpointer is not None:
+            self.__save_islands(checkpointer,islands,end,means,bests,energiesArr,energiesVBSFArr,immigrants,params)
+            checkpointer.wait()
+        if prof is not None:
+            prof.end_run('GeneticAlgorithm.run_islands')
+
+        # Best energies so far of the islands from their best energies per generation
+        self.__island_traces = (means[:,:end],np.minimum.accumulate(bests[:,:end],axis=1))
+        return energiesArr[:end], energiesVBSFArr[:end]
+
+    def __save_islands(self,checkpointer,islands,gen,means,bests,energiesArr,energiesVBSFArr,immigrants,params):
+        """
+        Writes the state of GeneticAlgorithm.run_islands to a checkpoint
+        """
+        checkpointer.save({'model': self.__model, 'params': params, 'islands': islands, 'gen': gen,
+                           'means': means[:,:gen], 'bests': bests[:,:gen], 'energiesArr': energiesArr[:gen],
+                           'energiesVBSFArr': energiesVBSFArr[:gen], 'immigrants': immigrants})
+
+    def _create_island(self,size,seed_seq,params):
+        """
+        Creates an island of run_islands with random individuals
+        :param size: Number of individuals
+        :param seed_seq: numpy.random.SeedSequence of the island
+        :param params: Parameters of run_islands
+        :return: Dictionary with the population, its size and the random generator that selects the individuals
+        """
+        stream_seq,sample_seq = seed_seq.spawn(2)
+        if params['vectorized']:
+            population = NecklaceEnsemble(self.__model,size,rng=np.random.default_rng(stream_seq))
+        else:
+            model = self.__model.get_copy()
+            model.set_rng(RandomStream(stream_seq))
+            population = []
+            for k in range(size):
+                nkl = model.get_copy()
+                if params['expanded']:
+                    nkl.expand()
+                    nkl.shuffle_expanded()
+                else:
+                    nkl.shuffle_state()
+                population.append(nkl)
+        return {'population': population, 'population_size': size,
+                'rng': random.Random(int(sample_seq.generate_state(1)[0]))}
+
+    def _island_epoch(self,islands,immigrants,n_gens,params):
+        """
+        Takes in the immigrants of the islands and evolves them for several generations
+        :param islands: Islands of _create_island, changed in place
+        :param immigrants: List of packed node matrices for every island
+        :param n_gens: Number of generations
+        :param params: Parameters of run_islands
+        :return: List of mean energies, lowest energies, emigrants (packed node matrix) and, if params['gather']
+                 is set, the packed node matrix of all individuals for every island
+        """
+        results = []
+        for island,packed in zip(islands,immigrants):
+            population = island['population']
+            if len(packed) > 0:
+                self.__immigrate(population,np.concatenate(packed),params)
+            island_params = dict(params,population_size=island['population_size'])
+            means = np.empty(n_gens)
+            mins = np.empty(n_gens)
+            for o in range(n_gens):
+                if params['vectorized']:
+                    population,means[o],mins[o] = self.__generation_vectorized(population,island_params)
+                elif params['expanded']:
+                    population,means[o],mins[o] = self.__generation_expanded(population,island_params,island['rng'])
+                else:
+                    population,means[o],mins[o] = self.__generation(population,island_params,island['rng'])
+            island['population'] = population
+            genomes = self.__genomes(population,params) if params['gather'] else None
+            results.append((means,mins,self.__emigrants(population,params),genomes))
+        return results
+
+    def __emigrants(self,population,params):
+        """
+        Returns the best individuals of an island
+        :return: Packed node matrix, one row per individual
+        """
+        count = params['migration_size']
+        if params['vectorized']:
+            nodes = population.nodes[np.argsort(population.energies,kind='stable')[:count]]
+        else:
+            best = sorted(population,key=lambda x: x.get_energy())[:count]
+            nodes = np.array([self.__node_row(nkl,params['expanded']) for nkl in best])
+        return np.packbits(nodes,axis=1)
+
+    def __genomes(self,population,params):
+        """
+        Returns all individuals of an island
+        :return: Packed node matrix, one row per individual
+        """
+        if params['vectorized']:
+            nodes = population.nodes
+        else:
+            nodes = np.array([self.__node_row(nkl,params['expanded']) for nkl in population])
+        return np.packbits(nodes,axis=1)
+
+    def __immigrate(self,population,packed,params):
+        """
+        Replaces the worst individuals of an island with immigrants
+        :param population: List of necklaces or NecklaceEnsemble, changed in place
+        :param packed: Packed node matrix of the immigrants
+        """
+        m,n = self.__model.get_size()
+        width = int(m*n)
+        if params['expanded']:
+            width *= population[0]._expanded_bits
+        size = population.ensemble_size if params['vectorized'] else len(population)
+        nodes = np.unpackbits(packed,axis=1)[:size,:width].astype(bool)
+        half = width // 2
+        if params['vectorized']:
+            worst = np.argsort(population.energies,kind='stable')[size-len(nodes):]
+            all_nodes = population.nodes.copy()
+            all_nodes[worst] = nodes
+            energies = population.energies.copy()
+            energies[worst] = population.get_energies(nodes)
+            population.set_walkers(all_nodes,energies)
+            return
+        worst = np.argsort([x.get_energy() for x in population],kind='stable')[size-len(nodes):]
+        for k,row in zip(worst,nodes):
+            nkl = population[k]
+            if params['expanded']:
+                nkl._ring_expanded = bits_to_int(row[:half])
+                nkl._ext_expanded = bits_to_int(row[half:])
+                nkl.collapse()
+            else:
+                nkl.set_state(bits_to_int(row[:half]),bits_to_int(row[half:]))
+
+    def __node_row(self,nkl,expanded):
+        """
+        Returns the classes of all nodes of a necklace, the ring nodes first as in NecklaceEnsemble.nodes
+        :param expanded: Use the expanded representation
+        :return: Boolean array
+        """
+        m,n = self.__model.get_size()
+        half = int(m*n/2)
+        if expanded:
+            half *= nkl._expanded_bits
+            return np.concatenate([int_to_bits(int(nkl._ring_expanded),half),int_to_bits(int(nkl._ext_expanded),half)])
+        return np.concatenate([int_to_bits(int(nkl._ring),half),int_to_bits(int(nkl._ext),half)])
+
+
+def migration_targets(topology,num_islands):
+    """
+    Returns the islands that receive the migrants of every island
+    :param topology: 'ring', 'full' or a list with the receiving islands of every island
+    :param num_islands: Number of islands
+    :return: List with a list of receiving islands for every island
+    """
+    if topology == 'ring':
+        return [[(i+1) % num_islands] if num_islands > 1 else [] for i in range(num_islands)]
+    if topology == 'full':
+        return [[j for j in range(num_islands) if j != i] for i in range(num_islands)]
+    if len(topology) != num_islands:
+        sys.exit('migration_targets: The topology needs the receiving islands of every island')
+    return [list(x) for x in topology]
+
+
+def _island_worker(conn,model,sizes,seeds,params):
+    """
+    Worker process of GeneticAlgorithm.run_islands. Receives (immigrants, n_gens) tuples and answers with the
+    results of GeneticAlgorithm._island_epoch for its islands, until None is received.
+    :param conn: Connection to the main process
+    :param model: Model of the individuals
+    :param sizes: Number of individuals of every island of this worker
+    :param seeds: numpy.random.SeedSequence of every island of this worker
+    :param params: Parameters of run_islands
+    """
+    ga = GeneticAlgorithm()
+    ga.set_model(model)
+    islands = [ga._create_island(size,ss,params) for size,ss in zip(sizes,seeds)]
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        immigrants,n_gens = msg
+        conn.send(ga._island_epoch(islands,immigrants,n_gens,params))
+    conn.close()
 
 
 if __name__ == '__main__':
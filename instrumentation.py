@@ -0,0 +1,107 @@
+import time
+
+
+class Profiler:
+    """
+    A class for timing the phases of the optimiser loops and counting events such as accepted moves.
+    Optimisers only call a profiler that was set with set_profiler, so a run without profiler pays
+    one comparison per instrumented phase.
+    """
+
+    def __init__(self, snapshot_every=0, print_summary=True):
+        """
+        Initializes an empty profiler
+        :param snapshot_every: Take a snapshot every snapshot_every steps or generations, 0 for no snapshots
+        :param print_summary: Print the summary at the end of every run
+        """
+        self.snapshot_every = snapshot_every
+        self.print_summary = print_summary
+        self.times = {}
+        self.calls = {}
+        self.counts = {}
+        self.snapshots = []
+        self.__start = time.perf_counter()
+
+    def reset(self):
+        """
+        Removes all timings, counts and snapshots
+        """
+        self.times = {}
+        self.calls = {}
+        self.counts = {}
+        self.snapshots = []
+        self.__start = time.perf_counter()
+
+    @staticmethod
+    def clock():
+        """
+        Returns the current time, used as start of a phase
+        :return: Time in seconds
+        """
+        return time.perf_counter()
+
+    def add(self, name, start):
+        """
+        Adds the time since start to a phase
+        :param name: Name of the phase
+        :param start: Start time of the phase from clock()
+        :return: Current time, which can be used as start of the next phase
+        """
+        now = time.perf_counter()
+        self.times[name] = self.times.get(name, 0.) + now - start
+        self.calls[name] = self.calls.get(name, 0) + 1
+        return now
+
+    def count(self, name, n=1):
+        """
+        Counts events
+        :param name: Name of the counter
+        :param n: Number of events
+        """
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def tick(self, step):
+        """
+        Takes a snapshot if the step is a multiple of snapshot_every
+        :param step: Step or generation counter
+        """
+        if self.snapshot_every > 0 and step % self.snapshot_every == 0:
+            snap = self.snapshot()
+            snap['step'] = step
+            self.snapshots.append(snap)
+
+    def snapshot(self):
+        """
+        Returns the current timings and counts
+        :return: Dictionary with wall time, times, calls and counts
+        """
+        return {'wall_time': time.perf_counter() - self.__start, 'times': dict(self.times),
+                'calls': dict(self.calls), 'counts': dict(self.counts)}
+
+    def end_run(self, name):
+        """
+        Called by the optimisers at the end of a run, prints the summary if print_summary is set
+        :param name: Name of the run
+        """
+        if self.print_summary:
+            print(self.summary(name))
+
+    def summary(self, title='Profile'):
+        """
+        Creates a table of all phases, sorted by time, and all counters
+        :param title: First line of the table
+        :return: Summary as string
+        """
+        # Phases can be nested (e.g. eigsh within temperature_update), so shares refer to the wall time
+        total = time.perf_counter() - self.__start
+        lines = [title + ' (wall time %.3f s)' % total]
+        lines.append('%-24s %10s %7s %12s %12s' % ('phase', 'time [s]', 'share', 'calls', 'per call'))
+        for name in sorted(self.times, key=self.times.get, reverse=True):
+            t = self.times[name]
+            lines.append('%-24s %10.4f %6.1f%% %12d %10.2fus' % (name, t, 100 * t / total if total > 0 else 0,
+                                                                   self.calls[name], 1e6 * t / self.calls[name]))
+        for name in sorted(self.counts):
+            lines.append('%-24s %10d' % (name, self.counts[name]))
+        if 'accepted' in self.counts and self.counts.get('proposals', 0) > 0:
+            lines.append('%-24s %10.4f' % ('acceptance rate', self.counts['accepted'] / self.counts['proposals']))
+        return '\n'.join(lines)
@@ -0,0 +1,221 @@
+import math
+import random
+import numpy as np
+
+# Numba is optional, without it the kernels run as plain Python functions
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+
+@njit(cache=True)
+def _ring_bit(row, j, half):
+    """Class of ring node j, ring positions beyond the ring nodes are empty"""
+    if j < half:
+        return int(row[j])
+    return 0
+
+
+@njit(cache=True)
+def _flip_delta(row, pos, ones, m, half):
+    """
+    Energy change of flipping the class of a single node, same energy as Necklace.get_energy
+    :param row: Node classes of one walker
+    :param pos: Position of the node
+    :param ones: Number of nodes in class 1
+    :param m: Number of sites
+    :param half: Number of ring nodes
+    :return: Energy difference
+    """
+    b = int(row[pos])
+    de = 0
+    if pos < half:
+        for nb in ((pos - 1) % m, (pos + 1) % m):
+            if nb != pos:
+                de += 1 - 2 * (b ^ _ring_bit(row, nb, half))
+        eb = 0
+        if pos < row.shape[0] - half:
+            eb = int(row[half + pos])
+        de += 1 - 2 * (b ^ eb)
+    else:
+        de += 1 - 2 * (b ^ _ring_bit(row, pos - half, half))
+    c = ones - half
+    d = 1 - 2 * b
+    de += (c + d)**2 - c**2
+    return de
+
+
+@njit(cache=True)
+def metropolis_kernel(nodes, energies, ones, temps, uniforms, u_pos, step, walker, e_sums, e_mins, m, half):
+    """
+    Runs Metropolis steps for all walkers, in the same order and with the same use of random numbers as
+    Annealer.run on Necklace objects. Stops when all temperatures are done or the random numbers run out,
+    in which case the unfinished walker step is not performed.
+    :param nodes: 2-D uint8 array with the node classes of all walkers, changed in place
+    :param energies: Energies of all walkers, changed in place
+    :param ones: Number of nodes in class 1 of all walkers, constant under pair exchanges
+    :param temps: Temperatures of all steps
+    :param uniforms: Buffer of uniform random numbers in [0, 1)
+    :param u_pos: Position of the next unused random number
+    :param step: Step to start with
+    :param walker: Walker to start with
+    :param e_sums: Sums of the energies before each step, changed in place
+    :param e_mins: Minima of the energies before each step, changed in place
+    :param m: Number of sites
+    :param half: Number of ring nodes
+    :return: Next step, next walker, position of the next unused random number
+    """
+    n_nodes = nodes.shape[1]
+    n_uniforms = uniforms.shape[0]
+    while step < temps.shape[0]:
+        T = temps[step]
+        while walker < nodes.shape[0]:
+            row = nodes[walker]
+            start = u_pos
+
+            # Random pair of nodes of opposite class, the second one is redrawn until its class differs
+            if u_pos >= n_uniforms:
+                return step, walker, start
+            pos1 = int(n_nodes * uniforms[u_pos])
+            u_pos += 1
+            val1 = row[pos1]
+            pos2 = pos1
+            if 0 < ones[walker] < n_nodes:
+                while True:
+                    if u_pos >= n_uniforms:
+                        return step, walker, start
+                    pos2 = int(n_nodes * uniforms[u_pos])
+                    u_pos += 1
+                    if row[pos2] != val1:
+                        break
+
+            # Both nodes have opposite classes, so the number of class 1 nodes is the same afterwards
+            de = 0
+            if pos2 != pos1:
+                d_ones = 1 - 2 * int(row[pos1])
+                de = _flip_delta(row, pos1, ones[walker], m, half)
+                row[pos1] ^= 1
+                de += _flip_delta(row, pos2, ones[walker] + d_ones, m, half)
+                row[pos2] ^= 1
+
+            # Metropolis
+            accept = True
+            if de >= 0:
+                if u_pos >= n_uniforms:
+                    if pos2 != pos1:
+                        row[pos1] ^= 1
+                        row[pos2] ^= 1
+                    return step, walker, start
+                if T == np.inf:
+                    p = 1.0
+                elif T == 0:
+                    p = 0.0
+                else:
+                    p = math.exp(-de / T)
+                r = uniforms[u_pos]
+                u_pos += 1
+                if r > p:
+                    accept = False
+
+            # Statistics use the energy before the step
+            e_sums[step] += energies[walker]
+            if energies[walker] < e_mins[step]:
+                e_mins[step] = energies[walker]
+
+            if accept:
+                energies[walker] += de
+            elif pos2 != pos1:
+                row[pos1] ^= 1
+                row[pos2] ^= 1
+            walker += 1
+        walker = 0
+        step += 1
+    return step, walker, u_pos
+
+
+def get_kernel(backend):
+    """
+    Returns the Metropolis kernel of a backend
+    :param backend: 'numba' for the compiled kernel or 'python' for the plain Python kernel
+    :return: Kernel function
+    """
+    if backend == 'python':
+        return getattr(metropolis_kernel, 'py_func', metropolis_kernel)
+    if backend == 'numba':
+        if not HAVE_NUMBA:
+            print('Numba is not installed, using the python backend')
+        return metropolis_kernel
+    raise ValueError('Unknown backend ' + str(backend))
+
+
+def run_metropolis(nodes, energies, temps, m, half, backend='numba', buffer_size=2**16):
+    """
+    Runs Metropolis steps for all walkers at the given temperatures, drawing the random numbers from the
+    random module like Necklace does
+    :param nodes: 2-D uint8 array with the node classes of all walkers, changed in place
+    :param energies: Energies of all walkers, changed in place
+    :param temps: Temperatures of all steps
+    :param m: Number of sites
+    :param half: Number of ring nodes
+    :param backend: 'numba' or 'python'
+    :param buffer_size: Number of random numbers drawn at once
+    :return: Sums and minima of the energies before each step
+    """
+    kernel = get_kernel(backend)
+    temps = np.asarray(temps, dtype=float)
+    ones = nodes.sum(axis=1).astype(np.int64)
+    e_sums = np.zeros(len(temps))
+    e_mins = np.full(len(temps), np.inf)
+
+    step = 0
+    walker = 0
+    uniforms = np.empty(0)
+    u_pos = 0
+    rest = 0
+    state = random.getstate()
+    while step < len(temps):
+        # Keep unused random numbers and append new ones of the same stream
+        rest = len(uniforms) - u_pos
+        state = random.getstate()
+        uniforms = np.concatenate([uniforms[u_pos:], [random.random() for i in range(buffer_size)]])
+        step, walker, u_pos = kernel(nodes, energies, ones, temps, uniforms, 0, step, walker, e_sums, e_mins, m, half)
+
+    # Leave the random module where the run on Necklace objects would leave it, without the unused numbers
+    random.setstate(state)
+    for i in range(max(u_pos - rest, 0)):
+        random.random()
+    return e_sums, e_mins
+
+
+def check_backends(m=20, ensemble_size=10, num_steps=2000, seed=1):
+    """
+    Checks that both kernel backends give the same trajectories as Annealer.run on Necklace objects
+    :return: True if all trajectories are identical
+    """
+    from necklace_model import Necklace
+    from simulated_annealing import Annealer
+
+    anl = Annealer()
+    anl.set_model(Necklace(m, 2))
+    anl.set_temps(np.concatenate([np.full(10, np.inf), np.linspace(5, 0.5, num_steps), np.zeros(10)]))
+    random.seed(seed)
+    reference = anl.run(ensemble_size)
+    identical = True
+    for backend in ['python', 'numba']:
+        random.seed(seed)
+        result = anl.run(ensemble_size, backend=backend)
+        same = all(np.array_equal(x, y) for x, y in zip(reference, result))
+        print(backend + ': ' + ('identical' if same else 'different'))
+        identical = identical and same
+    return identical
+
+
+if __name__ == '__main__':
+    check_backends()
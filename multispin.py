@@ -0,0 +1,269 @@
+import sys
+import numpy as np
+from necklace_model import Necklace
+
+# Number of walkers packed into one word
+LANES = 64
+
+
+def pack_lanes(bits):
+    """
+    Packs boolean lanes into words, lane j of a word is bit j
+    :param bits: Boolean array with up to LANES lanes in the last axis, missing lanes are zero
+    :return: uint64 array without the last axis
+    """
+    bits = np.asarray(bits, dtype=bool)
+    if bits.shape[-1] < LANES:
+        pad = np.zeros(bits.shape[:-1] + (LANES - bits.shape[-1],), dtype=bool)
+        bits = np.concatenate([bits, pad], axis=-1)
+    # The bytes of a word have to be adjacent in memory to view them as one uint64
+    raw = np.ascontiguousarray(np.packbits(bits, axis=-1, bitorder='little'))
+    return raw.view('<u8')[..., 0]
+
+
+def unpack_lanes(words):
+    """
+    Unpacks words into boolean lanes, the inverse of pack_lanes
+    :param words: uint64 array
+    :return: Boolean array with an additional last axis of LANES lanes
+    """
+    raw = np.ascontiguousarray(words, dtype='<u8')[..., None].view(np.uint8)
+    return np.unpackbits(raw, axis=-1, bitorder='little').astype(bool)
+
+
+def add_bit(counter, bit):
+    """
+    Adds one bit per lane to a bit-sliced counter with a ripple carry adder
+    :param counter: List of words, counter[i] holds bit i of the count of every lane, changed in place
+    :param bit: Word with the bits to add
+    """
+    for i in range(len(counter)):
+        carry = counter[i] & bit
+        counter[i] = counter[i] ^ bit
+        bit = carry
+
+
+def counter_values(counter):
+    """
+    Converts a bit-sliced counter into integers
+    :param counter: List of words as in add_bit
+    :return: Integer array with an additional last axis of LANES lanes
+    """
+    values = 0
+    for i, word in enumerate(counter):
+        values = values + (unpack_lanes(word).astype(int) << i)
+    return values
+
+
+class MultiSpinEnsemble:
+    """
+    A multi-spin coded ensemble of necklace walkers.
+    Walker k is stored in lane k % 64 of word group k // 64: for every node of the necklace the ensemble holds
+    one uint64 word per group, whose bit j is the class of the node in walker 64*group + j. All walkers of
+    a group propose the exchange of the same pair of positions, which is a move in the walkers where the two
+    nodes have opposite classes and a rejected no-op in the others. Energy changes are counted with bit-sliced
+    adders and the Metropolis acceptance is done bitwise, so one step costs a few word operations per group.
+    Walkers of different groups are independent, walkers of the same group share their proposals.
+    In a balanced walker about half of the pairs have equal classes, so a walker needs about twice as many
+    steps as with NecklaceEnsemble for the same number of proposed moves.
+    """
+
+    def __init__(self, model, ensemble_size=1, rng=None):
+        """
+        Initializes the ensemble with random balanced states
+        :param model: Necklace that defines the size of all walkers
+        :param ensemble_size: Number of walkers, the last group is filled up with walkers that are not reported
+        :param rng: numpy.random.Generator used for all random draws
+        """
+        m, n = model.get_size()
+        if n > 2:
+            sys.exit('MultiSpinEnsemble: Currently only n < 3 is implemented')
+        self.__m = m
+        self.__nodes = int(m * n)
+        self.__half = int(m * n / 2)
+        self.ensemble_size = ensemble_size
+        self.groups = -(-ensemble_size // LANES)
+
+        # Energies of the lumped model are the same as for the single necklace
+        self.allEnergies = model.allEnergies
+        self.dims_lumped = model.dims_lumped
+        self.__lumped_table = model._lumped_table
+        self.overflow_count = 0
+
+        if rng is None:
+            rng = np.random.default_rng()
+        self.rng = rng
+
+        # Word of every node position in the bit planes [ring bits, external bits], as in Necklace.val_at_pos.
+        # Ring bits beyond the ring nodes (n = 1) stay zero.
+        pos = np.arange(self.__nodes)
+        self.__bits = np.where(pos < self.__half, pos, m + pos - self.__half)
+
+        # Connections of every bit, padded with -1: ring neighbours and ring to external node of each site
+        bonds = [(t, (t + 1) % m) for t in range(m)] + [(t, m + t) for t in range(m)]
+        neighbours = [[] for b in range(2 * m)]
+        for a, b in bonds:
+            neighbours[a].append(b)
+            neighbours[b].append(a)
+        self.__bonds = np.array(bonds)
+        self.__neighbours = np.full([2 * m, max(len(x) for x in neighbours)], -1)
+        for b, x in enumerate(neighbours):
+            self.__neighbours[b, :len(x)] = x
+        self.__max_changes = 2 * self.__neighbours.shape[1]
+
+        self.__group_idx = np.arange(self.groups)
+        self.planes = np.zeros([2 * m, self.groups], dtype=np.uint64)
+        self.__lane_energies = np.zeros(self.groups * LANES, dtype=int)
+
+        # Walkers whose last Metropolis step was accepted
+        self.accepted = np.zeros(ensemble_size, dtype=bool)
+
+        # Profiler timing the phases of metropolis_step, if set
+        self.profiler = None
+
+        self.shuffle_state()
+
+    @property
+    def energies(self):
+        """Energies of the walkers"""
+        return self.__lane_energies[:self.ensemble_size]
+
+    @property
+    def nodes(self):
+        """Node matrix of the walkers, with the columns of NecklaceEnsemble.nodes"""
+        lanes = unpack_lanes(self.planes[self.__bits])
+        return lanes.reshape(self.__nodes, -1)[:, :self.ensemble_size].T
+
+    def set_nodes(self, nodes):
+        """
+        Sets the states of all walkers
+        :param nodes: Node matrix with one row per walker, as NecklaceEnsemble.nodes
+        """
+        lanes = np.zeros([self.groups * LANES, self.__nodes], dtype=bool)
+        lanes[:len(nodes)] = nodes
+        # Lanes of the last group without walker copy the first walker
+        lanes[len(nodes):] = nodes[0]
+        self.planes[:] = 0
+        self.planes[self.__bits] = pack_lanes(lanes.T.reshape(self.__nodes, self.groups, LANES))
+        self.__lane_energies = self.get_energies()
+
+    def shuffle_state(self):
+        """
+        Shuffles the states of all walkers randomly, with half of the nodes in each class.
+        """
+        base = np.zeros([self.ensemble_size, self.__nodes], dtype=bool)
+        base[:, :self.__half] = True
+        self.set_nodes(self.rng.permuted(base, axis=1))
+
+    def get_energies(self):
+        """
+        Calculates the energies of all lanes from scratch with bit-sliced popcounts, as done by Necklace.get_energy
+        :return: Array of energies of all lanes, including the ones without walker
+        """
+        width = int(2 * self.__m).bit_length()
+        bond_count = [np.zeros(self.groups, dtype=np.uint64) for i in range(width)]
+        for a, b in self.__bonds:
+            add_bit(bond_count, self.planes[a] ^ self.planes[b])
+        ones = [np.zeros(self.groups, dtype=np.uint64) for i in range(width)]
+        for b in self.__bits:
+            add_bit(ones, self.planes[b])
+        c = counter_values(ones).ravel() - self.__half
+        return counter_values(bond_count).ravel() + c**2
+
+    def get_lumped_indices(self, energies=None):
+        """
+        Returns the indices of all walkers in the lumped model
+        :param energies: Energies of the walkers, if not set the cached ones are used
+        :return: Array of indices, dims_lumped (overflow bin) where the energy is not in allEnergies
+        """
+        if energies is None:
+            energies = self.energies
+        idx = self.__lumped_table[np.minimum(energies, len(self.__lumped_table) - 1)]
+        self.overflow_count += int(np.count_nonzero(idx == self.dims_lumped))
+        return idx
+
+    def metropolis_step(self, T, Q=None):
+        """
+        Performs one Metropolis step for every walker of the ensemble
+        :param T: Temperature
+        :param Q: TransitionEstimator counting the lumped transitions of the walkers whose pair is a move, if given
+        :return: Energies of the walkers before the step
+        """
+        prof = self.profiler
+        if prof is not None:
+            t = prof.clock()
+        g = self.__group_idx
+        planes = self.planes
+        zero = np.zeros(self.groups, dtype=np.uint64)
+
+        # One pair of positions per group, a move in the lanes where the classes differ
+        pos = self.rng.integers(self.__nodes, size=[2, self.groups])
+        b1 = self.__bits[pos[0]]
+        b2 = self.__bits[pos[1]]
+        x1 = planes[b1, g]
+        x2 = planes[b2, g]
+        move = x1 ^ x2
+        if prof is not None:
+            t = prof.add('proposal', t)
+
+        # Count the connections of both nodes that are unequal before the exchange, except the ones between
+        # the two nodes, which stay unequal. Every other connection changes, so de = changes - 2*unequal.
+        slots = self.__neighbours.shape[1]
+        nbs = np.concatenate([self.__neighbours[b1], self.__neighbours[b2]], axis=1).T
+        other = np.concatenate([np.tile(b2, [slots, 1]), np.tile(b1, [slots, 1])])
+        valid = (nbs >= 0) & (nbs != other)
+        x = np.concatenate([np.tile(x1, [slots, 1]), np.tile(x2, [slots, 1])])
+        words = np.where(valid, x ^ planes[nbs, g], zero)
+        unequal = [zero.copy() for i in range(int(self.__max_changes).bit_length())]
+        for word in words:
+            add_bit(unequal, word)
+        changes = np.count_nonzero(valid, axis=0)
+        if prof is not None:
+            t = prof.add('energy', t)
+
+        # Bitwise Metropolis: lanes with u unequal connections accept with the probability of de = changes - 2u
+        u = np.arange(self.__max_changes + 1)
+        select = ((u[:, None] >> np.arange(len(unequal))) & 1).astype(bool)
+        counter = np.array(unequal)
+        lanes = np.bitwise_and.reduce(np.where(select[:, :, None], counter, ~counter), axis=1)
+        de = changes[:, None] - 2 * u
+        if T == np.inf:
+            p = np.ones(de.shape)
+        elif T == 0:
+            p = (de < 0).astype(float)
+        else:
+            p = np.where(de < 0, 1., np.exp(-np.maximum(de, 0) / T))
+        r = self.rng.random([self.groups, 1, LANES])
+        accept = np.bitwise_or.reduce(lanes & pack_lanes(r < p[:, :, None]).T, axis=0)
+        accept &= move
+        planes[b1, g] ^= accept
+        planes[b2, g] ^= accept
+        if prof is not None:
+            t = prof.add('metropolis', t)
+
+        # Energies of the proposals and of the new states
+        e_cur = self.energies.copy()
+        moved = unpack_lanes(move).ravel()
+        de = (changes[:, None] - 2 * counter_values(unequal)).ravel()
+        e_new = self.__lane_energies + np.where(moved, de, 0)
+        accepted = unpack_lanes(accept).ravel()
+        self.accepted = accepted[:self.ensemble_size]
+        self.__lane_energies = np.where(accepted, e_new, self.__lane_energies)
+        if Q is not None:
+            # Lanes whose pair has equal classes made no proposal, as the scalar walkers never draw such pairs
+            proposed = moved[:self.ensemble_size]
+            Q.add(self.get_lumped_indices(e_new[:self.ensemble_size][proposed]),
+                  self.get_lumped_indices(e_cur[proposed]))
+        if prof is not None:
+            prof.add('q_update' if Q is not None else 'energy', t)
+        return e_cur
+
+
+if __name__ == '__main__':
+    # Mean energy of 1000 walkers at constant temperature, with the cached and the recalculated energies
+    ensemble = MultiSpinEnsemble(Necklace(20, 2), 1000, rng=np.random.default_rng(1))
+    for i in range(5000):
+        ensemble.metropolis_step(1.)
+    print('Mean energy at T = 1: %.3f' % np.mean(ensemble.energies))
+    print('Cached energies are correct: ' + str(np.array_equal(ensemble.energies,
+                                                              ensemble.get_energies()[:ensemble.ensemble_size])))
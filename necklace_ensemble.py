@@ -0,0 +1,252 @@
+import sys
+import numpy as np
+from necklace_model import int_to_bits, bits_to_int
+
+
+class NecklaceEnsemble:
+    """
+    A vectorized ensemble of necklace walkers.
+    Every walker is one row of a boolean node matrix, where the columns follow the
+    node positions of Necklace (ring nodes first, external nodes afterwards).
+    """
+
+    def __init__(self, model, ensemble_size=1, rng=None):
+        """
+        Initializes the ensemble with random balanced states
+        :param model: Necklace that defines the size of all walkers
+        :param ensemble_size: Number of walkers
+        :param rng: numpy.random.Generator used for all random draws
+        """
+        m, n = model.get_size()
+        if n > 2:
+            sys.exit('NecklaceEnsemble: Currently only n < 3 is implemented')
+        self.__m = m
+        self.__n = n
+        self.__nodes = int(m * n)
+        self.__half = int(m * n / 2)
+        self.ensemble_size = ensemble_size
+
+        # Energies of the lumped model are the same as for the single necklace
+        self.allEnergies = model.allEnergies
+        self.dims_lumped = model.dims_lumped
+        self.__lumped_table = model._lumped_table
+        self.overflow_count = 0
+
+        if rng is None:
+            rng = np.random.default_rng()
+        self.rng = rng
+
+        # Node classes of all walkers and cached energies
+        self.nodes = np.zeros([ensemble_size, self.__nodes], dtype=bool)
+        self.energies = np.zeros(ensemble_size, dtype=int)
+
+        # Walkers whose last Metropolis step was accepted
+        self.accepted = np.zeros(ensemble_size, dtype=bool)
+
+        # Profiler timing the phases of metropolis_step, if set
+        self.profiler = None
+
+        # Last swapped nodes of every walker
+        self.__rows = np.arange(ensemble_size)
+        self.__lastPos1 = np.zeros(ensemble_size, dtype=int)
+        self.__lastPos2 = np.zeros(ensemble_size, dtype=int)
+
+        self.shuffle_state()
+
+    @classmethod
+    def from_necklaces(cls, necklaces, rng=None):
+        """
+        Creates an ensemble that holds the states of the given necklaces
+        :param necklaces: List of Necklace objects of equal size
+        :param rng: numpy.random.Generator used for all random draws
+        :return: NecklaceEnsemble
+        """
+        ens = cls(necklaces[0], len(necklaces), rng=rng)
+        for k, nkl in enumerate(necklaces):
+            ens.set_walker(k, nkl)
+        return ens
+
+    def shuffle_state(self):
+        """
+        Shuffles the states of all walkers randomly, with half of the nodes in each class.
+        """
+        base = np.zeros([self.ensemble_size, self.__nodes], dtype=bool)
+        base[:, :self.__half] = True
+        self.nodes = self.rng.permuted(base, axis=1)
+        self.energies = self.get_energies()
+
+    def set_walker(self, k, nkl):
+        """
+        Sets the state of walker k to the state of a necklace
+        :param k: Index of the walker
+        :param nkl: Necklace
+        """
+        self.nodes[k, :self.__half] = int_to_bits(nkl._ring, self.__half)
+        self.nodes[k, self.__half:] = int_to_bits(nkl._ext, self.__nodes - self.__half)
+        self.energies[k] = self.get_energies()[k]
+
+    def get_walker(self, k, model):
+        """
+        Returns walker k as a necklace
+        :param k: Index of the walker
+        :param model: Necklace which is copied for the result
+        :return: Necklace with the state of walker k
+        """
+        nkl = model.get_copy()
+        nkl.set_state(bits_to_int(self.nodes[k, :self.__half]), bits_to_int(self.nodes[k, self.__half:]))
+        return nkl
+
+    def swap_walkers(self, idx1, idx2):
+        """
+        Exchanges the states of two groups of walkers
+        :param idx1: Indices of the first walkers
+        :param idx2: Indices of the second walkers
+        """
+        self.nodes[np.concatenate([idx1, idx2])] = self.nodes[np.concatenate([idx2, idx1])]
+        self.energies[np.concatenate([idx1, idx2])] = self.energies[np.concatenate([idx2, idx1])]
+
+    def get_energies(self, nodes=None):
+        """
+        Calculates the energies of all walkers, as done by Necklace.get_energy
+        :param nodes: Node matrix, if not set the current one is used
+        :return: Array of energies
+        """
+        if nodes is None:
+            nodes = self.nodes
+        ring = np.zeros([nodes.shape[0], self.__m], dtype=bool)
+        ext = np.zeros([nodes.shape[0], self.__m], dtype=bool)
+        ring[:, :self.__half] = nodes[:, :self.__half]
+        ext[:, :self.__nodes - self.__half] = nodes[:, self.__half:]
+
+        ext_energy = np.count_nonzero(ring ^ ext, axis=1)
+        ring_energy = np.count_nonzero(ring ^ np.roll(ring, 1, axis=1), axis=1)
+        c1 = np.count_nonzero(nodes, axis=1)
+        return ext_energy + ring_energy + (c1 - self.__half)**2
+
+    def get_lumped_indices(self, energies=None):
+        """
+        Returns the indices of all walkers in the lumped model
+        :param energies: Energies of the walkers, if not set the cached ones are used
+        :return: Array of indices, dims_lumped (overflow bin) where the energy is not in allEnergies
+        """
+        if energies is None:
+            energies = self.energies
+        idx = self.__lumped_table[np.minimum(energies, len(self.__lumped_table) - 1)]
+        self.overflow_count += int(np.count_nonzero(idx == self.dims_lumped))
+        return idx
+
+    def pair_exchange_random(self):
+        """
+        Exchanges the classes of two random nodes of opposite class in every walker.
+        The pairs have the same distribution as in Necklace.pair_exchange_random, but the second node is drawn
+        directly among the nodes of opposite class instead of by redrawing, so a seeded ensemble does not
+        reproduce the random stream of the scalar necklaces. Walkers without nodes of both classes are not changed.
+        """
+        pos1 = (self.__nodes * self.rng.random(self.ensemble_size)).astype(int)
+        val1 = self.nodes[self.__rows, pos1]
+
+        # Choose the second node directly among the nodes of opposite class
+        opposite = self.nodes != val1[:, None]
+        counts = np.count_nonzero(opposite, axis=1)
+        k = (counts * self.rng.random(self.ensemble_size)).astype(int)
+        pos2 = np.argmax(np.cumsum(opposite, axis=1) > k[:, None], axis=1)
+        # Flipping the same node twice leaves the walker unchanged
+        pos2 = np.where(counts > 0, pos2, pos1)
+
+        self.nodes[self.__rows, pos1] ^= True
+        self.nodes[self.__rows, pos2] ^= True
+        self.__lastPos1 = pos1
+        self.__lastPos2 = pos2
+
+    def undo_random_exchange(self, mask):
+        """
+        Undoes the previous random exchange for the selected walkers
+        :param mask: Boolean array selecting the walkers
+        """
+        rows = self.__rows[mask]
+        self.nodes[rows, self.__lastPos1[mask]] ^= True
+        self.nodes[rows, self.__lastPos2[mask]] ^= True
+
+    def crossover(self, idx1, idx2):
+        """
+        Performs one point crossovers (genetic algorithm) between pairs of walkers, as Necklace.crossover.
+        All nodes from a random position on are exchanged between the two walkers of a pair.
+        :param idx1: Indices of the first walkers of the pairs
+        :param idx2: Indices of the second walkers of the pairs, disjoint from idx1
+        """
+        cuts = ((self.__nodes - 2) * self.rng.random(len(idx1))).astype(int) + 1
+        mask = np.arange(self.__nodes)[None, :] >= cuts[:, None]
+        first = self.nodes[idx1]
+        second = self.nodes[idx2]
+        self.nodes[idx1] = np.where(mask, second, first)
+        self.nodes[idx2] = np.where(mask, first, second)
+        rows = np.concatenate([idx1, idx2])
+        self.energies[rows] = self.get_energies(self.nodes[rows])
+
+    def mutate(self, idx):
+        """
+        Mutates a random node of each selected walker to the other class
+        :param idx: Indices of the walkers
+        """
+        pos = (self.__nodes * self.rng.random(len(idx))).astype(int)
+        self.nodes[idx, pos] ^= True
+        self.energies[idx] = self.get_energies(self.nodes[idx])
+
+    def set_walkers(self, nodes, energies=None):
+        """
+        Replaces all walkers, the ensemble size follows the new node matrix
+        :param nodes: Node matrix
+        :param energies: Energies of the walkers, calculated if not given
+        """
+        self.nodes = nodes
+        self.ensemble_size = nodes.shape[0]
+        self.__rows = np.arange(self.ensemble_size)
+        self.__lastPos1 = np.zeros(self.ensemble_size, dtype=int)
+        self.__lastPos2 = np.zeros(self.ensemble_size, dtype=int)
+        self.accepted = np.zeros(self.ensemble_size, dtype=bool)
+        self.energies = self.get_energies() if energies is None else energies
+
+    def metropolis_step(self, T, Q=None):
+        """
+        Performs one Metropolis step for every walker of the ensemble
+        :param T: Temperature, or array with one temperature per walker
+        :param Q: TransitionEstimator counting the lumped transitions, if given
+        :return: Energies of the walkers before the step
+        """
+        prof = self.profiler
+        if prof is not None:
+            t = prof.clock()
+        e_cur = self.energies
+        self.pair_exchange_random()
+        if prof is not None:
+            t = prof.add('proposal', t)
+        e_new = self.get_energies()
+        if prof is not None:
+            t = prof.add('energy', t)
+
+        if Q is not None:
+            Q.add(self.get_lumped_indices(e_new), self.get_lumped_indices(e_cur))
+            if prof is not None:
+                t = prof.add('q_update', t)
+
+        # Metropolis algorithm
+        de = e_new - e_cur
+        if np.ndim(T) > 0:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                p = np.exp(-np.maximum(de, 0) / T)
+            p[T == 0] = 0
+        elif T == np.inf:
+            p = np.ones(self.ensemble_size)
+        elif T == 0:
+            p = np.zeros(self.ensemble_size)
+        else:
+            p = np.exp(-np.maximum(de, 0) / T)
+        r = self.rng.random(self.ensemble_size)
+        reject = (de >= 0) & (r > p)
+        self.undo_random_exchange(reject)
+        self.accepted = ~reject
+        self.energies = np.where(reject, e_cur, e_new)
+        if prof is not None:
+            prof.add('metropolis', t)
+        return e_cur
+
@@ -2,79 +2,164 @@ import sys
 import numpy as np
 import random
 from scipy.special import binom
+from rng import RandomStream
+from density_of_states import exact_degeneracies, log_degeneracies
 
 class Necklace:
     """
     A class that simulates the behavior of necklace models.
     """
 
+    # Compact instance layout without __dict__, the genetic algorithm keeps thousands of necklaces
+    __slots__ = ('__m', '__n', '__half', '__lastPos1', '__lastPos2', '__meta', 'overflow_count', '_ring', '_ext',
+                 '__energy', '__ones', '_ring_expanded', '_ext_expanded', '_expanded_bits', '_rng')
+
     def __init__(self, m, n=2,SEED=0):
         """
         Initializes the necklace model
         :param m: Number of sites in the ring
         :param n: Number of nodes in each fully connected graph on the ring
+        :param SEED: If larger than zero, the necklace draws from its own RandomStream with this seed
         """
         # currently only n = 2,1 is implemented
         if n > 2:
-            sys.exit("Initialization of Necklace: Currently only n < 3 is implemented")
+            sys.exit("Initialization of Necklace: Currently only n < 3 is implemented, use BitNecklace for larger n")
         if n * m % 2 != 0:
             sys.exit('Initialization of Necklace: The number of sites is not even. Please give even number of sites!')
 
         # Store size variables
         self.__m = m
         self.__n = n
+        self.__half = int(m*n/2)
 
         # Initialize last swapped nodes
         self.__lastPos1 = 0
         self.__lastPos2 = 0
 
-        # All energies that the necklace can take
-        if self.__m % 2 == 0:
-            self.allEnergies = np.arange(2, self.__m * 2 + 1, 2)
-        else:
-            self.allEnergies = np.arange(2, self.__m * 2 + 1, 1)
-
-        # Set dimension of state space and lumped state space
-        self.dims_states = binom(int(self.__m*self.__n),int(self.__m*self.__n/2))
-        self.dims_lumped = len(self.allEnergies)
+        # Energies, dimensions and lumped index table, shared by all necklaces of the same size
+        self.__meta = necklace_metadata(m, n)
+        self.overflow_count = 0
 
         # Binary representations of ring and sites
         self._ring = 0
         self._ext = 0
 
+        # Cached energy and number of nodes in class 1 of the current state
+        self.__energy = 0
+        self.__ones = 0
+
         # Binary representations of expanded ring and sites
         self._ring_expanded = -1
         self._ext_expanded = -1
         self._expanded_bits = 0
 
-        # Seed the random generator
+        # Random generator, the random module unless the necklace has its own stream
+        self._rng = random
         if SEED > 0:
-            random.seed = SEED
+            self._rng = RandomStream(SEED)
 
         self.shuffle_state()
 
+    @property
+    def allEnergies(self):
+        """All energies that the necklace can take"""
+        return self.__meta['allEnergies']
+
+    @property
+    def dims_states(self):
+        """Dimension of the state space"""
+        return self.__meta['dims_states']
+
+    @property
+    def dims_lumped(self):
+        """Dimension of the lumped state space"""
+        return self.__meta['dims_lumped']
+
+    @property
+    def _lumped_table(self):
+        """Direct lookup of the lumped index by energy, other energies go to the overflow bin dims_lumped"""
+        return self.__meta['lumped_table']
+
+    def __getstate__(self):
+        """
+        State for pickling, without the shared metadata, which is looked up again when unpickling
+        """
+        # The random module can not be pickled, None stands for it
+        rng = None if self._rng is random else self._rng
+        return (self.__m, self.__n, self._ring, self._ext, self._ring_expanded, self._ext_expanded,
+                self._expanded_bits, rng, self.overflow_count)
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled necklace
+        :param state: Tuple of __getstate__, or the attribute dictionary of checkpoints written before __slots__
+        """
+        if isinstance(state, dict):
+            state = (state['_Necklace__m'], state['_Necklace__n'], state['_ring'], state['_ext'],
+                     state['_ring_expanded'], state['_ext_expanded'], state['_expanded_bits'], state['_rng'],
+                     state['overflow_count'])
+        self.__m, self.__n, ring, ext, self._ring_expanded, self._ext_expanded, self._expanded_bits, \
+            self._rng, self.overflow_count = state
+        if self._rng is None:
+            self._rng = random
+        self.__half = int(self.__m*self.__n/2)
+        self.__lastPos1 = 0
+        self.__lastPos2 = 0
+        self.__meta = necklace_metadata(self.__m, self.__n)
+        self.set_state(ring,ext)
+
     def shuffle_state(self):
         """
         Shuffles the state of the necklace randomly.
         """
         # set the classes of the nodes
-        a = []
+        a = set()
         while len(a) < (self.__m*self.__n/2):
-            x = int(self.__m*self.__n*random.random())
-            if x not in a:
-                a.append(x)
+            x = int(self.__m*self.__n*self._rng.random())
+            a.add(x)
 
-        self._ring = 0
-        self._ext = 0
+        self.set_state(0,0)
 
         for x in a:
             self.change_class(x)
 
+    def set_rng(self,rng):
+        """
+        Sets the random generator of the necklace
+        :param rng: Object with a random() method, e.g. a RandomStream or the random module
+        """
+        self._rng = rng
+
+    def get_size(self):
+        """
+        Returns the size parameters of the necklace
+        :return: Number of sites m, number of nodes per site n
+        """
+        return self.__m, self.__n
+
+    def set_state(self,ring,ext):
+        """
+        Sets the state of the necklace and recalculates the cached energy
+        :param ring: Binary representation of the ring nodes
+        :param ext: Binary representation of the external nodes
+        """
+        self._ring = ring
+        self._ext = ext
+        self.__ones = bin(ring).count('1') + bin(ext).count('1')
+        self.__energy = self.calc_energy()
+
     def get_energy(self):
         """
         Method for getting the energy of the current necklace setup
         :return: Energy of the current necklace setup
         """
+        return self.__energy
+
+    def calc_energy(self):
+        """
+        Calculates the energy of the current necklace setup from scratch
+        :return: Energy of the current necklace setup
+        """
 
         # Connection of ring with external
         ext_energy = bin(self._ring ^ self._ext).count('1')
@@ -119,6 +204,12 @@ class Necklace:
         if pos >= self.__m*self.__n:
             sys.exit('Pos too big in change_class!')
 
+        x,de = self.__flip(pos)
+        d_ones = 1 - 2 * x
+        c = self.__ones - self.__half
+        self.__energy += de + (c + d_ones)**2 - c**2
+        self.__ones += d_ones
+
         if pos >= self.__m*self.__n/2:
             pos = pos - int(self.__m*self.__n/2)
             self._ext = (1 << pos) ^ self._ext
@@ -127,16 +218,27 @@ class Necklace:
 
     def pair_exchange_random(self):
         """
-        Exchanges the classes of two random nodes in the necklace
+        Exchanges the classes of two random nodes of opposite class in the necklace.
+        The second node is redrawn until its class differs, about two draws in a balanced state.
+        Streams with pre-drawn positions (RandomStream.position) are used for the positions.
         :return:
         """
-        pos1 = int(self.__m*self.__n*random.random())
-        pos2 = int(self.__m*self.__n*random.random())
-        val1 = self.val_at_pos(pos1)
-        val2 = self.val_at_pos(pos2)
-        while pos1 == pos2 or val1 == val2:
-            pos2 = int(self.__m*self.__n*random.random())
-            val2 = self.val_at_pos(pos2)
+        size = self.__m*self.__n
+        rng = self._rng
+        position = getattr(rng,'position',None)
+        pos1 = position(size) if position else int(size*rng.random())
+        pos2 = pos1
+
+        # Without nodes of both classes there is nothing to exchange
+        if 0 < self.__ones < size:
+            half = self.__half
+            ring = self._ring
+            ext = self._ext
+            val1 = ((ext >> (pos1 - half)) if pos1 >= half else (ring >> pos1)) & 1
+            while True:
+                pos2 = position(size) if position else int(size*rng.random())
+                if (((ext >> (pos2 - half)) if pos2 >= half else (ring >> pos2)) & 1) != val1:
+                    break
 
         self.pair_exchange(pos1,pos2)
         self.__lastPos1 = pos1
@@ -155,43 +257,120 @@ class Necklace:
         :param pos1: position of first node
         :param pos2: position of second noce
         """
-        if pos1 >= int(self.__m * self.__n / 2):
-            self._ext = self._ext ^ (1 << pos1 - int(self.__m * self.__n / 2))
+        if pos1 == pos2:
+            return
+        de,d_ones = self.__delta_pair(pos1,pos2)
+        self.__energy += de
+        self.__ones += d_ones
+
+        half = self.__half
+        if pos1 >= half:
+            self._ext = self._ext ^ (1 << pos1 - half)
         else:
             self._ring = self._ring ^ (1 << pos1)
 
-        if pos2 >= int(self.__m * self.__n / 2):
-            self._ext = self._ext ^ (1 << pos2 - int(self.__m * self.__n / 2))
+        if pos2 >= half:
+            self._ext = self._ext ^ (1 << pos2 - half)
         else:
             self._ring = self._ring ^ (1 << pos2)
 
+    def delta_energy(self,pos1,pos2):
+        """
+        Calculates the energy change of exchanging two nodes without performing the exchange
+        :param pos1: position of first node
+        :param pos2: position of second node
+        :return: Energy difference of the exchange
+        """
+        if pos1 == pos2:
+            return 0
+        return self.__delta_pair(pos1,pos2)[0]
+
+    def __flip(self,pos):
+        """
+        Energy change of flipping the class of a single node, without the penalty term
+        :param pos: Position of the node
+        :return: Class of the node, energy difference
+        """
+        half = self.__half
+        if pos >= half:
+            # External node, only connected to the ring node of its site
+            pos -= half
+            x = (self._ext >> pos) & 1
+            return x, 1 - 2 * (x ^ ((self._ring >> pos) & 1))
+        m = self.__m
+        ring = self._ring
+        x = (ring >> pos) & 1
+        unequal = x ^ ((self._ext >> pos) & 1)
+        if m == 1:
+            return x, 1 - 2 * unequal
+        # Both ring neighbours, for m = 2 this is the same node connected twice
+        unequal += (x ^ ((ring >> (pos - 1) % m) & 1)) + (x ^ ((ring >> (pos + 1) % m) & 1))
+        return x, 3 - 2 * unequal
+
+    def __delta_pair(self,pos1,pos2):
+        """
+        Calculates the energy change of flipping the classes of two distinct nodes
+        :return: Energy difference, change of the number of nodes in class 1
+        """
+        x1,de1 = self.__flip(pos1)
+        x2,de2 = self.__flip(pos2)
+
+        # Connections between the two nodes do not change, but are counted by both single flips
+        half = self.__half
+        m = self.__m
+        if pos1 < half and pos2 < half:
+            d = abs(pos1 - pos2)
+            bonds = (d == 1) + (d == m - 1)
+        else:
+            bonds = 1 if abs(pos1 - pos2) == half else 0
+        de = de1 + de2
+        if bonds:
+            de += 2 * bonds * (2 * (x1 ^ x2) - 1)
+
+        # Change of the quadratic penalty term
+        d_ones = 2 - 2 * (x1 + x2)
+        c = self.__ones - half
+        de += (c + d_ones)**2 - c**2
+        return de,d_ones
+
     def get_lumped_index(self,e=0):
         """
         Returns the index of the state in the lumped model
         :param e: Energy of the state, if not set it will be calculated automatically
-        :return:
+        :return: Index in allEnergies, dims_lumped (overflow bin) if the energy is not in allEnergies
         """
         if e == 0:
-            e = self.get_energy()
-        res = np.where(self.allEnergies == e)
-        if len(res[0]) == 0:
-            print('Could not find energy ' + str(e))
-            print('In array: ' + str(self.allEnergies))
-            self.print()
-            self.undo_random_exchange()
-            self.print()
-            sys.exit()
-        return res[0][0]
-
-    def get_free_energy(self,degeneracies):
-        """
-        Gets the current free energy of the necklace
+            e = self.__energy
+        idx = self._lumped_table[min(e,len(self._lumped_table)-1)]
+        if idx == self.dims_lumped:
+            self.overflow_count += 1
+        return idx
+
+    def get_lumped_indices(self,energies):
+        """
+        Returns the indices of many states in the lumped model
+        :param energies: Array of energies
+        :return: Array of indices, dims_lumped (overflow bin) where the energy is not in allEnergies
+        """
+        idx = self._lumped_table[np.minimum(energies,len(self._lumped_table)-1)]
+        self.overflow_count += int(np.count_nonzero(idx == self.dims_lumped))
+        return idx
+
+    def get_free_energy(self,T,degeneracies=None):
+        """
+        Gets the free energy F = E - T*ln(g(E)) of the energy level of the current necklace state
+        :param T: Temperature
+        :param degeneracies: Degeneracies aligned with allEnergies, if not set the exact ones are used
         :return: Free energy
         """
+        if degeneracies is None:
+            degeneracies = exact_degeneracies(self)
         energy = self.get_energy()
         idx = self.get_lumped_index(e=energy)
-        deg = degeneracies[idx]
-        # TODO: deg is currently normalized, should multiply total number of states for real degs?
+        if idx == self.dims_lumped:
+            return np.inf
+        deg = log_degeneracies(degeneracies[idx:idx+1])[0]
+        return energy - T*deg
 
     def print(self,inline=False,expanded=False):
         """
@@ -216,9 +395,8 @@ class Necklace:
         :param nkl: Other necklace
         :return: New second necklace
         """
-        randInt = int((self.__m*self.__n-2)*random.random())+1
-        swap_pos = np.arange(randInt,self.__m*self.__n,dtype=int)
-        for x in swap_pos:
+        randInt = int((self.__m*self.__n-2)*self._rng.random())+1
+        for x in range(randInt,self.__m*self.__n):
             if self.val_at_pos(x) != nkl.val_at_pos(x):
                 self.change_class(x)
                 nkl.change_class(x)
@@ -228,39 +406,43 @@ class Necklace:
         """
         Mutates a random bit of the necklaces to the other class
         """
-        randInt = int(self.__m*self.__n*random.random())
+        randInt = int(self.__m*self.__n*self._rng.random())
         self.change_class(randInt)
 
     def get_copy(self):
-        """Returns a copy of it self."""
-        nkl = Necklace(self.__m,self.__n)
-        nkl._ring = self._ring
-        nkl._ext = self._ext
-        nkl._ring_expanded = self._ring_expanded
-        nkl._ext_expanded = self._ext_expanded
-        nkl._expanded_bits = self._expanded_bits
+        """Returns a copy of it self, using the same random generator."""
+        nkl = Necklace.__new__(Necklace)
+        nkl.copy_from(self)
         return nkl
 
+    def copy_from(self,nkl):
+        """
+        Overwrites the necklace with a copy of another one, without running the constructor
+        :param nkl: Necklace to copy, its random generator and metadata are shared
+        """
+        self.__m = nkl.__m
+        self.__n = nkl.__n
+        self.__half = nkl.__half
+        self.__lastPos1 = 0
+        self.__lastPos2 = 0
+        self.__meta = nkl.__meta
+        self.overflow_count = 0
+        self._ring = nkl._ring
+        self._ext = nkl._ext
+        self.__energy = nkl.__energy
+        self.__ones = nkl.__ones
+        self._ring_expanded = nkl._ring_expanded
+        self._ext_expanded = nkl._ext_expanded
+        self._expanded_bits = nkl._expanded_bits
+        self._rng = nkl._rng
+
     def expand(self,nbits=5):
         """
         Expand integers of _site and _ext that each node is represented by nbits bits.
         """
         self._expanded_bits = nbits
-        self._ring_expanded = 0
-        self._ext_expanded = 0
-        # Ring expansion
-        for i in range(self.__m-1,-1,-1):
-            for k in range(nbits):
-                self._ring_expanded = self._ring_expanded << 1
-                if self.val_at_pos(i) == 1:
-                    self._ring_expanded += 1
-        # Externals expansion
-        if self.__n > 0:
-            for i in range(self.__m-1,-1,-1):
-                for k in range(nbits):
-                    self._ext_expanded = self._ext_expanded << 1
-                    if self.val_at_pos(i+self.__m):
-                        self._ext_expanded += 1
+        self._ring_expanded = bits_to_int(np.repeat(int_to_bits(self._ring,self.__m),nbits))
+        self._ext_expanded = bits_to_int(np.repeat(int_to_bits(self._ext,self.__m),nbits))
 
     def collapse(self):
         """
@@ -271,27 +453,40 @@ class Necklace:
             print('Necklace was never expanded')
             return
 
-        # Reset collapsed state integers
-        self._ring = 0
-        self._ext = 0
-
-        # collapse ring
-        s = bin(self._ring_expanded)[2:].zfill(self.__m * self._expanded_bits)
-        for i in range(0,self.__m*self._expanded_bits, self._expanded_bits):
-            count1 = s[i:i+self._expanded_bits].count('1')
-            self._ring = self._ring << 1
-            if count1 > int(self._expanded_bits / 2):
-                self._ring += 1
+        # Majority vote in each block of nbits bits
+        ring = bits_to_int(self.__majorities(self._ring_expanded))
         # Check if external exists
         if self.__n < 2:
+            self.set_state(ring,0)
             return
-        # collapse externals
-        s = bin(self._ext_expanded)[2:].zfill(self.__m * self._expanded_bits)
-        for i in range(0,self.__m*self._expanded_bits, self._expanded_bits):
-            count1 = s[i:i+self._expanded_bits].count('1')
-            self._ext = self._ext << 1
-            if count1 > int(self._expanded_bits / 2):
-                self._ext += 1
+        ext = bits_to_int(self.__majorities(self._ext_expanded))
+        self.set_state(ring,ext)
+
+    def __majorities(self,expanded):
+        """
+        Majority vote of all blocks in an expanded integer
+        :param expanded: Expanded integer with m blocks of nbits bits
+        :return: Boolean array with the class of each node
+        """
+        blocks = int_to_bits(expanded,self.__m*self._expanded_bits).reshape(self.__m,self._expanded_bits)
+        return np.count_nonzero(blocks,axis=1) > int(self._expanded_bits / 2)
+
+    def __collapse_block(self,pos):
+        """
+        Updates the collapsed node that contains the given bit of the expanded representation
+        :param pos: Position in the expanded representation
+        """
+        nbits = self._expanded_bits
+        block = pos // nbits
+        if pos >= int(self.__m*self.__n/2*nbits):
+            block_bits = (self._ext_expanded >> ((block - self.__m) * nbits)) & ((1 << nbits) - 1)
+            node = block - self.__m + int(self.__m*self.__n/2)
+        else:
+            block_bits = (self._ring_expanded >> (block * nbits)) & ((1 << nbits) - 1)
+            node = block
+        val = 1 if bin(block_bits).count('1') > int(nbits / 2) else 0
+        if val != self.val_at_pos(node):
+            self.change_class(node)
 
     def class_at_pos_expanded(self,pos):
         """Checks the class of the bit at given pos in expanded representation"""
@@ -309,37 +504,43 @@ class Necklace:
 
     def change_class_expanded(self,pos):
         """
-        :param pos:
-        :return:
+        Changes the class of a bit in the expanded representation and updates the collapsed node of its block
+        :param pos: Position in the expanded representation
         """
         if pos >= self.__m*self.__n*self._expanded_bits:
             sys.exit('Pos too big in change_class!')
 
         if pos >= self.__m*self.__n/2*self._expanded_bits:
-            pos = pos - int(self.__m * self.__n / 2 * self._expanded_bits)
-            self._ext_expanded = (1 << pos) ^ self._ext_expanded
+            ext_pos = pos - int(self.__m * self.__n / 2 * self._expanded_bits)
+            self._ext_expanded = (1 << ext_pos) ^ self._ext_expanded
         else:
             self._ring_expanded = (1 << pos) ^ self._ring_expanded
 
         # Update state integers
-        self.collapse()
+        self.__collapse_block(pos)
 
     def mutate_expanded(self):
         """
         Mutates a random bit in the expanded states and calculates new collapsed states.
         """
-        randInt = int(self.__m * self.__n * self._expanded_bits * random.random())
+        randInt = int(self.__m * self.__n * self._expanded_bits * self._rng.random())
         self.change_class_expanded(randInt)
-        self.collapse()
 
     def crossover_expanded(self,nkl):
         """Generates the crossover of two expanded necklaces"""
-        randInt = int((self.__m * self.__n * self._expanded_bits - 2) * random.random()) + 1
-        swap_pos = np.arange(randInt, self.__m * self.__n * self._expanded_bits, dtype=int)
-        for x in swap_pos:
-            if self.class_at_pos_expanded(x) != nkl.class_at_pos_expanded(x):
-                self.change_class_expanded(x)
-                nkl.change_class_expanded(x)
+        randInt = int((self.__m * self.__n * self._expanded_bits - 2) * self._rng.random()) + 1
+        ring_bits = int(self.__m * self.__n / 2 * self._expanded_bits)
+
+        # Exchange all bits from randInt on with one masked XOR per integer
+        ring_mask = -1 << randInt
+        ext_mask = -1 << max(randInt - ring_bits, 0)
+        diff = (self._ring_expanded ^ nkl._ring_expanded) & ring_mask
+        self._ring_expanded ^= diff
+        nkl._ring_expanded ^= diff
+        diff = (self._ext_expanded ^ nkl._ext_expanded) & ext_mask
+        self._ext_expanded ^= diff
+        nkl._ext_expanded ^= diff
+
         # Update collapsed necklace states
         self.collapse()
         nkl.collapse()
@@ -353,20 +554,106 @@ class Necklace:
             print('Necklace was never expanded!')
             return
         # Get positions to set to one
-        a = []
+        a = set()
         while len(a) < self.__m*self.__n*self._expanded_bits/2:
-            x = int(self.__m*self.__n*self._expanded_bits*random.random())
-            if x not in a:
-                a.append(x)
-        # Set the expanded states to nothing
+            x = int(self.__m*self.__n*self._expanded_bits*self._rng.random())
+            a.add(x)
+        # Set half of the state to one
+        ring_bits = int(self.__m * self.__n / 2 * self._expanded_bits)
         self._ring_expanded = 0
         self._ext_expanded = 0
-        # Change classes of half of the state
         for x in a:
-            self.change_class_expanded(x)
+            if x >= ring_bits:
+                self._ext_expanded |= 1 << (x - ring_bits)
+            else:
+                self._ring_expanded |= 1 << x
+        self.collapse()
+
+
+def int_to_bits(x, width):
+    """
+    Converts an integer into a boolean array with the least significant bit first
+    :param x: Non-negative integer
+    :param width: Number of bits
+    :return: Boolean array of length width
+    """
+    raw = np.frombuffer(x.to_bytes((width + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder='little')[:width].astype(bool)
+
+
+def bits_to_int(bits):
+    """
+    Converts a boolean array with the least significant bit first into an integer
+    :param bits: Boolean array
+    :return: Integer
+    """
+    return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
 
 
+def lumped_index_table(all_energies):
+    """
+    Creates a table that maps every energy up to max(all_energies)+1 to its index in all_energies.
+    Energies not in all_energies map to len(all_energies), larger energies are clipped to the last entry.
+    :param all_energies: Sorted array of the energies of the lumped model
+    :return: Integer array indexed by energy
+    """
+    table = np.full(int(all_energies[-1]) + 2, len(all_energies), dtype=np.intp)
+    table[all_energies] = np.arange(len(all_energies))
+    return table
+
+
+
+class NecklacePool:
+    """
+    Recycles discarded necklaces, so that copies in a population do not allocate new objects
+    """
+
+    def __init__(self):
+        self.__free = []
+
+    def __len__(self):
+        return len(self.__free)
+
+    def copy(self, nkl):
+        """
+        Returns a copy of a necklace, reusing a released necklace if there is one
+        :param nkl: Necklace to copy
+        :return: Copy of the necklace
+        """
+        if not self.__free:
+            return nkl.get_copy()
+        copy = self.__free.pop()
+        copy.copy_from(nkl)
+        return copy
+
+    def release(self, necklaces):
+        """
+        Gives necklaces back to the pool, they must not be used anywhere else afterwards
+        :param necklaces: Iterable of necklaces
+        """
+        self.__free.extend(necklaces)
+
 
+_metadata = {}
+
+
+def necklace_metadata(m, n):
+    """
+    Returns the metadata of all necklaces of one size, which is computed only once
+    :param m: Number of sites
+    :param n: Number of nodes per site
+    :return: Dictionary with allEnergies, dims_states, dims_lumped and lumped_table
+    """
+    if (m, n) not in _metadata:
+        if m % 2 == 0:
+            all_energies = np.arange(2, m * 2 + 1, 2)
+        else:
+            all_energies = np.arange(2, m * 2 + 1, 1)
+        _metadata[(m, n)] = {'allEnergies': all_energies,
+                             'dims_states': binom(int(m * n), int(m * n / 2)),
+                             'dims_lumped': len(all_energies),
+                             'lumped_table': lumped_index_table(all_energies)}
+    return _metadata[(m, n)]
 
 
 if __name__ == '__main__':
@@ -375,4 +662,3 @@ if __name__ == '__main__':
     for i in range(20):
         nkl.mutate()
         print(nkl.get_energy())
-
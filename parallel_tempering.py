@@ -0,0 +1,84 @@
+import sys
+import numpy as np
+from necklace_model import Necklace
+from necklace_ensemble import NecklaceEnsemble
+
+
+class ParallelTempering:
+    """
+    A class for running replica exchange (parallel tempering) on the necklace model.
+    One replica is simulated at each temperature of a ladder and neighbouring replicas
+    periodically try to exchange their states.
+    """
+
+    def __init__(self):
+        self.__temps = []
+        self.__model = Necklace(2,2)
+
+    def set_temps(self, temps):
+        """
+        Sets the temperature ladder, sorted from cold to hot
+        :param temps: Array of temperatures
+        """
+        self.__temps = np.sort(np.asarray(temps,dtype=float))
+
+    def set_model(self, model):
+        self.__model = model
+
+    def run(self,num_steps=1000,swap_steps=10,seed=None):
+        """
+        Runs the replica exchange simulation
+        :param num_steps: Number of Metropolis steps of every replica
+        :param swap_steps: Number of steps between two exchange attempts
+        :param seed: Seed for the random generator
+        :return: Energy of each temperature per step, Best energy, Swap acceptance rate of each neighbouring pair
+        """
+        if len(self.__temps) < 2:
+            sys.exit('ParallelTempering: At least two temperatures needed, use set_temps')
+
+        n_temps = len(self.__temps)
+        ensemble = NecklaceEnsemble(self.__model,n_temps,rng=np.random.default_rng(seed))
+        betas = 1 / self.__temps
+
+        energiesArr = np.empty([num_steps,n_temps])
+        energiesVBSF = np.empty(num_steps)
+        swaps_tried = np.zeros(n_temps-1)
+        swaps_accepted = np.zeros(n_temps-1)
+        e_best = np.min(ensemble.energies)
+
+        rounds = 0
+        for step in range(num_steps):
+            # Row k of the ensemble is always at temperature k
+            e_cur = ensemble.metropolis_step(self.__temps)
+            energiesArr[step] = e_cur
+            e_best = min(e_best,np.min(e_cur))
+            energiesVBSF[step] = e_best
+
+            if (step+1) % swap_steps != 0:
+                continue
+
+            # Try to exchange even and odd neighbouring pairs alternately
+            lower = np.arange(rounds % 2,n_temps-1,2)
+            upper = lower + 1
+            rounds += 1
+            energies = ensemble.energies
+            delta = (betas[lower] - betas[upper]) * (energies[lower] - energies[upper])
+            accept = ensemble.rng.random(len(lower)) < np.exp(np.minimum(delta,0))
+            swaps_tried[lower] += 1
+            swaps_accepted[lower[accept]] += 1
+            ensemble.swap_walkers(lower[accept],upper[accept])
+
+        with np.errstate(invalid='ignore'):
+            swap_rates = swaps_accepted / swaps_tried
+        return energiesArr,energiesVBSF,swap_rates
+
+
+def geometric_temps(t_min,t_max,n_temps):
+    """
+    Creates a geometric temperature ladder, which gives similar swap rates if the heat capacity is constant
+    :param t_min: Lowest temperature
+    :param t_max: Highest temperature
+    :param n_temps: Number of temperatures
+    :return: Array of temperatures
+    """
+    return t_min * (t_max/t_min)**(np.arange(n_temps)/(n_temps-1))
@@ -0,0 +1,385 @@
+import sys
+import numpy as np
+from necklace_model import Necklace, int_to_bits
+
+
+class RejectionFreeSampler:
+    """
+    Rejection-free (n-fold way) sampler for an ensemble of necklaces.
+    For every walker the sampler keeps the number of opposite-class pair moves of Necklace.pair_exchange_random
+    for every energy change. A Metropolis step proposes each of these moves with equal probability, so the chance
+    that a step accepts any move is the sum of the Metropolis rates over all moves divided by their number.
+    Instead of proposing moves, the sampler draws the number of steps each walker waits for its next accepted
+    move and only carries out that move, picked with probability proportional to its rate.
+    The energy change of a pair move is the sum of the single flip changes of its nodes, plus a correction if the
+    nodes are connected. Nodes are therefore kept in buckets of equal class and flip change and connected pairs
+    of opposite classes in lists of equal energy change, which a move only touches around the moved nodes.
+    """
+
+    # Acceptance rate below which a step of the sampler is faster than a Metropolis step of Annealer.run, a move
+    # costs about as much as 8 Metropolis proposals (benchmarks.py, annealer.run_cold and run_rejection_free)
+    break_even = 0.08
+
+    def __init__(self, ensemble):
+        """
+        Initializes the move tables of all walkers
+        :param ensemble: List of necklaces, which are changed in place and draw from their own random generator
+        """
+        m, n = ensemble[0].get_size()
+        if n > 2:
+            sys.exit('RejectionFreeSampler: Currently only n < 3 is implemented')
+        self.ensemble = ensemble
+        self.__m = m
+        self.__half = int(m * n / 2)
+
+        # Bit of every node position in the state vector [ring bits, external bits], as in Necklace.val_at_pos.
+        # Ring bits beyond the ring nodes (n = 1) are always 0 but still connected.
+        pos = np.arange(int(m * n))
+        self.__bits = np.where(pos < self.__half, pos, m + pos - self.__half).tolist()
+        self.__pos = [-1] * (2 * m)
+        for p, b in enumerate(self.__bits):
+            self.__pos[b] = p
+
+        # Connections between the bits with multiplicity, ring neighbours and ring to external node of each site.
+        # A ring of one site is not connected to itself.
+        adj = np.zeros([2 * m, 2 * m], dtype=int)
+        for t in range(m):
+            if m > 1:
+                adj[t, (t + 1) % m] += 1
+                adj[(t + 1) % m, t] += 1
+            adj[t, m + t] += 1
+            adj[m + t, t] += 1
+        self.__neighbours = [[(int(c), int(adj[b, c])) for c in np.flatnonzero(adj[b])] for b in range(2 * m)]
+        self.__degree = adj.sum(axis=1).tolist()
+        max_degree = max(self.__degree)
+
+        # Connections between two nodes, which stay unequal in a pair exchange: bonds, bonds of every bit
+        is_node = np.zeros(2 * m, dtype=bool)
+        is_node[self.__bits] = True
+        self.__bonds = [(a, b, int(adj[a, b])) for a in range(2 * m) for b in range(a + 1, 2 * m)
+                        if adj[a, b] > 0 and is_node[a] and is_node[b]]
+        self.__bit_bonds = [[] for b in range(2 * m)]
+        for i, (a, b, mult) in enumerate(self.__bonds):
+            self.__bit_bonds[a].append(i)
+            self.__bit_bonds[b].append(i)
+        self.__adjacent = [set(c for c, mult in x) for x in self.__neighbours]
+        # Nodes whose flip change depends on the class of a bit: the bit and its connected nodes
+        self.__around = [set([b] + [c for c, mult in self.__neighbours[b] if is_node[c]]) for b in range(2 * m)]
+
+        # Single flip changes lie within -fmax..fmax, index v holds the change v-fmax.
+        # Energy changes of pair moves lie within -offset..offset, class c holds the moves with change c-offset.
+        self.__fmax = max_degree
+        self.__offset = 2 * max_degree + 2 * int(adj.max())
+        self.delta_energies = np.arange(-self.__offset, self.__offset + 1)
+        # Class of a pair of nodes with flip changes of index v1 and v0 without connection, minus v1 + v0
+        self.__base = self.__offset - 2 * max_degree
+
+        # Move tables of all walkers, number of moves in each class
+        size = len(ensemble)
+        self.__tables = [None] * size
+        self.counts = np.zeros([size, len(self.delta_energies)], dtype=int)
+        self.n_moves = np.zeros(size, dtype=int)
+        self.energies = np.zeros(size, dtype=int)
+
+        # Waiting for the next move: hazard accumulated since the last move and the exponential threshold at
+        # which the move happens
+        self.__hazard = np.zeros(size)
+        self.__threshold = np.zeros(size)
+        for k in range(size):
+            self.refresh(k)
+
+        # Physical time of every walker in Metropolis steps
+        self.time = np.zeros(size)
+
+        # Walkers that moved in the last step
+        self.accepted = np.zeros(size, dtype=bool)
+
+        # Profiler timing the phases of step, if set
+        self.profiler = None
+
+    def refresh(self, k):
+        """
+        Rebuilds the move table of walker k from the state of its necklace and restarts its waiting time
+        :param k: Index of the walker
+        """
+        nkl = self.ensemble[k]
+        m = self.__m
+        width = 2 * self.__fmax + 1
+        x = np.concatenate([int_to_bits(nkl._ring, m), int_to_bits(nkl._ext, m)]).astype(int).tolist()
+        f = [0] * (2 * m)
+        # Bits of class c with single flip change v in buckets[c][v], slot of every bit in its bucket
+        buckets = [[[] for v in range(width)] for c in range(2)]
+        slots = [0] * (2 * m)
+        # Connected pairs of opposite classes by their flip changes, lists of these bonds by energy change
+        connected = [[0] * width for v in range(width)]
+        bond_lists = [[] for c in range(len(self.delta_energies))]
+        bond_slots = [-1] * len(self.__bonds)
+        counts = [0] * len(self.delta_energies)
+        table = (x, f, buckets, slots, connected, bond_lists, bond_slots, counts)
+        self.__tables[k] = table
+
+        for b in self.__bits:
+            f[b] = self.__flip(x, b)
+            self.__add_bit(table, b, 1)
+        for i in range(len(self.__bonds)):
+            self.__add_bond(table, i, 1)
+        self.counts[k] = counts
+        ones = sum(x[b] for b in self.__bits)
+        self.n_moves[k] = ones * (len(self.__bits) - ones)
+        self.energies[k] = nkl.get_energy()
+        self.__hazard[k] = 0
+        self.__threshold[k] = -np.log(1 - nkl._rng.random())
+
+    def __flip(self, x, b):
+        """
+        Energy change of flipping bit b alone, without the penalty term, as Necklace.__flip
+        """
+        unequal = 0
+        for c, mult in self.__neighbours[b]:
+            if x[c] != x[b]:
+                unequal += mult
+        return self.__degree[b] - 2 * unequal
+
+    def __add_bit(self, table, b, sign):
+        """
+        Adds (sign 1) or removes (sign -1) bit b to the bucket of its class and flip change, together with its
+        pairs with all nodes of the other class
+        """
+        x, f, buckets, slots = table[:4]
+        counts = table[7]
+        v = f[b] + self.__fmax
+        bucket = buckets[x[b]][v]
+        if sign > 0:
+            slots[b] = len(bucket)
+            bucket.append(b)
+        else:
+            last = bucket.pop()
+            if last != b:
+                bucket[slots[b]] = last
+                slots[last] = slots[b]
+        c = v + self.__base
+        for other in buckets[1 - x[b]]:
+            if other:
+                counts[c] += sign * len(other)
+            c += 1
+
+    def __add_bond(self, table, i, sign):
+        """
+        Adds (sign 1) or removes (sign -1) bond i if its nodes have opposite classes. Its pair changes the energy
+        by 2*mult more than the two single flips.
+        """
+        x, f = table[:2]
+        a, b, mult = self.__bonds[i]
+        if x[a] == x[b]:
+            return
+        if x[a] == 0:
+            a, b = b, a
+        connected, bond_lists, bond_slots, counts = table[4:]
+        v1 = f[a] + self.__fmax
+        v0 = f[b] + self.__fmax
+        c = v1 + v0 + self.__base
+        connected[v1][v0] += sign
+        counts[c] -= sign
+        counts[c + 2 * mult] += sign
+        bonds = bond_lists[c + 2 * mult]
+        if sign > 0:
+            bond_slots[i] = len(bonds)
+            bonds.append(i)
+        else:
+            last = bonds.pop()
+            if last != i:
+                bonds[bond_slots[i]] = last
+                bond_slots[last] = bond_slots[i]
+            bond_slots[i] = -1
+
+    def rates(self, T):
+        """
+        Returns the Metropolis rate of the moves in every class, as used by Annealer.run
+        :param T: Temperature, may be inf or 0
+        :return: Array of rates aligned with delta_energies
+        """
+        de = self.delta_energies
+        if T == np.inf:
+            return np.ones(len(de))
+        if T == 0:
+            return (de < 0).astype(float)
+        return np.where(de < 0, 1., np.exp(-np.maximum(de, 0) / T))
+
+    def acceptance(self, T):
+        """
+        Returns the probability of every walker to accept a move in one Metropolis step
+        :param T: Temperature
+        :return: Array of probabilities
+        """
+        total = self.counts @ self.rates(T)
+        return np.divide(total, self.n_moves, out=np.zeros(len(total)), where=self.n_moves > 0)
+
+    def __choose(self, k, rates):
+        """
+        Chooses a move of walker k with probability proportional to its rate
+        :param k: Index of the walker
+        :param rates: List of the rates of the classes
+        :return: Position of the node of class 1, position of the node of class 0
+        """
+        rng = self.ensemble[k]._rng
+        x, f, buckets, slots, connected, bond_lists, bond_slots, counts = self.__tables[k]
+
+        # Choose the class by its total rate
+        weights = [n * r for n, r in zip(counts, rates)]
+        r = rng.random() * sum(weights)
+        c = -1
+        for i, w in enumerate(weights):
+            if w > 0 and r < w:
+                c = i
+                break
+            r -= w
+        if c < 0:
+            # Round-off can leave r above the last weight, the move is then in the last class with positive rate
+            c = max(i for i, w in enumerate(weights) if w > 0)
+
+        # Within the class, choose between the connected pairs and the unconnected pairs of each combination of
+        # flip changes that adds up to the class
+        r = int(rng.random() * counts[c])
+        if r < len(bond_lists[c]):
+            a, b, mult = self.__bonds[bond_lists[c][r]]
+            if x[a] == 0:
+                a, b = b, a
+            return self.__pos[a], self.__pos[b]
+        r -= len(bond_lists[c])
+        width = len(connected)
+        for v1 in range(max(c - self.__base - width + 1, 0), min(c - self.__base + 1, width)):
+            v0 = c - self.__base - v1
+            ones = buckets[1][v1]
+            zeros = buckets[0][v0]
+            r -= len(ones) * len(zeros) - connected[v1][v0]
+            if r < 0:
+                break
+
+        # Uniform unconnected pair of the two buckets, connected pairs are drawn again
+        while True:
+            a = ones[int(len(ones) * rng.random())]
+            b = zeros[int(len(zeros) * rng.random())]
+            if b not in self.__adjacent[a]:
+                return self.__pos[a], self.__pos[b]
+
+    def __move(self, k, rates):
+        """
+        Performs a move of walker k, chosen with probability proportional to its rate, and updates the move table
+        around the two nodes
+        :param k: Index of the walker
+        :param rates: List of the rates of the classes
+        """
+        pos1, pos2 = self.__choose(k, rates)
+        self.ensemble[k].pair_exchange(pos1, pos2)
+
+        table = self.__tables[k]
+        x, f = table[:2]
+        b1 = self.__bits[pos1]
+        b2 = self.__bits[pos2]
+        # Flip changes of the two nodes and their neighbours change, as do the bonds of these nodes
+        changed = self.__around[b1] | self.__around[b2]
+        bonds = set()
+        for b in changed:
+            bonds.update(self.__bit_bonds[b])
+
+        for i in bonds:
+            self.__add_bond(table, i, -1)
+        for b in changed:
+            self.__add_bit(table, b, -1)
+        x[b1] = 0
+        x[b2] = 1
+        for b in changed:
+            f[b] = self.__flip(x, b)
+            self.__add_bit(table, b, 1)
+        for i in bonds:
+            self.__add_bond(table, i, 1)
+        self.counts[k] = table[7]
+
+    def __move_walkers(self, movers, rates):
+        """
+        Moves the given walkers and draws their next waiting times
+        :param movers: Indices of the walkers
+        :param rates: Rates of the classes
+        """
+        for k in movers:
+            nkl = self.ensemble[k]
+            self.__move(k, rates)
+            self.energies[k] = nkl.get_energy()
+            self.__hazard[k] = 0
+            self.__threshold[k] = -np.log(1 - nkl._rng.random())
+
+    def __hazards(self, T):
+        """
+        Returns the hazard of every walker for one Metropolis step, the step accepts a move with probability
+        1 - exp(-hazard)
+        """
+        with np.errstate(divide='ignore'):
+            return -np.log1p(-np.minimum(self.acceptance(T), 1))
+
+    def step(self, T, e_best=np.inf):
+        """
+        Advances all walkers by one Metropolis step, with the same distribution of the new states as
+        Annealer.run. Each walker accumulates the hazard of the step and only the walkers whose waiting time
+        ends in this step carry out a move.
+        :param T: Temperature
+        :param e_best: Best energy so far
+        :return: Sum of the energies before the step, best energy so far, number of accepted moves
+        """
+        prof = self.profiler
+        if prof is not None:
+            t = prof.clock()
+        e_sum = int(self.energies.sum())
+        e_best = min(e_best, int(self.energies.min()))
+        rates = self.rates(T).tolist()
+        self.__hazard += self.__hazards(T)
+        movers = np.flatnonzero(self.__hazard >= self.__threshold)
+        if prof is not None:
+            t = prof.add('rates', t)
+
+        self.__move_walkers(movers.tolist(), rates)
+        self.accepted[:] = False
+        self.accepted[movers] = True
+        self.time += 1
+        if prof is not None:
+            prof.add('rejection_free_move', t)
+        return e_sum, e_best, len(movers)
+
+    def jump(self, T):
+        """
+        Performs the next accepted move of every walker at constant temperature and advances the physical
+        time of each walker by the number of Metropolis steps until the move, as step would do
+        :param T: Temperature
+        :return: Time steps of the walkers, inf for walkers without possible move
+        """
+        rates = self.rates(T).tolist()
+        h = self.__hazards(T)
+        dt = np.full(len(self.ensemble), np.inf)
+        movers = np.flatnonzero(h > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dt[movers] = np.maximum(np.ceil((self.__threshold[movers] - self.__hazard[movers]) / h[movers]), 1)
+        self.__move_walkers(movers.tolist(), rates)
+        self.time += dt
+        self.accepted = np.isfinite(dt)
+        return dt
+
+
+if __name__ == '__main__':
+    # Walkers at constant temperature reach the same mean energy with Metropolis steps and rejection-free jumps
+    T = 0.5
+    ensemble = []
+    for k in range(20):
+        nkl = Necklace(20, 2)
+        ensemble.append(nkl)
+    sampler = RejectionFreeSampler(ensemble)
+    for i in range(2000):
+        sampler.step(T)
+    print('Acceptance rate at T = %.1f: %.4f' % (T, np.mean(sampler.acceptance(T))))
+    print('Mean energy after %d steps: %.3f' % (sampler.time[0], np.mean([x.get_energy() for x in ensemble])))
+    # After a jump the walkers are in the new state, so energies are weighted by the time they are kept
+    e_time = 0
+    t_start = sampler.time.copy()
+    for i in range(200):
+        energies = np.array([x.get_energy() for x in ensemble])
+        e_time += np.sum(energies * sampler.jump(T))
+    print('Time averaged energy over %.0f steps: %.3f' % (np.mean(sampler.time - t_start),
+                                                        e_time / np.sum(sampler.time - t_start)))
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class RandomStream:
+    """
+    A reproducible stream of uniform random numbers based on numpy.random.Generator.
+    Numbers are drawn in batches and handed out one by one, so a RandomStream can replace
+    the random module wherever only random() is used. Random positions, e.g. of proposed nodes,
+    are pre-drawn in their own batches.
+    """
+
+    def __init__(self, seed=None, buffer_size=4096):
+        """
+        Initializes the stream
+        :param seed: Seed or numpy.random.SeedSequence of the stream
+        :param buffer_size: Number of random numbers drawn at once
+        """
+        self.generator = np.random.default_rng(seed)
+        self.buffer_size = buffer_size
+        self.__buffer = []
+        self.__pos = 0
+
+        # Pre-drawn positions and the number of positions they were drawn from
+        self.__positions = []
+        self.__positions_pos = 0
+        self.__positions_size = 0
+
+    def random(self):
+        """
+        Returns the next uniform random number in [0, 1)
+        :return: Random float
+        """
+        if self.__pos >= len(self.__buffer):
+            self.__buffer = self.generator.random(self.buffer_size).tolist()
+            self.__pos = 0
+        x = self.__buffer[self.__pos]
+        self.__pos += 1
+        return x
+
+    def position(self, size):
+        """
+        Returns the next pre-drawn random position in range(size), a new size discards the drawn positions
+        :param size: Number of positions
+        :return: Random integer
+        """
+        if self.__positions_pos >= len(self.__positions) or size != self.__positions_size:
+            self.__positions = self.generator.integers(0, size, self.buffer_size).tolist()
+            self.__positions_pos = 0
+            self.__positions_size = size
+        x = self.__positions[self.__positions_pos]
+        self.__positions_pos += 1
+        return x
+
+    def randoms(self, size):
+        """
+        Returns the next uniform random numbers in [0, 1) of the stream as array
+        :param size: Number of random numbers
+        :return: Array of random floats
+        """
+        rest = np.array(self.__buffer[self.__pos:self.__pos + size])
+        self.__pos += len(rest)
+        if len(rest) == size:
+            return rest
+        return np.concatenate([rest, self.generator.random(size - len(rest))])
+
+
+def spawn_streams(seed, n):
+    """
+    Creates independent random streams, e.g. one for each walker or worker
+    :param seed: Seed or numpy.random.SeedSequence the streams are spawned from
+    :param n: Number of streams
+    :return: List of RandomStream
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [RandomStream(ss) for ss in seed.spawn(n)]
+
@@ -0,0 +1,290 @@
+import numpy as np
+from transition_matrix import TransitionEstimator
+from stopping import TargetEnergy, Stagnation, check_all
+
+
+class Schedule:
+    """
+    Base class of lazy temperature schedules for Annealer.run.
+    Iterating over a schedule yields one temperature per step. After every step the annealer reports the
+    energies and the acceptance rate with observe(), which feedback schedules use to choose the next
+    temperature. A schedule ends after n_steps steps (if set) or as soon as finished is set, e.g. when
+    the best energy reaches target_energy or did not improve for patience steps.
+    """
+
+    # Schedules whose temperatures depend on the results of observe
+    feedback = False
+
+    def __init__(self, n_steps=None, target_energy=None, patience=None):
+        """
+        Initializes the schedule
+        :param n_steps: Maximum number of steps, None for no limit
+        :param target_energy: Stop as soon as the best energy is at most this energy
+        :param patience: Stop if the best energy did not improve for this number of steps
+        """
+        self.n_steps = n_steps
+        self.target_energy = target_energy
+        self.patience = patience
+        # Transition estimator the annealer has to fill, only used by adaptive schedules
+        self.Q = None
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the state of the schedule, called at the start of every iteration
+        """
+        self.finished = False
+        self.stop_reason = None
+        self.__criteria = []
+        if self.target_energy is not None:
+            self.__criteria.append(TargetEnergy(self.target_energy))
+        if self.patience is not None:
+            self.__criteria.append(Stagnation(self.patience))
+
+    def temperature(self, step):
+        """
+        Returns the temperature of a step
+        :param step: Step counter
+        :return: Temperature
+        """
+        raise NotImplementedError
+
+    def observe(self, step, e_mean, e_best, acceptance):
+        """
+        Reports the result of a step to the schedule
+        :param step: Step counter
+        :param e_mean: Mean energy of the walkers before the step
+        :param e_best: Best energy so far
+        :param acceptance: Fraction of accepted moves in the step
+        """
+        reason = check_all(self.__criteria,{'step': step, 'best_energy': e_best})
+        if reason is not None:
+            self.stop(reason)
+
+    def stop(self, reason):
+        """
+        Ends the schedule after the current step
+        :param reason: Reason for stopping
+        """
+        self.finished = True
+        self.stop_reason = reason
+
+    def __iter__(self):
+        self.reset()
+        step = 0
+        while not self.finished and (self.n_steps is None or step < self.n_steps):
+            yield self.temperature(step)
+            step += 1
+
+    def to_array(self):
+        """
+        Creates all temperatures at once, only possible for schedules without feedback
+        :return: Array of temperatures
+        """
+        if self.n_steps is None:
+            raise ValueError('Schedule: Only schedules with n_steps can be converted to an array')
+        if self.feedback or self.target_energy is not None or self.patience is not None:
+            raise ValueError('Schedule: Schedules that observe the run can not be converted to an array')
+        return np.array([self.temperature(step) for step in range(self.n_steps)], dtype=float)
+
+
+class ArraySchedule(Schedule):
+    """
+    Schedule of given temperatures, as set with Annealer.set_temps(array)
+    """
+
+    def __init__(self, temps, **kwargs):
+        self.temps = np.asarray(temps)
+        super().__init__(len(self.temps), **kwargs)
+
+    def temperature(self, step):
+        return self.temps[step]
+
+
+class ConstantSchedule(Schedule):
+    """
+    Schedule with constant temperature, which may be inf or 0
+    """
+
+    def __init__(self, temp, n_steps=None, **kwargs):
+        self.temp = float(temp)
+        super().__init__(n_steps, **kwargs)
+
+    def temperature(self, step):
+        return self.temp
+
+
+class LinearSchedule(Schedule):
+    """
+    Linear schedule from start_temp to end_temp in n_steps steps
+    """
+
+    def __init__(self, n_steps, start_temp=40, end_temp=0.5, **kwargs):
+        self.start_temp = start_temp
+        self.end_temp = end_temp
+        super().__init__(n_steps, **kwargs)
+
+    def temperature(self, step):
+        return self.start_temp + (self.end_temp - self.start_temp) * step / max(self.n_steps - 1, 1)
+
+
+class ExponentialSchedule(LinearSchedule):
+    """
+    Schedule T = start_temp * exp(-t/b), which reaches end_temp after n_steps steps
+    """
+
+    def temperature(self, step):
+        t = step * self.n_steps / max(self.n_steps - 1, 1)
+        b = -self.n_steps / np.log(self.end_temp / self.start_temp)
+        return self.start_temp * np.exp(-t / b)
+
+
+class InverseSchedule(LinearSchedule):
+    """
+    Schedule T = start_temp / (1 + b*t), which reaches end_temp after n_steps steps
+    """
+
+    def temperature(self, step):
+        t = step * self.n_steps / max(self.n_steps - 1, 1)
+        b = (self.start_temp - self.end_temp) / (self.end_temp * self.n_steps)
+        return self.start_temp / (1 + b * t)
+
+
+class LogarithmicSchedule(LinearSchedule):
+    """
+    Schedule T = start_temp / (1 + b*ln(t+1)), which reaches end_temp after n_steps steps
+    """
+
+    def temperature(self, step):
+        t = step * self.n_steps / max(self.n_steps - 1, 1)
+        b = (self.start_temp - self.end_temp) / (self.end_temp * np.log(self.n_steps + 1))
+        return self.start_temp / (1 + b * np.log(t + 1))
+
+
+class PiecewiseSchedule(Schedule):
+    """
+    Schedule that runs several schedules with n_steps one after the other
+    """
+
+    def __init__(self, schedules, **kwargs):
+        self.schedules = schedules
+        self.__ends = np.cumsum([s.n_steps for s in schedules])
+        super().__init__(int(self.__ends[-1]), **kwargs)
+
+    def temperature(self, step):
+        k = int(np.searchsorted(self.__ends, step, side='right'))
+        start = self.__ends[k - 1] if k > 0 else 0
+        return self.schedules[k].temperature(step - start)
+
+
+class FeedbackSchedule(Schedule):
+    """
+    Schedule that cools by the factor cooling per step while the acceptance rate is above target_acceptance
+    and only by cooling**(acceptance/target_acceptance) below it, until end_temp is reached
+    """
+
+    feedback = True
+
+    def __init__(self, start_temp=40, end_temp=0.5, cooling=0.999, target_acceptance=0.5, n_steps=None, **kwargs):
+        self.start_temp = start_temp
+        self.end_temp = end_temp
+        self.cooling = cooling
+        self.target_acceptance = target_acceptance
+        super().__init__(n_steps, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self.T = self.start_temp
+
+    def temperature(self, step):
+        return self.T
+
+    def observe(self, step, e_mean, e_best, acceptance):
+        super().observe(step, e_mean, e_best, acceptance)
+        self.T *= self.cooling ** min(acceptance / self.target_acceptance, 1)
+        if self.T < self.end_temp:
+            self.stop('end temperature reached')
+
+
+class AdaptiveSchedule(Schedule):
+    """
+    Adapted schedule of Annealer.run_adapted. The annealer counts the lumped transitions in Q,
+    from which the temperature is updated every update_steps steps.
+    """
+
+    feedback = True
+
+    def __init__(self, model, therm_speed=1, start_temp=40, end_temp=0.5, update_steps=1, refresh_transitions=0,
+                 degeneracies=None, n_steps=None, **kwargs):
+        """
+        Initializes the schedule
+        :param model: Model of the run
+        :param therm_speed: Thermodynamic speed for the process
+        :param start_temp: Start temperature
+        :param end_temp: End temperature
+        :param update_steps: Number of steps until the temperature is updated
+        :param refresh_transitions: Number of new transitions before the transition matrix estimates are refreshed
+        :param degeneracies: Known degeneracies of the lumped model, estimated from Q if not set
+        """
+        self.model = model
+        self.therm_speed = therm_speed
+        self.start_temp = start_temp
+        self.end_temp = end_temp
+        self.update_steps = update_steps
+        self.refresh_transitions = refresh_transitions
+        self.degeneracies = degeneracies
+        super().__init__(n_steps, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self.Q = TransitionEstimator(self.model.dims_lumped, self.refresh_transitions)
+        self.T = self.start_temp
+        self.degs = np.zeros(self.model.dims_lumped)
+        self.lambda2 = np.nan
+
+    def temperature(self, step):
+        return self.T
+
+    def observe(self, step, e_mean, e_best, acceptance):
+        super().observe(step, e_mean, e_best, acceptance)
+        if step % self.update_steps != 0:
+            return
+        T, degs, self.lambda2 = adapted_temperature(self.Q, self.T, self.therm_speed, self.model.allEnergies,
+                                                    self.degeneracies)
+        if degs is None:
+            return
+        self.T, self.degs = T, degs
+        if T < 0:
+            self.stop('T = 0 reached')
+        elif T < self.end_temp:
+            self.stop('end temperature reached')
+
+
+def adapted_temperature(Q, T, therm_speed, energies, degeneracies=None):
+    """
+    Calculates the next temperature of the adapted schedule from the transition count matrix
+    :param Q: TransitionEstimator counting the transitions of the lumped model
+    :param T: Current temperature
+    :param therm_speed: Thermodynamic speed for the process
+    :param energies: Energies of the lumped model
+    :param degeneracies: Known degeneracies, if not set the stationary distribution of Q is used
+    :return: New temperature, degeneracies (None if T can not be updated), second largest eigenvalue
+    """
+    # Get degeneracies and second largest eigenvalue from the transition matrix
+    degs, lambda2 = Q.estimate()
+    if degeneracies is not None:
+        degs = degeneracies
+    # Statistical quantities
+    z = np.sum(degs*np.exp(-energies/T))
+    if z == 0:
+        return T, None, lambda2
+
+    e_mean = 1/z * np.sum(energies * degs * np.exp(-energies/T))
+    heat_cap = 1/(T**2*z) * np.sum((energies-e_mean)**2*degs*np.exp(-energies/T))
+
+    # Relaxation time of the sampled chain
+    lambda2_clipped = np.clip(lambda2, 10**-12, 1-10**-12)
+    relax_time = -1/np.log(lambda2_clipped)
+    # Update temperature
+    T = T * (1-therm_speed/(relax_time*np.sqrt(heat_cap)))
+    return T, degs, lambda2
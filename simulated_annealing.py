@@ -1,8 +1,17 @@
 import sys
+import multiprocessing
 import numpy as np
-from scipy.sparse.linalg import eigsh
-from necklace_model import Necklace
-import random
+from necklace_model import Necklace, int_to_bits
+from necklace_ensemble import NecklaceEnsemble
+from multispin import MultiSpinEnsemble
+from kernels import run_metropolis
+from transition_matrix import TransitionEstimator
+from rng import spawn_streams
+from checkpoint import Checkpointer, load_checkpoint
+from trace_recorder import TraceRecorder
+from schedules import Schedule, ArraySchedule, adapted_temperature
+from stopping import as_list, reset_all, check_all
+from rejection_free import RejectionFreeSampler
 
 
 class Annealer:
@@ -13,68 +22,224 @@ class Annealer:
     def __init__(self):
         self.__temps = []
         self.__model = Necklace(2,2)
+        self.__degs = None
+        self.__lambda2 = np.nan
+        self.__profiler = None
+        self.__stopping = []
+        self.__stop_reason = None
 
     def set_temps(self, temps):
+        """
+        Sets the temperatures of Annealer.run
+        :param temps: Array of temperatures or Schedule
+        """
         self.__temps = temps
 
     def set_model(self, model):
         self.__model = model
 
-    def run(self,ensemble_size=1):
+    def set_profiler(self, profiler):
+        """
+        Sets a profiler that times the phases of the runs, e.g. instrumentation.Profiler
+        :param profiler: Profiler, None to switch profiling off
+        """
+        self.__profiler = profiler
+
+    def set_degeneracies(self, degs):
+        """
+        Sets known degeneracies of the lumped model, e.g. from WangLandau or exact_degeneracies.
+        run_adapted then uses them instead of the stationary distribution of the transition matrix.
+        :param degs: Degeneracies aligned with model.allEnergies, None to estimate them again
+        """
+        self.__degs = None if degs is None else np.asarray(degs,dtype=float)
+
+    def set_stopping(self, criteria):
+        """
+        Sets stopping criteria that end run and run_adapted early, e.g. stopping.TargetEnergy.
+        The result arrays then end with the step in which a criterion stopped the run.
+        :param criteria: StoppingCriterion or list of them, None to always run until the end
+        """
+        self.__stopping = as_list(criteria)
+
+    def get_stop_reason(self):
+        """
+        Returns why the last run stopped early
+        :return: Reason of the stopping criterion or schedule, None if the run reached its end
+        """
+        return self.__stop_reason
+
+    def __check_stopping(self,step,e_mean,e_best,acceptance,T):
+        """
+        Checks the stopping criteria after a step
+        :return: Reason for stopping, None to continue
+        """
+        return check_all(self.__stopping,{'step': step, 'energy': e_mean, 'best_energy': e_best,
+                                          'acceptance': acceptance, 'temperature': T})
+
+    def __reset_stopping(self):
+        """
+        Resets the stopping criteria and the stop reason at the start of a run
+        """
+        self.__stop_reason = None
+        reset_all(self.__stopping)
+
+    def run(self,ensemble_size=1,vectorized=False,seed=None,backend=None,recorder=None,rejection_free=0):
         """
         Runs the simulated annealing on the model. With a given ensemble size.
-        :return:
+        The temperatures are taken one by one from the array or Schedule set with set_temps, a Schedule
+        gets the result of every step and can end the run early, as can the criteria set with set_stopping.
+        :param vectorized: Run all walkers at once with a NecklaceEnsemble, or with a MultiSpinEnsemble if 'multispin'.
+                           The chain is the same, but it draws other random numbers than the scalar run.
+        :param seed: Seed for the random streams of the walkers, not used by the kernel backends
+        :param backend: Run the Metropolis steps in a kernel, 'numba' (compiled if available) or 'python'.
+                        Only for Necklace models and schedules without feedback.
+        :param recorder: TraceRecorder for the energy, temperature and acceptance rate of every step and the
+                         energies of the walkers, not used by the kernel backends
+        :param rejection_free: Switch to the RejectionFreeSampler once the mean acceptance rate of the last steps
+                               falls below this rate and below RejectionFreeSampler.break_even, where it is faster,
+                               and back if it rises above twice that rate. 0 to never switch, 1 to switch whenever
+                               it is faster. Only used without vectorized and backend and with schedules that do
+                               not count transitions.
+        :return: Mean energy, Best energy, truncated if the run stopped early (see get_stop_reason)
         """
         # Check if all functions/variables are set
-        if len(self.__temps) == 0:
+        if not isinstance(self.__temps,Schedule) and len(self.__temps) == 0:
             sys.exit('Annealer: Temperatures not set, use set_temps')
         if self.__model == 0:
             sys.exit('Annealer: Model not set, use set_model(model)')
+        schedule = self.__temps if isinstance(self.__temps,Schedule) else ArraySchedule(self.__temps)
+        self.__reset_stopping()
+
+        if rejection_free > 0 and (vectorized or backend is not None or schedule.Q is not None):
+            print('Annealer: The rejection-free sampler is only used by the scalar run without transition counts')
+        if vectorized:
+            return self.__run_vectorized(ensemble_size,vectorized,seed,recorder,schedule)
+        if backend is not None and not isinstance(self.__model,Necklace):
+            print('Annealer: The kernel backends only support Necklace, using the Python loop')
+            backend = None
+        if backend is not None:
+            if recorder is not None:
+                print('Annealer: The recorder is not used by the kernel backends')
+            if self.__stopping:
+                print('Annealer: Stopping criteria are not used by the kernel backends')
+            return self.__run_kernel(ensemble_size,backend,schedule.to_array())
 
         # Create ensemble and choose random initial state for each
-        ensemble = [self.__model]*ensemble_size
-        for k in range(ensemble_size):
-            ensemble[k].shuffle_state()
+        ensemble = self._create_ensemble(ensemble_size,False,seed)
 
         # Run the simulated annealing method
-        energyArr = np.empty(len(self.__temps))
-        energyVBSFArr = np.empty(len(self.__temps))
-        for i in range(len(self.__temps)):
+        prof = self.__profiler
+        energyArr = []
+        energyVBSFArr = []
+        e_best = ensemble[0].get_energy()
+        sampler = None
+        acceptance = 1.
+        switch_rate = min(rejection_free,RejectionFreeSampler.break_even)
+        for i,T in enumerate(schedule):
+            if recorder is not None and recorder.wants_walkers(i):
+                recorder.record_walkers(i,[nkl.get_energy() for nkl in ensemble])
+
+            if sampler is None:
+                e_sum,e_best,n_accepted = self.__step_ensemble(ensemble,T,schedule.Q,e_best)
+            else:
+                e_sum,e_best,n_accepted = sampler.step(T,e_best)
+            # Mean acceptance rate of roughly the last 100 steps, the sampler only pays off at low rates
+            acceptance += (n_accepted/ensemble_size - acceptance) / min(i + 1,100)
+            if sampler is None and acceptance < switch_rate and schedule.Q is None:
+                sampler = RejectionFreeSampler(ensemble)
+                sampler.profiler = prof
+            elif sampler is not None and acceptance > 2 * switch_rate:
+                sampler = None
+            energyArr.append(e_sum / ensemble_size)
+            energyVBSFArr.append(e_best)
+            schedule.observe(i,energyArr[i],e_best,n_accepted/ensemble_size)
+            if self.__stopping:
+                reason = self.__check_stopping(i,energyArr[i],e_best,n_accepted/ensemble_size,T)
+                if reason is not None:
+                    schedule.stop(reason)
+
+            if prof is not None:
+                t = prof.clock()
+                prof.count('proposals',ensemble_size)
+                prof.count('accepted',n_accepted)
+            if recorder is not None:
+                recorder.record(energy=energyArr[i],best_energy=float(e_best),temp=float(T),
+                                acceptance=n_accepted/ensemble_size)
+            if prof is not None:
+                prof.add('record',t)
+                prof.tick(i)
+        if recorder is not None:
+            recorder.flush()
+        if prof is not None:
+            prof.end_run('Annealer.run')
+        self.__stop_reason = schedule.stop_reason
+        return np.array(energyArr,dtype=float),np.array(energyVBSFArr,dtype=float)
+
+    def __run_vectorized(self,ensemble_size,vectorized,seed,recorder,schedule):
+        """
+        Runs the simulated annealing with all walkers stored in one NecklaceEnsemble or MultiSpinEnsemble
+        :return: Mean energy, Best energy
+        """
+        ensemble = self._create_ensemble(ensemble_size,vectorized,seed)
+        ensemble.profiler = self.__profiler
+
+        energyArr = []
+        energyVBSFArr = []
+        e_best = ensemble.energies[0]
+        for i,T in enumerate(schedule):
+            if recorder is not None and recorder.wants_walkers(i):
+                recorder.record_walkers(i,ensemble.energies)
+
+            e_cur = ensemble.metropolis_step(T,schedule.Q)
+            e_best = min(e_best,np.min(e_cur))
+            energyArr.append(np.mean(e_cur))
+            energyVBSFArr.append(e_best)
+            acceptance = np.mean(ensemble.accepted)
+            schedule.observe(i,energyArr[i],e_best,acceptance)
+            if self.__stopping:
+                reason = self.__check_stopping(i,energyArr[i],e_best,acceptance,T)
+                if reason is not None:
+                    schedule.stop(reason)
+
+            if recorder is not None:
+                recorder.record(energy=energyArr[i],best_energy=float(e_best),temp=float(T),acceptance=acceptance)
+            if self.__profiler is not None:
+                self.__profiler.count('proposals',ensemble_size)
+                self.__profiler.count('accepted',int(np.count_nonzero(ensemble.accepted)))
+                self.__profiler.tick(i)
+        if recorder is not None:
+            recorder.flush()
+        if self.__profiler is not None:
+            self.__profiler.end_run('Annealer.run')
+        self.__stop_reason = schedule.stop_reason
+        return np.array(energyArr,dtype=float),np.array(energyVBSFArr,dtype=float)
+
+    def __run_kernel(self,ensemble_size,backend,temps):
+        """
+        Runs the simulated annealing with the Metropolis kernel on plain arrays.
+        Random numbers are drawn from the random module in the same order as on Necklace objects.
+        :return: Mean energy, Best energy
+        """
+        ensemble = self._create_ensemble(ensemble_size,False,None)
+        m,n = self.__model.get_size()
+        half = int(m*n/2)
 
-            T = self.__temps[i]
+        nodes = np.zeros([ensemble_size,int(m*n)],dtype=np.uint8)
+        energies = np.empty(ensemble_size,dtype=np.int64)
+        for k,nkl in enumerate(ensemble):
+            nodes[k,:half] = int_to_bits(nkl._ring,half)
+            nodes[k,half:] = int_to_bits(nkl._ext,int(m*n)-half)
+            energies[k] = nkl.get_energy()
 
-            if i == 0:
-                energyVBSFArr[i] = ensemble[0].get_energy()
-            else:
-                energyVBSFArr[i] = energyVBSFArr[i-1]
-
-            e_sum = 0
-            for k in range(ensemble_size):
-                dE = 0 - ensemble[k].get_energy()
-                e_sum += np.abs(dE)
-                if np.abs(dE) < energyVBSFArr[i]:
-                    energyVBSFArr[i] = np.abs(dE)
-                ensemble[k].pair_exchange_random()
-                dE += ensemble[k].get_energy()
-
-                # Metropolis
-                if dE < 0:
-                    continue
-                # calculate the boundary for accepting
-                if T == np.inf:
-                    p = 1
-                elif T == 0:
-                    p = 0
-                else:
-                    p = np.exp(-dE/T)
-                r = random.random()
-                # If change not accepted, go back to old model
-                if r > p:
-                    ensemble[k].undo_random_exchange()
-            energyArr[i] = e_sum / ensemble_size
+        e_sums,e_mins = run_metropolis(nodes,energies,temps,m,half,backend=backend)
+
+        energyArr = e_sums / ensemble_size
+        energyVBSFArr = np.minimum.accumulate(e_mins)
         return energyArr,energyVBSFArr
 
-    def run_adapted(self,ensemble_size=1,therm_speed=1,start_temp=40,end_temp=0.5,max_steps=9999999,update_steps=1):
+    def run_adapted(self,ensemble_size=1,therm_speed=1,start_temp=40,end_temp=0.5,max_steps=9999999,update_steps=1,
+                    vectorized=False,seed=None,num_workers=1,refresh_transitions=0,checkpoint=None,
+                    checkpoint_interval=60,recorder=None):
         """
         Running a simulated annealing process with adapted/optimal temperature schedule
         :param update_steps: Gives the number of steps until the temperature is updated
@@ -83,130 +248,420 @@ class Annealer:
         :param ensemble_size: Number of walkers for the process
         :param start_temp: Start temperature
         :param end_temp: End temperature
-        :return: Mean energy, Best Energy , Temperature Schedule
+        :param vectorized: Run all walkers at once with a NecklaceEnsemble, or with a MultiSpinEnsemble if 'multispin'
+        :param seed: Seed for the random streams of the walkers
+        :param num_workers: Number of processes the ensemble is split across
+        :param refresh_transitions: Number of new transitions before the transition matrix estimates are refreshed
+        :param checkpoint: Path of a checkpoint file, the run can be continued with Annealer.resume_adapted
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :param recorder: TraceRecorder for the energy, temperature, acceptance rate and second largest eigenvalue
+                         of every step and the energies of the walkers. With a checkpoint, a recorder in memory
+                         is moved to the directory checkpoint + '.traces', which the checkpoints refer to.
+        :return: Mean energy, Best Energy , Temperature Schedule, Degeneracies.
+                 If a recorder is given, the first three are TraceViews of it instead of arrays.
+                 The criteria set with set_stopping can end the run early, see get_stop_reason.
+                 With num_workers > 1 they are checked after every block of update_steps steps.
         """
-        if len(self.__temps) > 0:
+        if isinstance(self.__temps,Schedule) or len(self.__temps) > 0:
             print('Temperatures set with Annealer.set_temps() are not used within Annealer.run_adapted()')
 
+        params = {'ensemble_size': ensemble_size, 'therm_speed': therm_speed, 'end_temp': end_temp,
+                  'max_steps': max_steps, 'update_steps': update_steps, 'vectorized': vectorized,
+                  'views': recorder is not None}
+        if recorder is None:
+            recorder = TraceRecorder()
+        self.__lambda2 = np.nan
+        self.__reset_stopping()
+
+        if num_workers > 1:
+            if checkpoint is not None:
+                print('Annealer: Checkpoints are not written if num_workers > 1')
+            return self.__run_adapted_parallel(start_temp,seed,num_workers,refresh_transitions,params,recorder)
+
         # Create ensemble and choose random initial state for each
-        ensemble = []
-        for k in range(ensemble_size):
-            nkl = self.__model.get_copy()
-            nkl.shuffle_state()
-            ensemble.append(nkl)
+        ensemble = self._create_ensemble(ensemble_size,vectorized,seed)
 
-        # Initialize Q matrix
-        if self.__model.dims_lumped > 1000:
-            print('The used system is very large: Simulated annealer does not include sparse matrix implementation!')
-        Q = np.zeros([self.__model.dims_lumped,self.__model.dims_lumped],dtype=int)
+        # Initialize sparse Q matrix
+        Q = TransitionEstimator(self.__model.dims_lumped,refresh_transitions)
 
-        # Set temperature, step counter and energy arrays
+        # Set temperature, step counter and degeneracies
         T = start_temp
-        step = 0
-        energiesArr = np.empty(max_steps)
-        energiesVBSF = np.empty(max_steps)
-        temps = np.empty(max_steps)
+        degs = np.zeros(self.__model.dims_lumped)
+
+        # Checkpoints only refer to the trace chunks on disk
+        checkpointer = None
+        if checkpoint is not None:
+            checkpointer = Checkpointer(checkpoint,checkpoint_interval)
+            if recorder.path is None:
+                recorder.spill(checkpoint + '.traces')
+        return self.__run_adapted_loop(ensemble,Q,T,0,np.inf,degs,params,recorder,checkpointer)
+
+    def resume_adapted(self,checkpoint,checkpoint_interval=60):
+        """
+        Continues a run of Annealer.run_adapted from its checkpoint file
+        :param checkpoint: Path of the checkpoint file, new checkpoints are written to the same file
+        :param checkpoint_interval: Minimum number of seconds between two checkpoints
+        :return: Mean energy, Best Energy , Temperature Schedule, Degeneracies
+        """
+        state = load_checkpoint(checkpoint)
+        self.__model = state['model']
+        self.__degs = state['fixed_degs']
+        self.__lambda2 = state['lambda2']
+        self.__reset_stopping()
+
+        checkpointer = Checkpointer(checkpoint,checkpoint_interval)
+        return self.__run_adapted_loop(state['ensemble'],state['Q'],state['T'],state['step'],state['e_best'],
+                                       state['degs'],state['params'],TraceRecorder.from_state(state['recorder']),
+                                       checkpointer)
+
+    def __run_adapted_loop(self,ensemble,Q,T,step,e_best,degs,params,recorder,checkpointer):
+        """
+        Main loop of Annealer.run_adapted, starting at the given step
+        :param e_best: Best energy before the step
+        :param params: Parameters of run_adapted that are needed by the loop
+        :param recorder: TraceRecorder of the run
+        :param checkpointer: Checkpointer, or None if no checkpoints are written
+        :return: Mean energy, Best Energy , Temperature Schedule, Degeneracies
+        """
+        ensemble_size = params['ensemble_size']
+        therm_speed = params['therm_speed']
+        end_temp = params['end_temp']
+        max_steps = params['max_steps']
+        update_steps = params['update_steps']
+        vectorized = params['vectorized']
+
+        prof = self.__profiler
+        Q.profiler = prof
+        if vectorized:
+            ensemble.profiler = prof
 
         # Until end is reached
         while T >= end_temp and step < max_steps:
+            # Write a checkpoint before the step
+            if checkpointer is not None and checkpointer.due():
+                if prof is not None:
+                    t = prof.clock()
+                self.__save_adapted(checkpointer,ensemble,Q,T,step,e_best,degs,params,recorder)
+                if prof is not None:
+                    prof.add('checkpoint',t)
+
             # Set best energy from before
             if step == 0:
-                energiesVBSF[step] = ensemble[0].get_energy()
+                e_best = ensemble.energies[0] if vectorized else ensemble[0].get_energy()
+
+            if recorder.wants_walkers(step):
+                recorder.record_walkers(step,ensemble.energies if vectorized else [x.get_energy() for x in ensemble])
+
+            # Perform one transition for each particle in the ensemble
+            if vectorized:
+                e_cur = ensemble.metropolis_step(T,Q)
+                e_sum = np.sum(e_cur)
+                e_best = min(e_best,np.min(e_cur))
+                n_accepted = np.count_nonzero(ensemble.accepted)
             else:
-                energiesVBSF[step] = energiesVBSF[step-1]
-
-            # Store temperature
-            temps[step] = T
-
-            e_sum = 0 # For calculating the average energy
-            # For each particle in the ensemble
-            for l in range(ensemble_size):
-                # Perform transition
-                e_cur = ensemble[l].get_energy()
-
-                # Energie calculations
-                e_sum += e_cur
-                if e_cur < energiesVBSF[step]:
-                    energiesVBSF[step] = e_cur
-
-                cur_state = ensemble[l].get_lumped_index(e_cur)
-                ensemble[l].pair_exchange_random()
-                e_new = ensemble[l].get_energy()
-                new_state = ensemble[l].get_lumped_index(e_new)
-
-                # Add entry in the transition matrix
-                Q[new_state, cur_state] += 1
-
-                # Metropolis algorithm
-                de = e_new - e_cur
-                if de < 0:
-                    continue
-                if T == np.inf:
-                    p = 1
-                elif T == 0:
-                    p = 0
-                else:
-                    p = np.exp(-de/T)
-                r = random.random()
-                if r > p:
-                    ensemble[l].undo_random_exchange()
-            # Store energy
-            energiesArr[step] = e_sum / ensemble_size
-
-            # Check if temperature needs update
-            if step % update_steps != 0:
-                step += 1
-                continue
+                e_sum,e_best,n_accepted = self.__step_ensemble(ensemble,T,Q,e_best)
+            T_step = T
+            if prof is not None:
+                prof.count('proposals',ensemble_size)
+                prof.count('accepted',n_accepted)
+                t = prof.clock()
+
+            # Update the temperature from the transition matrix, if needed
+            if step % update_steps == 0:
+                T_new,degs_new = self.__update_temperature(Q,T,therm_speed)
+                if prof is not None:
+                    t = prof.add('temperature_update',t)
+                if degs_new is not None:
+                    T,degs = T_new,degs_new
+                    if T < 0:
+                        print('T = 0 reached. Programm ended')
+                        self.__stop_reason = 'T = 0 reached'
+                        break
+
+            # Store energies and temperature
+            recorder.record(energy=e_sum/ensemble_size,best_energy=float(e_best),temp=float(T_step),
+                            acceptance=n_accepted/ensemble_size,lambda2=self.__lambda2)
+            if prof is not None:
+                prof.add('record',t)
+                prof.tick(step)
+            step += 1
 
-            # Calculate the probability matrix
-            P = Q / Q.sum(axis=0)
-            P[np.isnan(P)] = 0
-
-
-
-            # Square P until any row does not change anymore
-            check = False
-            runs = 0
-            while check == False:
-                runs += 1
-                P_new = np.matmul(P, P)
-                dists = np.abs(P-P_new)
-                dists = np.sum(dists,axis=0)
-                dists[dists==0] = np.max(dists)
-                P = P_new
-                if np.min(dists) < 10**-3:
-                    idx = np.argmin(dists)
-                    check = True
-            # Get degeneracies from P
-            degs = P[:,idx]
-            # Get all energies
-            energies = ensemble[0].allEnergies
-            # Statistical quantities
-            z = np.sum(degs*np.exp(-energies/T))
-            if z == 0:
-                step += 1
-                continue
+            if self.__stopping:
+                self.__stop_reason = self.__check_stopping(step-1,e_sum/ensemble_size,e_best,
+                                                           n_accepted/ensemble_size,T_step)
+                if self.__stop_reason is not None:
+                    break
 
-            e_mean = 1/z * np.sum(energies * degs * np.exp(-energies/T))
-            heat_cap = 1/(T**2*z) * np.sum((energies-e_mean)**2*degs*np.exp(-energies/T))
+        if checkpointer is not None:
+            self.__save_adapted(checkpointer,ensemble,Q,T,step,e_best,degs,params,recorder)
+            checkpointer.wait()
+        if prof is not None:
+            prof.end_run('Annealer.run_adapted')
 
-            # Get the second largest eigenvalue for later relaxation time
-            lambda2 = eigsh(P, 2, which='LA')[0][0]
+        return self.__adapted_result(recorder,params,degs)
 
-            relax_time = -1/np.log(lambda2)
-            # Update temperature
-            T = T * (1-therm_speed/(relax_time*np.sqrt(heat_cap)))
+    def __save_adapted(self,checkpointer,ensemble,Q,T,step,e_best,degs,params,recorder):
+        """
+        Writes the state of Annealer.run_adapted to a checkpoint
+        """
+        checkpointer.save({'model': self.__model, 'fixed_degs': self.__degs, 'lambda2': self.__lambda2,
+                           'params': params, 'ensemble': ensemble, 'Q': Q, 'T': T, 'step': step,
+                           'e_best': e_best, 'degs': degs, 'recorder': recorder.get_state()})
 
-            if T < 0:
-                print('T = 0 reached. Programm ended')
-                break
+    def __adapted_result(self,recorder,params,degs):
+        """
+        Collects the results of Annealer.run_adapted from its recorder
+        :return: Mean energy, Best Energy , Temperature Schedule, Degeneracies
+        """
+        recorder.flush()
+        traces = [recorder.get(name) for name in ('energy','best_energy','temp')]
+        if not params['views']:
+            traces = [trace[:] for trace in traces]
+        return traces[0],traces[1],traces[2],degs
 
-            step += 1
+    def __run_adapted_parallel(self,start_temp,seed,num_workers,refresh_transitions,params,recorder):
+        """
+        Runs Annealer.run_adapted with the ensemble split across worker processes.
+        Every worker owns a slice of the walkers and its own random stream. The transition counts of all
+        workers are merged before each temperature update.
+        :return: Mean energy, Best Energy , Temperature Schedule, Degeneracies
+        """
+        ensemble_size = params['ensemble_size']
+        therm_speed = params['therm_speed']
+        end_temp = params['end_temp']
+        max_steps = params['max_steps']
+        update_steps = params['update_steps']
+        vectorized = params['vectorized']
+
+        # Split the walkers and random streams across the workers
+        sizes = [len(x) for x in np.array_split(np.arange(ensemble_size),num_workers) if len(x) > 0]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+        ctx = multiprocessing.get_context()
+        conns = []
+        procs = []
+        for size,ss in zip(sizes,seeds):
+            parent,child = ctx.Pipe()
+            proc = ctx.Process(target=_adapted_worker,args=(child,self.__model,size,vectorized,ss),daemon=True)
+            proc.start()
+            conns.append(parent)
+            procs.append(proc)
+
+        Q = TransitionEstimator(self.__model.dims_lumped,refresh_transitions)
+        prof = self.__profiler
+        Q.profiler = prof
+
+        # Set temperature, step counter, best energy and degeneracies
+        T = start_temp
+        step = 0
+        e_best = np.inf
+        degs = np.zeros(self.__model.dims_lumped)
+
+        try:
+            # Until end is reached
+            while T >= end_temp and step < max_steps:
+                # Steps with constant temperature until the next update
+                n_steps = 1 if step == 0 else update_steps
+                n_steps = min(n_steps,max_steps-step)
+                if prof is not None:
+                    t = prof.clock()
+                for conn in conns:
+                    conn.send((T,n_steps))
+                results = [conn.recv() for conn in conns]
+                if prof is not None:
+                    t = prof.add('workers',t)
+
+                # Merge results of all workers
+                e_sums = np.sum([r[0] for r in results],axis=0)
+                e_mins = np.min([r[1] for r in results],axis=0)
+                accepts = np.sum([r[2] for r in results],axis=0)
+                for r in results:
+                    Q.add_counts(r[3])
+                T_block = T
+                if prof is not None:
+                    prof.count('proposals',n_steps*ensemble_size)
+                    prof.count('accepted',int(np.sum(accepts)))
+                    t = prof.add('q_update',t)
+
+                # Update the temperature from the transition matrix, if needed
+                end = False
+                if (step+n_steps-1) % update_steps == 0:
+                    T_new,degs_new = self.__update_temperature(Q,T,therm_speed)
+                    if prof is not None:
+                        t = prof.add('temperature_update',t)
+                    if degs_new is not None:
+                        T,degs = T_new,degs_new
+                        if T < 0:
+                            print('T = 0 reached. Programm ended')
+                            self.__stop_reason = 'T = 0 reached'
+                            n_steps -= 1
+                            end = True
+
+                # Store energies and temperatures of the block
+                best = np.minimum.accumulate(np.minimum(e_mins[:n_steps],e_best))
+                recorder.extend('energy',e_sums[:n_steps] / ensemble_size)
+                recorder.extend('best_energy',best)
+                recorder.extend('temp',np.full(n_steps,float(T_block)))
+                recorder.extend('acceptance',accepts[:n_steps] / ensemble_size)
+                recorder.extend('lambda2',np.full(n_steps,self.__lambda2))
+                if n_steps > 0:
+                    e_best = best[-1]
+                if prof is not None:
+                    prof.add('record',t)
+                    prof.tick(step)
+                step += n_steps
+                if end:
+                    break
+
+                if self.__stopping and n_steps > 0:
+                    self.__stop_reason = self.__check_stopping(step-1,e_sums[n_steps-1]/ensemble_size,e_best,
+                                                               np.mean(accepts[:n_steps])/ensemble_size,T_block)
+                    if self.__stop_reason is not None:
+                        break
+        finally:
+            for conn in conns:
+                conn.send(None)
+            for proc in procs:
+                proc.join()
+        if prof is not None:
+            prof.end_run('Annealer.run_adapted')
+
+        return self.__adapted_result(recorder,params,degs)
+
+    def _create_ensemble(self,ensemble_size,vectorized,seed):
+        """
+        Creates the walkers of a run, each with a random initial state
+        :param ensemble_size: Number of walkers
+        :param vectorized: Create a NecklaceEnsemble instead of a list of necklaces, a MultiSpinEnsemble if 'multispin'
+        :param seed: Seed or numpy.random.SeedSequence, if given every necklace gets its own RandomStream.
+                     Otherwise the necklaces share the random generator of the model.
+        :return: Ensemble of walkers
+        """
+        if vectorized == 'multispin':
+            return MultiSpinEnsemble(self.__model,ensemble_size,rng=np.random.default_rng(seed))
+        if vectorized:
+            return NecklaceEnsemble(self.__model,ensemble_size,rng=np.random.default_rng(seed))
+        streams = spawn_streams(seed,ensemble_size) if seed is not None else None
+        ensemble = []
+        for k in range(ensemble_size):
+            nkl = self.__model.get_copy()
+            if streams is not None:
+                nkl.set_rng(streams[k])
+            nkl.shuffle_state()
+            ensemble.append(nkl)
+        return ensemble
 
-        if step < max_steps:
-            temps = temps[:step]
-            energiesArr = energiesArr[:step]
-            energiesVBSF = energiesVBSF[:step]
+    def _run_steps(self,ensemble,T,n_steps,Q):
+        """
+        Performs several Metropolis steps at constant temperature for the whole ensemble
+        :param ensemble: List of necklaces, NecklaceEnsemble or MultiSpinEnsemble
+        :param T: Temperature
+        :param n_steps: Number of steps
+        :param Q: TransitionEstimator counting the transitions of the lumped model
+        :return: Sum and minimum of the energies before each step, number of accepted moves in each step
+        """
+        e_sums = np.empty(n_steps)
+        e_mins = np.empty(n_steps)
+        accepts = np.empty(n_steps,dtype=int)
+        for i in range(n_steps):
+            if isinstance(ensemble,(NecklaceEnsemble,MultiSpinEnsemble)):
+                e_cur = ensemble.metropolis_step(T,Q)
+                e_sums[i] = np.sum(e_cur)
+                e_mins[i] = np.min(e_cur)
+                accepts[i] = np.count_nonzero(ensemble.accepted)
+            else:
+                e_sums[i],e_mins[i],accepts[i] = self.__step_ensemble(ensemble,T,Q,np.inf)
+        return e_sums,e_mins,accepts
+
+    def __step_ensemble(self,ensemble,T,Q,e_best):
+        """
+        Performs one Metropolis step for each necklace in the ensemble and counts the lumped transitions
+        :param ensemble: List of necklaces
+        :param T: Temperature
+        :param Q: TransitionEstimator counting the transitions of the lumped model, or None
+        :param e_best: Best energy so far
+        :return: Sum of the energies before the step, best energy so far, number of accepted moves
+        """
+        prof = self.__profiler
+        e_sum = 0 # For calculating the average energy
+        n_accepted = len(ensemble)
+        for nkl in ensemble:
+            if prof is not None:
+                t = prof.clock()
+            # Perform transition
+            e_cur = nkl.get_energy()
+
+            # Energie calculations
+            e_sum += e_cur
+            if e_cur < e_best:
+                e_best = e_cur
+
+            if prof is not None:
+                t = prof.add('energy',t)
+            nkl.pair_exchange_random()
+            if prof is not None:
+                t = prof.add('proposal',t)
+            e_new = nkl.get_energy()
+            if prof is not None:
+                t = prof.add('energy',t)
+
+            # Add entry in the transition matrix
+            if Q is not None:
+                Q.add(nkl.get_lumped_index(e_new), nkl.get_lumped_index(e_cur))
+                if prof is not None:
+                    t = prof.add('q_update',t)
+
+            # Metropolis algorithm
+            de = e_new - e_cur
+            if de < 0:
+                if prof is not None:
+                    prof.add('metropolis',t)
+                continue
+            if T == np.inf:
+                p = 1
+            elif T == 0:
+                p = 0
+            else:
+                p = np.exp(-de/T)
+            r = nkl._rng.random()
+            if r > p:
+                nkl.undo_random_exchange()
+                n_accepted -= 1
+            if prof is not None:
+                prof.add('metropolis',t)
+        return e_sum,e_best,n_accepted
+
+    def __update_temperature(self,Q,T,therm_speed):
+        """
+        Calculates the next temperature of the adapted schedule from the transition count matrix
+        :param Q: TransitionEstimator counting the transitions of the lumped model
+        :param T: Current temperature
+        :param therm_speed: Thermodynamic speed for the process
+        :return: New temperature and degeneracies, degeneracies are None if T can not be updated
+        """
+        T,degs,self.__lambda2 = adapted_temperature(Q,T,therm_speed,self.__model.allEnergies,self.__degs)
+        return T,degs
 
-        return energiesArr,energiesVBSF,temps,degs
 
+def _adapted_worker(conn,model,ensemble_size,vectorized,seed_seq):
+    """
+    Worker process of the parallel Annealer.run_adapted. Receives (T, n_steps) tuples and answers with the
+    energy sums, energy minima, accepted moves and transition counts of its walkers, until None is received.
+    :param conn: Connection to the main process
+    :param model: Model of the walkers
+    :param ensemble_size: Number of walkers of this worker
+    :param vectorized: Use a NecklaceEnsemble for the walkers, a MultiSpinEnsemble if 'multispin'
+    :param seed_seq: numpy.random.SeedSequence of this worker
+    """
+    annealer = Annealer()
+    annealer.set_model(model)
+    ensemble = annealer._create_ensemble(ensemble_size,vectorized,seed_seq)
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        T,n_steps = msg
+        Q = TransitionEstimator(model.dims_lumped)
+        e_sums,e_mins,accepts = annealer._run_steps(ensemble,T,n_steps,Q)
+        conn.send((e_sums,e_mins,accepts,Q.get_counts()))
+    conn.close()
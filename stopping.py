@@ -0,0 +1,180 @@
+import time
+import numpy as np
+
+
+class StoppingCriterion:
+    """
+    Base class of stopping criteria. The optimisers call check() after every step or generation with a
+    dictionary of the current state, which holds some of the keys step, energy (mean energy), best_energy,
+    acceptance, temperature and population. Criteria whose keys are missing never stop.
+    """
+
+    def reset(self):
+        """
+        Resets the criterion at the start of a run
+        """
+        pass
+
+    def check(self, state):
+        """
+        Checks if the run should stop
+        :param state: Dictionary of the current state
+        :return: Reason for stopping, None to continue
+        """
+        raise NotImplementedError
+
+
+class TargetEnergy(StoppingCriterion):
+    """
+    Stops as soon as the best energy is at most the target, e.g. the ground state energy
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+    def check(self, state):
+        if state.get('best_energy') is not None and state['best_energy'] <= self.target:
+            return 'target energy ' + str(self.target) + ' reached'
+        return None
+
+
+class Stagnation(StoppingCriterion):
+    """
+    Stops if the best energy did not improve by more than min_improvement for window steps
+    """
+
+    def __init__(self, window, min_improvement=0):
+        self.window = window
+        self.min_improvement = min_improvement
+        self.reset()
+
+    def reset(self):
+        self.__best = np.inf
+        self.__count = 0
+
+    def check(self, state):
+        if state.get('best_energy') is None:
+            return None
+        if state['best_energy'] < self.__best - self.min_improvement:
+            self.__best = state['best_energy']
+            self.__count = 0
+            return None
+        self.__count += 1
+        if self.__count >= self.window:
+            return 'no improvement for ' + str(self.window) + ' steps'
+        return None
+
+
+class Diversity(StoppingCriterion):
+    """
+    Stops if the fraction of distinct individuals in the population is at most threshold
+    """
+
+    def __init__(self, threshold=0):
+        self.threshold = threshold
+
+    def check(self, state):
+        if state.get('population') is None:
+            return None
+        diversity = population_diversity(state['population'])
+        if diversity <= self.threshold:
+            return 'population diversity %.3f' % diversity
+        return None
+
+
+class WallClock(StoppingCriterion):
+    """
+    Stops after a budget of seconds since the start of the run
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.reset()
+
+    def reset(self):
+        self.__start = time.perf_counter()
+
+    def check(self, state):
+        if time.perf_counter() - self.__start >= self.seconds:
+            return 'wall clock budget of ' + str(self.seconds) + ' s used'
+        return None
+
+
+class AcceptanceFloor(StoppingCriterion):
+    """
+    Stops if the mean acceptance rate of the last window steps is below min_rate, i.e. the ensemble is frozen
+    """
+
+    def __init__(self, min_rate, window=100):
+        self.min_rate = min_rate
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.__rates = np.zeros(self.window)
+        self.__count = 0
+
+    def check(self, state):
+        if state.get('acceptance') is None:
+            return None
+        self.__rates[self.__count % self.window] = state['acceptance']
+        self.__count += 1
+        if self.__count >= self.window and np.mean(self.__rates) < self.min_rate:
+            return 'acceptance rate below ' + str(self.min_rate)
+        return None
+
+
+def as_list(criteria):
+    """
+    Converts the argument of the set_stopping methods to a list of criteria
+    :param criteria: StoppingCriterion, list of them or None
+    :return: List of StoppingCriterion
+    """
+    if criteria is None:
+        return []
+    if isinstance(criteria, (list, tuple)):
+        return list(criteria)
+    return [criteria]
+
+
+def reset_all(criteria):
+    """
+    Resets a list of criteria at the start of a run
+    :param criteria: List of StoppingCriterion
+    """
+    for criterion in criteria:
+        criterion.reset()
+
+
+def check_all(criteria, state):
+    """
+    Checks a list of criteria, all are evaluated so that windowed criteria stay up to date
+    :param criteria: List of StoppingCriterion
+    :param state: Dictionary of the current state
+    :return: Reason of the first criterion that stops, None to continue
+    """
+    reason = None
+    for criterion in criteria:
+        r = criterion.check(state)
+        if reason is None:
+            reason = r
+    return reason
+
+
+def population_diversity(population):
+    """
+    Fraction of distinct individuals in a population
+    :param population: List of necklaces, NecklaceEnsemble or node matrix (e.g. packed) with one row per individual
+    :return: Number of distinct states divided by the population size
+    """
+    if isinstance(population, np.ndarray):
+        return len(np.unique(population, axis=0)) / len(population)
+    if hasattr(population, 'nodes'):
+        return len(np.unique(population.nodes, axis=0)) / len(population.nodes)
+    states = set()
+    for nkl in population:
+        if nkl._expanded_bits > 0:
+            states.add((nkl._ring_expanded, nkl._ext_expanded))
+        else:
+            states.add((nkl._ring, nkl._ext))
+    return len(states) / len(population)
@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from necklace_model import Necklace
+from simulated_annealing import Annealer
+from genetic_algorithm import GeneticAlgorithm
+from schedules import ConstantSchedule, LinearSchedule, ExponentialSchedule, InverseSchedule, LogarithmicSchedule, \
+    FeedbackSchedule
+from stopping import TargetEnergy, Stagnation, Diversity, WallClock, AcceptanceFloor
+
+# Parameters of a run block that are not expanded even if they are lists
+_FIXED = ('optimiser', 'schedule', 'stopping')
+
+
+def make_schedule(family, n_steps, temp=None, **kwargs):
+    """
+    Creates a schedule of a family, with the parametrisation of Assignment 2
+    :param family: 'constant', 'linear', 'exponential', 'inverse' (1/(1+bt)), 'logarithmic' (1/(1+b ln(t+1)))
+                   or 'feedback'
+    :param n_steps: Number of steps
+    :param temp: Temperature of the constant schedule, may be 'inf'
+    :param kwargs: Further parameters of the schedule, e.g. start_temp, end_temp, target_energy, patience
+    :return: Schedule
+    """
+    if family == 'constant':
+        return ConstantSchedule(temp, n_steps, **kwargs)
+    if family == 'feedback':
+        return FeedbackSchedule(n_steps=n_steps, **kwargs)
+    if family not in _SCHEDULES:
+        sys.exit('sweep: Unknown schedule family ' + str(family))
+    return _SCHEDULES[family](n_steps, **kwargs)
+
+
+_SCHEDULES = {'linear': LinearSchedule, 'exponential': ExponentialSchedule, 'inverse': InverseSchedule,
+              'logarithmic': LogarithmicSchedule}
+
+
+def make_stopping(spec):
+    """
+    Creates the stopping criteria of a run
+    :param spec: Dictionary with any of target_energy, stagnation (window), diversity (threshold),
+                 wall_clock (seconds) and acceptance_floor (rate, or [rate, window])
+    :return: List of StoppingCriterion
+    """
+    criteria = []
+    for name, value in spec.items():
+        if name == 'target_energy':
+            criteria.append(TargetEnergy(value))
+        elif name == 'stagnation':
+            criteria.append(Stagnation(value))
+        elif name == 'diversity':
+            criteria.append(Diversity(value))
+        elif name == 'wall_clock':
+            criteria.append(WallClock(value))
+        elif name == 'acceptance_floor':
+            criteria.append(AcceptanceFloor(*value) if isinstance(value, list) else AcceptanceFloor(value))
+        else:
+            sys.exit('sweep: Unknown stopping criterion ' + str(name))
+    return criteria
+
+
+def expand_config(config):
+    """
+    Expands the run blocks of a sweep config into single runs. Every list valued parameter of a block
+    (and the list of schedules) is expanded as cartesian product, the stopping criteria are shared by all runs.
+    :param config: Dictionary with a list of run blocks under 'runs'
+    :return: List of run dictionaries
+    """
+    runs = []
+    for block in config['runs']:
+        schedules = block.get('schedule', [None])
+        if isinstance(schedules, dict):
+            schedules = [schedules]
+        names = [k for k in block if k not in _FIXED]
+        values = [block[k] if isinstance(block[k], list) else [block[k]] for k in names]
+        for schedule in schedules:
+            for combo in itertools.product(*values):
+                run = {'optimiser': block['optimiser']}
+                run.update(zip(names, combo))
+                if schedule is not None:
+                    run['schedule'] = schedule
+                if 'stopping' in block:
+                    run['stopping'] = block['stopping']
+                runs.append(run)
+    return runs
+
+
+def config_key(run):
+    """
+    Returns a key that is equal for identical runs
+    :param run: Run dictionary
+    :return: Hex string
+    """
+    return hashlib.sha1(json.dumps(run, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def execute(run):
+    """
+    Executes a single run, used in the worker processes
+    :param run: Run dictionary with optimiser, m, n and the parameters of the optimiser
+    :return: Dictionary of result arrays, run time in seconds, reason if the run stopped early
+    """
+    params = {k: v for k, v in run.items() if k not in ('optimiser', 'm', 'n', 'schedule', 'steps', 'stopping')}
+    stopping = make_stopping(run.get('stopping', {}))
+    seed = params.get('seed')
+    random.seed(seed)
+    np.random.seed(seed)
+    model = Necklace(run['m'], run.get('n', 2))
+    start = time.perf_counter()
+
+    if run['optimiser'] == 'anneal':
+        annealer = Annealer()
+        annealer.set_model(model)
+        annealer.set_stopping(stopping)
+        annealer.set_temps(make_schedule(n_steps=run['steps'], **run['schedule']))
+        energies, best = annealer.run(**params)
+        result = {'energies': energies, 'best_energies': best}
+        reason = annealer.get_stop_reason()
+    elif run['optimiser'] == 'adapted':
+        annealer = Annealer()
+        annealer.set_model(model)
+        annealer.set_stopping(stopping)
+        energies, best, temps, degs = annealer.run_adapted(**params)
+        result = {'energies': energies, 'best_energies': best, 'temps': temps, 'degeneracies': degs}
+        reason = annealer.get_stop_reason()
+    elif run['optimiser'] in ('ga', 'ga_expanded'):
+        ga = GeneticAlgorithm()
+        ga.set_model(model)
+        ga.set_stopping(stopping)
+        if run['optimiser'] == 'ga':
+            energies, best = ga.run(**params)
+        else:
+            params.pop('seed', None)
+            energies, best = ga.run_expanded(**params)
+        result = {'energies': energies, 'best_energies': best}
+        reason = ga.get_stop_reason()
+    else:
+        sys.exit('sweep: Unknown optimiser ' + str(run['optimiser']))
+
+    return result, time.perf_counter() - start, reason
+
+
+def run_sweep(config, store, workers=1):
+    """
+    Runs all runs of a sweep config that are not yet in the store, in a pool of worker processes.
+    Results are written to store/<key>.npz and summarized in store/index.json.
+    :param config: Sweep config
+    :param store: Directory of the results
+    :param workers: Maximum number of worker processes
+    :return: Index of all results in the store, by key
+    """
+    os.makedirs(store, exist_ok=True)
+    index_path = os.path.join(store, 'index.json')
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+
+    # Identical runs are executed once, runs already in the store are skipped
+    todo = {}
+    for run in expand_config(config):
+        key = config_key(run)
+        if key not in index and key not in todo:
+            todo[key] = run
+    print('sweep: %d runs to execute, %d in store' % (len(todo), len(index)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(execute, run): key for key, run in todo.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            result, seconds, reason = future.result()
+            np.savez_compressed(os.path.join(store, key + '.npz'), **result)
+            best = result['best_energies']
+            index[key] = {'config': todo[key], 'seconds': seconds,
+                          'best_energy': float(best[-1]) if len(best) > 0 else None,
+                          'final_energy': float(result['energies'][-1]) if len(best) > 0 else None,
+                          'steps': len(best), 'stop_reason': reason}
+            # Rewrite the index after every run, so finished runs survive an interruption
+            with open(index_path + '.tmp', 'w') as f:
+                json.dump(index, f, indent=1)
+            os.replace(index_path + '.tmp', index_path)
+            print('sweep: %s done in %.1f s, best energy %s' % (key, seconds, index[key]['best_energy']))
+    return index
+
+
+def load_result(store, key):
+    """
+    Loads the result arrays of a run from the store
+    :param store: Directory of the results
+    :param key: Key of the run
+    :return: Dictionary of arrays
+    """
+    with np.load(os.path.join(store, key + '.npz')) as data:
+        return dict(data)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs a sweep of optimiser runs from a JSON config')
+    parser.add_argument('config', help='JSON file with a list of run blocks under "runs"')
+    parser.add_argument('--store', default=None, help='Directory of the results, default from config or "sweep_results"')
+    parser.add_argument('--workers', type=int, default=None, help='Maximum number of worker processes')
+    parser.add_argument('--dry-run', action='store_true', help='Only print the expanded runs')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    if args.dry_run:
+        for run in expand_config(config):
+            print(config_key(run), json.dumps(run, sort_keys=True))
+        sys.exit(0)
+    store = args.store or config.get('store', 'sweep_results')
+    workers = args.workers or config.get('workers', os.cpu_count())
+    run_sweep(config, store, workers)
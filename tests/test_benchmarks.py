@@ -0,0 +1,32 @@
+import json
+import benchmarks
+from necklace_model import Necklace
+
+
+def test_crossover_beyond_64_nodes():
+    nkl1, nkl2 = Necklace(100, 2), Necklace(100, 2)
+    nkl1.crossover(nkl2)
+    assert type(nkl1._ring) is int and type(nkl1._ext) is int
+    assert nkl1.get_energy() == nkl1.calc_energy()
+    assert nkl2.get_energy() == nkl2.calc_energy()
+
+
+def test_all_benchmarks_run(tmp_path):
+    # One call per benchmark at a size beyond one 64 bit word and a multi-spin ensemble of a single word
+    output = str(tmp_path / 'benchmarks.json')
+    results = benchmarks.run_benchmarks(sizes=(100,), ensemble_sizes=(10,), min_time=0, repeat=1, output=output)
+    names = [x[0] for x in benchmarks.BENCHMARKS]
+    assert sorted(x['name'] for x in results.values()) == sorted(names)
+    with open(output) as f:
+        assert json.load(f)['results'] == results
+
+
+def test_failing_benchmark_is_skipped(tmp_path, monkeypatch):
+    def fail(m, size):
+        raise ValueError('broken')
+    monkeypatch.setattr(benchmarks, 'BENCHMARKS', [('broken', fail, 'calls/s', False)] + benchmarks.BENCHMARKS[:1])
+    output = str(tmp_path / 'benchmarks.json')
+    results = benchmarks.run_benchmarks(sizes=(20,), min_time=0, repeat=1, output=output)
+    assert list(results) == ['necklace.calc_energy[m=20]']
+    with open(output) as f:
+        assert list(json.load(f)['results']) == list(results)
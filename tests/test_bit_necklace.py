@@ -0,0 +1,75 @@
+import random
+import numpy as np
+import pytest
+from necklace_model import Necklace
+from bit_necklace import BitNecklace
+
+
+def _reference_energy(nodes, m, n):
+    # Ring of the first nodes, fully connected nodes of every site and the balance penalty
+    planes = np.asarray(nodes, dtype=int).reshape(n, m)
+    ring = np.count_nonzero(planes[0] != np.roll(planes[0], 1)) if m > 1 else 0
+    clique = sum(np.count_nonzero(planes[a] != planes[b]) for a in range(n) for b in range(a))
+    return ring + clique + (planes.sum() - m * n // 2)**2
+
+
+@pytest.mark.parametrize('m', [4, 20, 64, 130])
+def test_energies_match_necklace(m):
+    random.seed(m)
+    nkl = Necklace(m, 2)
+    bit = BitNecklace(m, 2)
+    for i in range(20):
+        nodes = [nkl.val_at_pos(p) for p in range(2 * m)]
+        bit.set_nodes(nodes)
+        assert np.array_equal(bit.get_nodes(), nodes)
+        assert bit.get_energy() == bit.calc_energy() == nkl.get_energy()
+        nkl.shuffle_state()
+
+
+@pytest.mark.parametrize('m,n', [(130, 2), (10, 3), (65, 4), (3, 2), (6, 5)])
+def test_exchanges_keep_energy(m, n):
+    random.seed(1)
+    bit = BitNecklace(m, n)
+    for i in range(300):
+        e = bit.get_energy()
+        bit.pair_exchange_random()
+        if i % 3 == 0:
+            bit.undo_random_exchange()
+            assert bit.get_energy() == e
+        assert bit.get_energy() == bit.calc_energy() == _reference_energy(bit.get_nodes(), m, n)
+    pos1, pos2 = 0, m * n - 1
+    e = bit.get_energy()
+    de = bit.delta_energy(pos1, pos2)
+    assert bit.get_energy() == e
+    bit.pair_exchange(pos1, pos2)
+    assert bit.get_energy() == e + de
+
+
+def test_balanced_energies_are_lumped():
+    random.seed(2)
+    bit = BitNecklace(6, 3)
+    for i in range(200):
+        bit.shuffle_state()
+        assert bit.get_energy() in bit.allEnergies
+        assert bit.get_lumped_index() < bit.dims_lumped
+    assert bit.overflow_count == 0
+
+
+def test_copy_is_independent():
+    bit = BitNecklace(70, 3)
+    copy = bit.get_copy()
+    bit.pair_exchange_random()
+    assert not np.array_equal(bit.get_nodes(), copy.get_nodes())
+    assert copy.get_energy() == copy.calc_energy()
+
+
+@pytest.mark.parametrize('value', [False, True])
+def test_exchange_without_opposite_class_is_a_no_op(value):
+    bit = BitNecklace(10, 3)
+    bit.set_nodes(np.full(30, value))
+    e = bit.get_energy()
+    for i in range(5):
+        bit.pair_exchange_random()
+        assert np.all(bit.get_nodes() == value) and bit.get_energy() == e
+        bit.undo_random_exchange()
+        assert bit.get_energy() == e
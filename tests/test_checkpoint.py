@@ -0,0 +1,143 @@
+import random
+import numpy as np
+import pytest
+import checkpoint
+from checkpoint import load_checkpoint
+from necklace_model import Necklace
+from simulated_annealing import Annealer
+from genetic_algorithm import GeneticAlgorithm
+from trace_recorder import TraceRecorder
+from density_of_states import exact_degeneracies
+
+
+class _Crash(Exception):
+    pass
+
+
+def _crash_after(monkeypatch, n_saves):
+    """Lets Checkpointer.save raise after n_saves checkpoints, which are written synchronously"""
+    save = checkpoint.Checkpointer.save
+    count = [0]
+
+    def crashing_save(self, state):
+        save(self, state)
+        self.wait()
+        count[0] += 1
+        if count[0] == n_saves:
+            raise _Crash()
+    monkeypatch.setattr(checkpoint.Checkpointer, 'save', crashing_save)
+
+
+def _run_adapted(**kwargs):
+    annealer = Annealer()
+    model = Necklace(12, 2)
+    annealer.set_model(model)
+    annealer.set_degeneracies(exact_degeneracies(model, normalized=True))
+    return annealer.run_adapted(ensemble_size=20, therm_speed=0.1, start_temp=5, max_steps=300, update_steps=20,
+                                seed=2, **kwargs)
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_run_adapted_resume_matches_full_run(tmp_path, monkeypatch, vectorized):
+    full = _run_adapted(vectorized=vectorized)
+
+    path = str(tmp_path / 'run.ckpt')
+    _crash_after(monkeypatch, 150)
+    with pytest.raises(_Crash):
+        _run_adapted(vectorized=vectorized, checkpoint=path, checkpoint_interval=0,
+                     recorder=TraceRecorder(chunk_size=16))
+    monkeypatch.undo()
+
+    # The checkpoint only refers to the stored trace chunks and holds the rows of the partly filled ones
+    state = load_checkpoint(path)['recorder']
+    assert state['lengths']['energy'] == 149
+    assert all(len(rows) < 16 for rows in state['buffers'].values())
+
+    resumed = Annealer().resume_adapted(path)
+    for x, y in zip(full[:3], resumed[:3]):
+        assert np.array_equal(np.asarray(x), np.asarray(y))
+    assert np.array_equal(full[3], resumed[3])
+
+
+def test_genetic_algorithm_resume_matches_full_run(tmp_path, monkeypatch):
+    params = dict(population_size=40, num_gens=20, crossover_rate=0.2, mutation_rate=0.3, clone_rate=0.2,
+                  vectorized=True, seed=4)
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(20, 2))
+    full = ga.run(**params)
+
+    path = str(tmp_path / 'ga.ckpt')
+    _crash_after(monkeypatch, 8)
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(20, 2))
+    with pytest.raises(_Crash):
+        ga.run(checkpoint=path, checkpoint_interval=0, **params)
+    monkeypatch.undo()
+
+    assert load_checkpoint(path)['gen'] == 7
+    resumed = GeneticAlgorithm().resume(path)
+    assert np.array_equal(full[0], resumed[0])
+    assert np.array_equal(full[1], resumed[1])
+
+
+def test_run_expanded_resume_matches_full_run(tmp_path, monkeypatch):
+    params = dict(population_size=20, num_gens=12, crossover_rate=0.2, mutation_rate=0.3, clone_rate=0.2)
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(8, 2))
+    random.seed(5)
+    full = ga.run_expanded(**params)
+
+    path = str(tmp_path / 'expanded.ckpt')
+    _crash_after(monkeypatch, 5)
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(8, 2))
+    random.seed(5)
+    with pytest.raises(_Crash):
+        ga.run_expanded(checkpoint=path, checkpoint_interval=0, **params)
+    monkeypatch.undo()
+
+    assert load_checkpoint(path)['gen'] == 4
+    resumed = GeneticAlgorithm().resume(path)
+    assert np.array_equal(full[0], resumed[0])
+    assert np.array_equal(full[1], resumed[1])
+
+
+@pytest.mark.parametrize('kind', ['plain', 'expanded', 'vectorized'])
+def test_run_islands_resume_matches_full_run(tmp_path, monkeypatch, kind):
+    params = dict(population_size=24, num_gens=20, crossover_rate=0.2, mutation_rate=0.3, clone_rate=0.2,
+                  num_islands=3, migration_interval=4, expanded=kind == 'expanded',
+                  vectorized=kind == 'vectorized', seed=6)
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(8, 2))
+    full = ga.run_islands(**params)
+    full_traces = ga.get_island_traces()
+
+    path = str(tmp_path / 'islands.ckpt')
+    _crash_after(monkeypatch, 3)
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(8, 2))
+    with pytest.raises(_Crash):
+        ga.run_islands(checkpoint=path, checkpoint_interval=0, **params)
+    monkeypatch.undo()
+
+    assert load_checkpoint(path)['gen'] == 8
+    ga = GeneticAlgorithm()
+    resumed = ga.resume_islands(path)
+    assert np.array_equal(full[0], resumed[0])
+    assert np.array_equal(full[1], resumed[1])
+    for x, y in zip(full_traces, ga.get_island_traces()):
+        assert np.array_equal(x, y)
+
+
+def test_checkpoint_restores_random_module(tmp_path):
+    path = str(tmp_path / 'state.ckpt')
+    random.seed(3)
+    nkl = Necklace(10, 2)
+    ckpt = checkpoint.Checkpointer(path)
+    ckpt.save({'model': nkl})
+    ckpt.wait()
+    expected = random.random()
+    state = load_checkpoint(path)
+    assert random.random() == expected
+    assert state['model']._rng is random
+    assert state['model'].get_energy() == nkl.get_energy()
@@ -0,0 +1,70 @@
+import itertools
+import numpy as np
+import pytest
+from scipy.special import comb, logsumexp
+import density_of_states
+from density_of_states import energy_histogram, exact_degeneracies, log_degeneracies, thermal_quantities
+from necklace_model import Necklace
+from bit_necklace import BitNecklace
+
+
+def _brute_force_histogram(m, n):
+    # Energies of all balanced states, from BitNecklace which also covers n > 2
+    nkl = BitNecklace(m, n)
+    counts = {}
+    for ones in itertools.combinations(range(m * n), m * n // 2):
+        nodes = np.zeros(m * n, dtype=bool)
+        nodes[list(ones)] = True
+        nkl.set_nodes(nodes)
+        e = nkl.get_energy()
+        counts[e] = counts.get(e, 0) + 1
+    return counts
+
+
+@pytest.mark.parametrize('m,n', [(2, 2), (3, 2), (6, 2), (7, 2), (4, 3), (3, 4)])
+def test_histogram_matches_brute_force(m, n):
+    energies, counts = energy_histogram(m, n, use_disk=False)
+    assert dict(zip(energies.tolist(), counts.tolist())) == _brute_force_histogram(m, n)
+    assert sum(counts) == comb(m * n, m * n // 2, exact=True)
+
+
+def test_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(density_of_states, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(density_of_states, '_histograms', {})
+    energies, counts = energy_histogram(40, 2)
+    assert (tmp_path / 'dos_m40_n2.json').exists()
+    monkeypatch.setattr(density_of_states, '_histograms', {})
+    cached = energy_histogram(40, 2)
+    assert np.array_equal(cached[0], energies)
+    assert cached[1].tolist() == counts.tolist()
+    assert sum(counts) == comb(80, 40, exact=True)
+
+
+def test_exact_degeneracies_follow_all_energies():
+    model = Necklace(10, 2)
+    degs = exact_degeneracies(model)
+    energies, counts = energy_histogram(10, 2, use_disk=False)
+    assert len(degs) == model.dims_lumped
+    assert sum(degs) == sum(counts)
+    for e, d in zip(model.allEnergies, degs):
+        assert d == dict(zip(energies.tolist(), counts.tolist())).get(int(e), 0)
+    assert np.sum(exact_degeneracies(model, normalized=True)) == pytest.approx(1)
+
+
+def test_log_degeneracies_of_big_integers():
+    degs = [0, 1, 3**2000, 10**5]
+    logs = log_degeneracies(degs)
+    assert logs[0] == -np.inf
+    assert logs[1:] == pytest.approx([0, 2000 * np.log(3), 5 * np.log(10)])
+
+
+def test_thermal_quantities_match_direct_sums():
+    energies = np.array([0, 1, 3])
+    degs = np.array([1, 4, 2])
+    T = 1.5
+    w = degs * np.exp(-energies / T)
+    e_mean = np.sum(w * energies) / np.sum(w)
+    free, mean, heat_cap = thermal_quantities(T, energies, degs)
+    assert free == pytest.approx(-T * logsumexp(np.log(degs) - energies / T))
+    assert mean == pytest.approx(e_mean)
+    assert heat_cap == pytest.approx((np.sum(w * energies**2) / np.sum(w) - e_mean**2) / T**2)
@@ -0,0 +1,66 @@
+import itertools
+import numpy as np
+import pytest
+from math import comb
+from necklace_model import Necklace
+from density_of_states import energy_histogram, thermal_quantities
+from enumerator import revolving_door_rank, revolving_door_unrank, enumerate_chunk, enumerate_spectrum
+
+
+@pytest.mark.parametrize('size,t', [(6, 3), (8, 4), (7, 2)])
+def test_revolving_door_ranks_are_a_gray_code(size, t):
+    previous = None
+    for rank in range(comb(size, t)):
+        c = revolving_door_unrank(rank, t)
+        assert c == sorted(c) and len(set(c)) == t and c[-1] < size
+        assert revolving_door_rank(c) == rank
+        if previous is not None:
+            assert len(set(c) - set(previous)) == 1
+        previous = c
+
+
+@pytest.mark.parametrize('m,n', [(4, 2), (6, 2), (7, 2)])
+def test_spectrum_matches_transfer_matrix(m, n):
+    energies, counts, ground_states, mean_energies = enumerate_spectrum(m, n, temps=[0.5, 2])
+    e_ref, c_ref = energy_histogram(m, n, use_disk=False)
+    assert np.array_equal(energies, e_ref) and np.array_equal(counts, c_ref)
+    assert np.sum(counts) == comb(m * n, m * n // 2)
+    assert np.allclose(mean_energies, [thermal_quantities(T, e_ref, c_ref)[1] for T in [0.5, 2]])
+
+
+def test_spectrum_matches_brute_force_for_single_nodes():
+    # For n = 1 the Necklace connects every node with a ring node and a node of the external ring
+    m, half = 8, 4
+    nkl = Necklace(m, 1)
+    energies = []
+    for c in itertools.combinations(range(m), half):
+        nkl.set_state(sum(1 << p for p in c if p < half), sum(1 << (p - half) for p in c if p >= half))
+        energies.append(nkl.calc_energy())
+    e_ref, c_ref = np.unique(energies, return_counts=True)
+    energies, counts, ground_states, mean_energies = enumerate_spectrum(m, 1)
+    assert np.array_equal(energies, e_ref) and np.array_equal(counts, c_ref)
+
+
+def test_larger_n_is_rejected():
+    with pytest.raises(SystemExit):
+        enumerate_spectrum(4, 3)
+
+
+def test_ground_states_have_the_ground_energy():
+    energies, counts, ground_states, mean_energies = enumerate_spectrum(8, 2, max_ground_states=5)
+    assert len(ground_states) == min(5, counts[0])
+    nkl = Necklace(8, 2)
+    for ring, ext in ground_states:
+        nkl.set_state(ring, ext)
+        assert nkl.calc_energy() == energies[0]
+
+
+def test_chunks_add_up_to_the_whole_spectrum():
+    hist, e_min, ground, n_ground = enumerate_chunk(6, 2, 0, comb(12, 6))
+    parts = [enumerate_chunk(6, 2, start, 100) for start in range(0, comb(12, 6), 100)]
+    assert np.array_equal(np.sum([p[0] for p in parts], axis=0), hist)
+    assert min(p[1] for p in parts) == e_min
+    assert sum(p[3] for p in parts if p[1] == e_min) == n_ground
+
+    energies, counts, ground_states, mean_energies = enumerate_spectrum(6, 2, chunk_size=100, workers=2)
+    assert np.array_equal(counts, hist[energies]) and len(ground_states) == n_ground
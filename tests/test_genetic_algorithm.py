@@ -0,0 +1,48 @@
+import numpy as np
+from necklace_model import Necklace
+from necklace_ensemble import NecklaceEnsemble
+from genetic_algorithm import GeneticAlgorithm
+
+
+def test_ensemble_crossover_exchanges_tails():
+    ens = NecklaceEnsemble(Necklace(20, 2), 10, rng=np.random.default_rng(1))
+    before = ens.nodes.copy()
+    idx1, idx2 = np.array([0, 2, 4]), np.array([1, 3, 5])
+    ens.crossover(idx1, idx2)
+    for i, j in zip(idx1, idx2):
+        # The first walker keeps its nodes up to a cut and takes those of the second from there on
+        assert any(np.array_equal(ens.nodes[i], np.concatenate([before[i][:c], before[j][c:]])) and
+                   np.array_equal(ens.nodes[j], np.concatenate([before[j][:c], before[i][c:]])) for c in range(1, 40))
+    assert np.array_equal(ens.nodes[6:], before[6:])
+    assert np.array_equal(ens.energies, ens.get_energies())
+
+
+def test_ensemble_mutate_flips_one_node():
+    ens = NecklaceEnsemble(Necklace(20, 2), 10, rng=np.random.default_rng(2))
+    before = ens.nodes.copy()
+    ens.mutate(np.array([1, 7]))
+    assert np.count_nonzero(ens.nodes != before, axis=1).tolist() == [0, 1, 0, 0, 0, 0, 0, 1, 0, 0]
+    assert np.array_equal(ens.energies, ens.get_energies())
+
+
+def _run(vectorized, seed=1):
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(20, 2))
+    return ga.run(population_size=100, num_gens=40, crossover_rate=0.2, mutation_rate=0.2, clone_rate=0.2,
+                  vectorized=vectorized, seed=seed)
+
+
+def test_vectorized_run_matches_list_run():
+    # Both engines select, cross and clone in the same way, so they improve the population alike
+    e_list = _run(False)
+    e_vec = _run(True)
+    for e_mean, e_best in [e_list, e_vec]:
+        assert len(e_mean) == 40
+        assert np.all(np.diff(e_best) <= 0)
+        assert np.mean(e_mean[-5:]) < 0.6 * e_mean[0]
+
+
+def test_vectorized_run_is_reproducible():
+    results = [_run(True, seed=3) for i in range(2)]
+    assert np.array_equal(results[0][0], results[1][0])
+    assert np.array_equal(results[0][1], results[1][1])
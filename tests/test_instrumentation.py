@@ -0,0 +1,43 @@
+import numpy as np
+from instrumentation import Profiler
+from necklace_model import Necklace
+from simulated_annealing import Annealer
+from genetic_algorithm import GeneticAlgorithm
+
+
+def test_phases_counts_and_snapshots():
+    prof = Profiler(snapshot_every=2, print_summary=False)
+    t = prof.clock()
+    for step in range(5):
+        t = prof.add('work', t)
+        prof.count('proposals', 10)
+        prof.count('accepted', 4)
+        prof.tick(step)
+    assert prof.calls['work'] == 5 and prof.times['work'] >= 0
+    assert [s['step'] for s in prof.snapshots] == [0, 2, 4]
+    assert prof.snapshots[-1]['counts'] == {'proposals': 50, 'accepted': 20}
+    summary = prof.summary('Test')
+    assert summary.startswith('Test') and 'acceptance rate' in summary and '0.4000' in summary
+    prof.reset()
+    assert prof.times == {} and prof.snapshots == []
+
+
+def test_profiled_runs_count_every_proposal(capsys):
+    prof = Profiler()
+    annealer = Annealer()
+    annealer.set_model(Necklace(10, 2))
+    annealer.set_profiler(prof)
+    annealer.set_temps(np.linspace(3, 0.5, 30))
+    annealer.run(ensemble_size=5, seed=1)
+    assert prof.counts['proposals'] == 150
+    assert 0 < prof.counts['accepted'] <= 150
+    assert {'proposal', 'energy', 'record'} <= set(prof.times)
+    assert 'Annealer.run' in capsys.readouterr().out
+
+    prof.reset()
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(10, 2))
+    ga.set_profiler(prof)
+    ga.run(population_size=20, num_gens=6)
+    assert prof.counts['generations'] == 6
+    assert {'crossover', 'mutation'} <= set(prof.times)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from necklace_model import Necklace
+from genetic_algorithm import GeneticAlgorithm, migration_targets
+from stopping import TargetEnergy, Diversity, population_diversity
+
+
+def run_islands(**kwargs):
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(12, 2))
+    result = ga.run_islands(population_size=40, num_gens=25, num_islands=4, migration_interval=5, seed=7, **kwargs)
+    return ga, result
+
+
+def test_migration_targets():
+    assert migration_targets('ring', 3) == [[1], [2], [0]]
+    assert migration_targets('ring', 1) == [[]]
+    assert migration_targets('full', 3) == [[1, 2], [0, 2], [0, 1]]
+    assert migration_targets([(1,), (0,)], 2) == [[1], [0]]
+    with pytest.raises(SystemExit):
+        migration_targets([(1,)], 2)
+
+
+@pytest.mark.parametrize('options', [{}, {'vectorized': True}, {'expanded': True}, {'topology': 'full'}])
+def test_islands_are_reproducible_across_workers(options):
+    ga, (e_mean, e_best) = run_islands(**options)
+    assert len(e_mean) == len(e_best) == 25
+    assert np.all(np.diff(e_best) <= 0)
+    means, bests = ga.get_island_traces()
+    assert means.shape == bests.shape == (4, 25)
+    assert np.allclose(e_mean, means.mean(axis=0))
+    assert np.array_equal(e_best, bests.min(axis=0))
+
+    ga2, (e_mean2, e_best2) = run_islands(num_workers=2, **options)
+    assert np.array_equal(e_mean, e_mean2) and np.array_equal(e_best, e_best2)
+
+
+def test_islands_stop_after_a_migration_interval():
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(12, 2))
+    ga.set_stopping(TargetEnergy(np.inf))
+    e_mean, e_best = ga.run_islands(population_size=40, num_gens=25, num_islands=4, migration_interval=5, seed=7)
+    assert len(e_best) == 5 and ga.get_stop_reason() is not None
+    assert ga.get_island_traces()[0].shape == (4, 5)
+
+
+@pytest.mark.parametrize('options', [{}, {'vectorized': True}, {'expanded': True}, {'num_workers': 2}])
+def test_diversity_stops_island_runs(options):
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(12, 2))
+    ga.set_stopping(Diversity(1))
+    e_mean, e_best = ga.run_islands(population_size=40, num_gens=25, num_islands=4, migration_interval=5, seed=7,
+                                    **options)
+    assert len(e_best) == 5 and ga.get_stop_reason().startswith('population diversity')
+
+    ga.set_stopping(Diversity(0))
+    e_mean, e_best = ga.run_islands(population_size=40, num_gens=25, num_islands=4, migration_interval=5, seed=7,
+                                    **options)
+    assert len(e_best) == 25 and ga.get_stop_reason() is None
+
+
+def test_diversity_of_packed_genomes():
+    genomes = np.packbits(np.array([[1, 0, 1], [1, 0, 1], [0, 1, 1], [1, 1, 0]], dtype=bool), axis=1)
+    assert population_diversity(genomes) == 0.75
+
+
+def test_invalid_island_setups():
+    ga = GeneticAlgorithm()
+    with pytest.raises(SystemExit):
+        ga.run_islands(population_size=3, num_islands=4)
+    with pytest.raises(SystemExit):
+        ga.run_islands(expanded=True, vectorized=True)
@@ -0,0 +1,60 @@
+import random
+import numpy as np
+import pytest
+import kernels
+import simulated_annealing
+from necklace_model import Necklace
+from bit_necklace import BitNecklace
+from simulated_annealing import Annealer
+from schedules import FeedbackSchedule, LinearSchedule
+
+
+def _run(backend, temps, seed=1, ensemble_size=10, model=None):
+    annealer = Annealer()
+    annealer.set_model(model if model is not None else Necklace(20, 2))
+    annealer.set_temps(temps)
+    random.seed(seed)
+    result = annealer.run(ensemble_size, backend=backend)
+    return result, random.random()
+
+
+@pytest.mark.parametrize('backend', ['python', 'numba'])
+def test_kernel_matches_scalar_trajectory(backend):
+    temps = np.concatenate([np.full(10, np.inf), np.linspace(5, 0.5, 300), np.zeros(10)])
+    (e_ref, best_ref), next_ref = _run(None, temps)
+    (e_mean, e_best), next_kernel = _run(backend, temps)
+    assert np.array_equal(e_ref, e_mean)
+    assert np.array_equal(best_ref, e_best)
+    # The random module continues where the scalar run left it
+    assert next_ref == next_kernel
+
+
+def test_kernel_with_small_buffer_matches_scalar():
+    temps = np.linspace(3, 0.1, 200)
+    (e_ref, best_ref), next_ref = _run(None, temps, seed=4)
+
+    # Buffers that run out within the steps of a walker
+    run_metropolis = kernels.run_metropolis
+
+    def small_buffer(*args, **kwargs):
+        return run_metropolis(*args, buffer_size=7, **kwargs)
+    simulated_annealing.run_metropolis = small_buffer
+    try:
+        (e_mean, e_best), next_kernel = _run('python', temps, seed=4)
+    finally:
+        simulated_annealing.run_metropolis = run_metropolis
+    assert np.array_equal(e_ref, e_mean)
+    assert next_ref == next_kernel
+
+
+def test_kernel_refuses_feedback_schedule():
+    with pytest.raises(ValueError):
+        _run('python', FeedbackSchedule(start_temp=5, end_temp=1, n_steps=100))
+    with pytest.raises(ValueError):
+        _run('python', LinearSchedule(100, 5, 0.5, target_energy=2))
+
+
+def test_kernel_falls_back_for_bit_necklace(capsys):
+    (e_mean, e_best), _ = _run('python', np.linspace(3, 0.5, 50), model=BitNecklace(10, 2))
+    assert len(e_mean) == 50
+    assert 'only support Necklace' in capsys.readouterr().out
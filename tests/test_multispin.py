@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from necklace_model import Necklace
+from necklace_ensemble import NecklaceEnsemble
+from multispin import MultiSpinEnsemble, LANES, pack_lanes, unpack_lanes
+from simulated_annealing import Annealer
+from schedules import ConstantSchedule
+from transition_matrix import TransitionEstimator
+from density_of_states import energy_histogram, thermal_quantities
+
+
+@pytest.mark.parametrize('lanes', [1, 10, LANES])
+def test_pack_lanes_roundtrip(lanes):
+    # A transposed view as in MultiSpinEnsemble.set_nodes, whose lanes are not contiguous after packbits
+    bits = (np.random.default_rng(1).random([5, 3, lanes]) < 0.5).swapaxes(0, 1)
+    words = pack_lanes(bits)
+    assert words.shape == (3, 5)
+    unpacked = unpack_lanes(words)
+    assert np.array_equal(unpacked[..., :lanes], bits)
+    assert not unpacked[..., lanes:].any()
+
+
+@pytest.mark.parametrize('size', [1, 64, 65])
+def test_energies_match_necklace_ensemble(size):
+    model = Necklace(12, 2)
+    ens = MultiSpinEnsemble(model, size, rng=np.random.default_rng(2))
+    ref = NecklaceEnsemble(model, size, rng=np.random.default_rng(2))
+    assert ens.nodes.shape == (size, 24)
+    assert np.array_equal(ens.energies, ref.get_energies(ens.nodes))
+    for i in range(50):
+        ens.metropolis_step(1.5)
+    nodes = ens.nodes
+    assert np.all(nodes.sum(axis=1) == 12)
+    assert np.array_equal(ens.energies, ref.get_energies(nodes))
+    assert ens._MultiSpinEnsemble__lumped_table is model._lumped_table
+
+    # Setting the nodes again gives the same walkers
+    ens.set_nodes(nodes)
+    assert np.array_equal(ens.nodes, nodes)
+
+
+@pytest.mark.parametrize('size', [1, 65])
+def test_multispin_run_reaches_thermal_mean(size):
+    m, T = 10, 2.
+    energies, counts = energy_histogram(m, 2, use_disk=False)
+    exact = thermal_quantities(T, energies, np.array(counts, dtype=float))[1]
+    steps = 40000 // size
+    annealer = Annealer()
+    annealer.set_model(Necklace(m, 2))
+    annealer.set_temps(np.full(steps, T))
+    e_mean, e_best = annealer.run(ensemble_size=size, vectorized='multispin', seed=3)
+    assert len(e_mean) == steps
+    assert np.mean(e_mean[steps // 4:]) == pytest.approx(exact, abs=0.3)
+
+
+def test_transition_counts_match_scalar_run():
+    # Lanes whose shared pair has equal classes make no proposal and must not be counted as self-transitions
+    m, T = 10, 2.
+    model = Necklace(m, 2)
+    estimates = []
+    for vectorized, size, steps in [(False, 100, 1000), ('multispin', 128, 1600)]:
+        schedule = ConstantSchedule(T, steps)
+        schedule.Q = TransitionEstimator(model.dims_lumped)
+        annealer = Annealer()
+        annealer.set_model(model)
+        annealer.set_temps(schedule)
+        annealer.run(ensemble_size=size, vectorized=vectorized, seed=6)
+        counts = schedule.Q.get_counts().toarray()
+        estimates.append((counts.sum(axis=0), schedule.Q.get_probabilities().toarray(), schedule.Q.estimate()[0]))
+    (n_scalar, P_scalar, pi_scalar), (n_multi, P_multi, pi_multi) = estimates
+    assert n_multi.sum() < 0.6 * 128 * 1600
+    frequent = (n_scalar > 2000) & (n_multi > 2000)
+    assert np.count_nonzero(frequent) >= 4
+    assert np.allclose(P_scalar[:, frequent], P_multi[:, frequent], atol=0.03)
+    assert np.allclose(pi_scalar, pi_multi, atol=0.03)
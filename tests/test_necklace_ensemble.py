@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from necklace_model import Necklace
+from necklace_ensemble import NecklaceEnsemble
+from simulated_annealing import Annealer
+from trace_recorder import TraceRecorder
+from density_of_states import energy_histogram, thermal_quantities
+
+
+@pytest.mark.parametrize('m,n', [(20, 2), (7, 2), (8, 1)])
+def test_energies_match_necklace(m, n):
+    model = Necklace(m, n)
+    ens = NecklaceEnsemble(model, 50, rng=np.random.default_rng(1))
+    for i in range(100):
+        ens.metropolis_step(2.)
+    for k in range(ens.ensemble_size):
+        nkl = ens.get_walker(k, model)
+        assert ens.energies[k] == nkl.calc_energy()
+    assert np.array_equal(ens.energies, ens.get_energies())
+
+
+def test_lumped_table_is_shared():
+    model = Necklace(20, 2)
+    ens = NecklaceEnsemble(model, 10, rng=np.random.default_rng(1))
+    assert ens._NecklaceEnsemble__lumped_table is model._lumped_table
+    assert np.array_equal(ens.get_lumped_indices(), [model.get_lumped_index(e) for e in ens.energies])
+
+
+@pytest.mark.parametrize('T', [1., 2.])
+def test_vectorized_matches_scalar_run(T):
+    # Both engines sample the same Metropolis chain, so a seeded run at constant temperature has to reach
+    # the exact thermal mean energy with either of them
+    m = 10
+    energies, counts = energy_histogram(m, 2, use_disk=False)
+    exact = thermal_quantities(T, energies, np.array(counts, dtype=float))[1]
+    means = []
+    for vectorized in [False, True]:
+        annealer = Annealer()
+        annealer.set_model(Necklace(m, 2))
+        annealer.set_temps(np.full(400, T))
+        e_mean, e_best = annealer.run(ensemble_size=200, vectorized=vectorized, seed=5)
+        assert len(e_mean) == 400
+        assert np.all(np.diff(e_best) <= 0)
+        means.append(np.mean(e_mean[100:]))
+    assert means[0] == pytest.approx(exact, abs=0.15)
+    assert means[1] == pytest.approx(exact, abs=0.15)
+    assert means[0] == pytest.approx(means[1], abs=0.2)
+
+
+def test_vectorized_run_is_reproducible():
+    results = []
+    for i in range(2):
+        annealer = Annealer()
+        annealer.set_model(Necklace(20, 2))
+        annealer.set_temps(np.linspace(5, 0.1, 100))
+        results.append(annealer.run(ensemble_size=20, vectorized=True, seed=3))
+    assert np.array_equal(results[0][0], results[1][0])
+
+
+def test_vectorized_and_scalar_runs_are_statistically_equivalent():
+    # The engines draw different random numbers, at a fixed temperature the acceptance rates and the energy
+    # distributions of the walkers have to agree with each other and with the Boltzmann distribution
+    m, T = 10, 1.5
+    energies, counts = energy_histogram(m, 2, use_disk=False)
+    weights = np.array(counts, dtype=float) * np.exp(-energies / T)
+    exact = weights / weights.sum()
+    acceptance = []
+    for vectorized in [False, True]:
+        annealer = Annealer()
+        annealer.set_model(Necklace(m, 2))
+        annealer.set_temps(np.full(600, T))
+        recorder = TraceRecorder(walker_every=10)
+        annealer.run(ensemble_size=200, vectorized=vectorized, seed=4, recorder=recorder)
+        acceptance.append(np.mean(np.asarray(recorder.get('acceptance'))[100:]))
+        samples = np.asarray(recorder.get('walker_energies'))[10:].ravel()
+        freq = np.array([np.mean(samples == e) for e in energies])
+        assert 0.5 * np.sum(np.abs(freq - exact)) < 0.03
+    assert acceptance[0] == pytest.approx(acceptance[1], abs=0.01)
+
+
+def test_exchange_without_opposite_class_is_a_no_op():
+    ens = NecklaceEnsemble(Necklace(6, 2), 4, rng=np.random.default_rng(0))
+    nodes = ens.nodes.copy()
+    nodes[0] = False
+    nodes[1] = True
+    ens.set_walkers(nodes)
+    for i in range(20):
+        ens.pair_exchange_random()
+        assert not np.any(ens.nodes[0]) and np.all(ens.nodes[1])
+        assert np.array_equal(np.count_nonzero(ens.nodes[2:], axis=1), [6, 6])
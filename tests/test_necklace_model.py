@@ -0,0 +1,158 @@
+import pickle
+import random
+import multiprocessing
+import numpy as np
+import pytest
+from necklace_model import Necklace, lumped_index_table
+
+SIZES = [(20, 2), (6, 2), (7, 2), (4, 1), (8, 1), (3, 2), (2, 2), (1, 2)]
+
+
+@pytest.mark.parametrize('m,n', SIZES)
+def test_delta_energy_matches_calc_energy(m, n):
+    rng = random.Random(1)
+    nkl = Necklace(m, n, SEED=1)
+    size = m * n
+    for i in range(2000):
+        pos1 = rng.randrange(size)
+        pos2 = rng.randrange(size)
+        e = nkl.get_energy()
+        de = nkl.delta_energy(pos1, pos2)
+        nkl.pair_exchange(pos1, pos2)
+        assert nkl.get_energy() == nkl.calc_energy()
+        assert nkl.get_energy() - e == de
+
+
+@pytest.mark.parametrize('m,n', SIZES)
+def test_change_class_updates_energy(m, n):
+    rng = random.Random(2)
+    nkl = Necklace(m, n, SEED=2)
+    for i in range(500):
+        nkl.change_class(rng.randrange(m * n))
+        assert nkl.get_energy() == nkl.calc_energy()
+
+
+@pytest.mark.parametrize('m,n', SIZES)
+def test_random_exchange_and_undo(m, n):
+    nkl = Necklace(m, n, SEED=3)
+    for i in range(500):
+        ring, ext, e = nkl._ring, nkl._ext, nkl.get_energy()
+        nkl.pair_exchange_random()
+        assert nkl.get_energy() == nkl.calc_energy()
+        nkl.undo_random_exchange()
+        assert (nkl._ring, nkl._ext, nkl.get_energy()) == (ring, ext, e)
+        nkl.pair_exchange_random()
+
+
+def test_pickle_unseeded_necklace():
+    nkl = Necklace(20, 2)
+    nkl.expand()
+    copy = pickle.loads(pickle.dumps(nkl))
+    assert copy._rng is random
+    assert (copy._ring, copy._ext, copy._ring_expanded) == (nkl._ring, nkl._ext, nkl._ring_expanded)
+    assert copy.get_energy() == nkl.get_energy() == copy.calc_energy()
+    assert copy.allEnergies is nkl.allEnergies
+
+
+def test_pickle_seeded_necklace_keeps_stream():
+    nkl = Necklace(20, 2, SEED=5)
+    copy = pickle.loads(pickle.dumps(nkl))
+    for i in range(100):
+        nkl.pair_exchange_random()
+        copy.pair_exchange_random()
+    assert (copy._ring, copy._ext) == (nkl._ring, nkl._ext)
+
+
+def test_workers_with_spawn_start_method():
+    # Models are pickled for the workers under spawn, the default start method on macOS and Windows
+    from simulated_annealing import Annealer
+    from genetic_algorithm import GeneticAlgorithm
+    method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method('spawn', force=True)
+    try:
+        annealer = Annealer()
+        annealer.set_model(Necklace(10, 2))
+        e_mean = annealer.run_adapted(ensemble_size=8, therm_speed=0.1, start_temp=5, max_steps=20, update_steps=10,
+                                      seed=1, num_workers=2)[0]
+        assert len(e_mean) == 20
+        ga = GeneticAlgorithm()
+        ga.set_model(Necklace(10, 2))
+        e_mean, e_best = ga.run_islands(population_size=20, num_gens=4, num_islands=2, migration_interval=2, seed=1,
+                                        num_workers=2)
+        assert len(e_mean) == 4
+    finally:
+        multiprocessing.set_start_method(method, force=True)
+
+
+def test_random_exchange_draws_opposite_pairs_uniformly():
+    nkl = Necklace(3, 2, SEED=7)
+    counts = {}
+    for i in range(30000):
+        nkl.pair_exchange_random()
+        pair = tuple(sorted((nkl._Necklace__lastPos1, nkl._Necklace__lastPos2)))
+        assert nkl.val_at_pos(pair[0]) != nkl.val_at_pos(pair[1])
+        counts[pair] = counts.get(pair, 0) + 1
+        nkl.undo_random_exchange()
+    # A balanced state of 6 nodes has 3*3 opposite pairs
+    assert len(counts) == 9
+    assert max(counts.values()) / min(counts.values()) < 1.15
+
+
+def _majority_state(nkl):
+    # Collapsed ring and external integers by a majority vote over every block of the expanded integers
+    m = nkl.get_size()[0]
+    nbits = nkl._expanded_bits
+    states = []
+    for expanded in (nkl._ring_expanded, nkl._ext_expanded):
+        state = 0
+        for b in range(m):
+            if bin((expanded >> (b * nbits)) & ((1 << nbits) - 1)).count('1') > nbits // 2:
+                state |= 1 << b
+        states.append(state)
+    return tuple(states)
+
+
+@pytest.mark.parametrize('m', [4, 20, 33])
+def test_expand_and_collapse_roundtrip(m):
+    nkl = Necklace(m, 2, SEED=m)
+    state = (nkl._ring, nkl._ext)
+    nkl.expand(5)
+    assert _majority_state(nkl) == state
+    nkl.shuffle_expanded()
+    nkl.collapse()
+    assert (nkl._ring, nkl._ext) == _majority_state(nkl)
+    assert nkl.get_energy() == nkl.calc_energy()
+
+
+@pytest.mark.parametrize('m', [4, 20, 33])
+def test_expanded_crossover_and_mutation(m):
+    nkl1, nkl2 = Necklace(m, 2, SEED=1), Necklace(m, 2, SEED=2)
+    for nkl in (nkl1, nkl2):
+        nkl.expand(3)
+        nkl.shuffle_expanded()
+        nkl.collapse()
+    for i in range(50):
+        before = [(x._ring_expanded, x._ext_expanded) for x in (nkl1, nkl2)]
+        nkl1.crossover_expanded(nkl2)
+        # Every bit keeps the pair of values of both parents
+        assert nkl1._ring_expanded ^ nkl2._ring_expanded == before[0][0] ^ before[1][0]
+        assert nkl1._ext_expanded ^ nkl2._ext_expanded == before[0][1] ^ before[1][1]
+        nkl1.mutate_expanded()
+        for nkl in (nkl1, nkl2):
+            assert (nkl._ring, nkl._ext) == _majority_state(nkl)
+            assert nkl.get_energy() == nkl.calc_energy()
+
+
+@pytest.mark.parametrize('m,n', [(20, 2), (7, 2), (8, 1)])
+def test_lumped_index_lookup(m, n):
+    nkl = Necklace(m, n)
+    for i, e in enumerate(nkl.allEnergies):
+        assert nkl.get_lumped_index(e) == i
+    assert nkl.overflow_count == 0
+    # Energies outside allEnergies, e.g. of unbalanced states, go to the overflow bin
+    outside = sorted(set(range(1, int(nkl.allEnergies[-1]) + 10)) - set(nkl.allEnergies.tolist()))
+    for e in outside:
+        assert nkl.get_lumped_index(e) == nkl.dims_lumped
+    assert nkl.overflow_count == len(outside)
+    assert np.array_equal(lumped_index_table(nkl.allEnergies), nkl._lumped_table)
+    assert Necklace(m, n)._lumped_table is nkl._lumped_table
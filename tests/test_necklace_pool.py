@@ -0,0 +1,45 @@
+from necklace_model import Necklace, NecklacePool, necklace_metadata
+from genetic_algorithm import GeneticAlgorithm
+
+
+def test_copy_is_independent_and_shares_metadata():
+    nkl = Necklace(10, 2)
+    copy = nkl.get_copy()
+    assert (copy._ring, copy._ext, copy.get_energy()) == (nkl._ring, nkl._ext, nkl.get_energy())
+    assert copy.allEnergies is nkl.allEnergies is necklace_metadata(10, 2)['allEnergies']
+    assert copy._rng is nkl._rng
+    copy.pair_exchange_random()
+    copy.mutate()
+    assert copy.get_energy() == copy.calc_energy()
+    assert nkl.get_energy() == nkl.calc_energy()
+
+
+def test_copy_from_overwrites_other_sizes():
+    nkl, other = Necklace(10, 2), Necklace(6, 1)
+    nkl.expand(3)
+    other.copy_from(nkl)
+    assert other.get_size() == nkl.get_size() and other.dims_lumped == nkl.dims_lumped
+    assert (other._ring_expanded, other._ext_expanded, other._expanded_bits) == \
+           (nkl._ring_expanded, nkl._ext_expanded, nkl._expanded_bits)
+    other.collapse()
+    assert other.get_energy() == other.calc_energy()
+
+
+def test_pool_reuses_released_necklaces():
+    pool = NecklacePool()
+    nkl = Necklace(8, 2)
+    first = pool.copy(nkl)
+    assert first is not nkl and len(pool) == 0
+    pool.release([first])
+    assert len(pool) == 1
+    other = Necklace(8, 2)
+    second = pool.copy(other)
+    assert second is first and len(pool) == 0
+    assert (second._ring, second._ext, second.get_energy()) == (other._ring, other._ext, other.get_energy())
+
+
+def test_genetic_algorithm_with_pool_keeps_energies_consistent():
+    ga = GeneticAlgorithm()
+    ga.set_model(Necklace(12, 2, SEED=5))
+    e_mean, e_best = ga.run(population_size=30, num_gens=20, clone_rate=0.3)
+    assert len(e_mean) == 20 and all(e_best[1:] <= e_best[:-1])
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from necklace_model import Necklace
+from parallel_tempering import ParallelTempering, geometric_temps
+from density_of_states import energy_histogram, thermal_quantities
+
+
+def _run(seed=1, num_steps=20000):
+    pt = ParallelTempering()
+    pt.set_model(Necklace(10, 2))
+    pt.set_temps(geometric_temps(0.5, 4, 6)[::-1])
+    return pt.run(num_steps=num_steps, swap_steps=5, seed=seed)
+
+
+def test_geometric_temps():
+    temps = geometric_temps(0.5, 4, 4)
+    assert temps[0] == pytest.approx(0.5) and temps[-1] == pytest.approx(4)
+    assert np.allclose(temps[1:] / temps[:-1], 2)
+
+
+def test_replicas_reach_thermal_means():
+    # Swaps keep every temperature in equilibrium, so each column has the exact thermal mean energy
+    energies, counts = energy_histogram(10, 2, use_disk=False)
+    e_temps, e_best, swap_rates = _run()
+    assert e_temps.shape == (20000, 6)
+    assert np.all(np.diff(e_best) <= 0)
+    assert np.all((swap_rates > 0) & (swap_rates <= 1))
+    for T, e_mean in zip(geometric_temps(0.5, 4, 6), e_temps[1000:].mean(axis=0)):
+        exact = thermal_quantities(T, energies, np.array(counts, dtype=float))[1]
+        assert e_mean == pytest.approx(exact, abs=0.3)
+
+
+def test_run_is_reproducible():
+    results = [_run(seed=4, num_steps=200) for i in range(2)]
+    for x, y in zip(results[0], results[1]):
+        assert np.array_equal(x, y)
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import simulated_annealing
+from necklace_model import Necklace
+from rejection_free import RejectionFreeSampler
+from simulated_annealing import Annealer
+from density_of_states import energy_histogram, thermal_quantities
+
+SIZES = [(20, 2), (7, 2), (8, 1), (3, 2), (2, 2), (1, 2)]
+
+
+def _move_counts(nkl, delta_energies):
+    # Energy changes of all opposite-class pair moves from Necklace.delta_energy
+    m, n = nkl.get_size()
+    size = int(m * n)
+    ones = [p for p in range(size) if nkl.val_at_pos(p) == 1]
+    zeros = [p for p in range(size) if nkl.val_at_pos(p) == 0]
+    de = [nkl.delta_energy(p1, p2) for p1 in ones for p2 in zeros]
+    return np.array([de.count(x) for x in delta_energies])
+
+
+@pytest.mark.parametrize('m,n', SIZES)
+def test_move_table_matches_delta_energy(m, n):
+    annealer = Annealer()
+    annealer.set_model(Necklace(m, n))
+    ensemble = annealer._create_ensemble(5, False, 1)
+    sampler = RejectionFreeSampler(ensemble)
+    for i in range(100):
+        sampler.step(1.)
+        for k, nkl in enumerate(ensemble):
+            assert np.array_equal(sampler.counts[k], _move_counts(nkl, sampler.delta_energies))
+            assert sampler.energies[k] == nkl.get_energy() == nkl.calc_energy()
+    assert sampler.time[0] == 100
+
+
+def test_step_and_jump_reach_thermal_mean():
+    m, T = 10, 0.7
+    energies, counts = energy_histogram(m, 2, use_disk=False)
+    exact = thermal_quantities(T, energies, np.array(counts, dtype=float))[1]
+    annealer = Annealer()
+    annealer.set_model(Necklace(m, 2))
+    ensemble = annealer._create_ensemble(50, False, 3)
+    sampler = RejectionFreeSampler(ensemble)
+    e_mean = [sampler.step(T)[0] / 50 for i in range(4000)]
+    assert np.mean(e_mean[500:]) == pytest.approx(exact, abs=0.15)
+
+    # After a jump the walkers are in the new state, so energies are weighted by the time they are kept
+    e_time = 0
+    t_start = sampler.time.copy()
+    for i in range(1000):
+        e_cur = sampler.energies.copy()
+        e_time += np.sum(e_cur * sampler.jump(T))
+    assert e_time / np.sum(sampler.time - t_start) == pytest.approx(exact, abs=0.15)
+
+
+def _count_samplers(monkeypatch):
+    created = []
+
+    class Sampler(RejectionFreeSampler):
+        def __init__(self, ensemble):
+            super().__init__(ensemble)
+            created.append(self)
+    monkeypatch.setattr(simulated_annealing, 'RejectionFreeSampler', Sampler)
+    return created
+
+
+def test_run_only_switches_below_break_even(monkeypatch):
+    created = _count_samplers(monkeypatch)
+    annealer = Annealer()
+    annealer.set_model(Necklace(20, 2))
+    annealer.set_temps(np.full(300, 3.))
+    annealer.run(ensemble_size=10, seed=1, rejection_free=1)
+    assert len(created) == 0
+
+    annealer.set_temps(np.linspace(0.5, 0.1, 1000))
+    results = [annealer.run(ensemble_size=10, seed=1, rejection_free=1) for i in range(2)]
+    assert len(created) == 2
+    assert np.array_equal(results[0][0], results[1][0])
+    assert np.all(np.diff(results[0][1]) <= 0)
+    assert created[0].time[0] < 1000
+
+
+def test_choose_falls_back_to_last_class_with_positive_rate():
+    annealer = Annealer()
+    annealer.set_model(Necklace(10, 2))
+    ensemble = annealer._create_ensemble(1, False, 4)
+    sampler = RejectionFreeSampler(ensemble)
+    nkl = ensemble[0]
+    stream = nkl._rng
+
+    class Top:
+        # The first draw is at the upper end of the class weights, as round-off can leave it
+        def __init__(self):
+            self.first = True
+
+        def random(self):
+            if self.first:
+                self.first = False
+                return 1.
+            return stream.random()
+    nkl.set_rng(Top())
+    rates = sampler.rates(1.).tolist()
+    last = max(i for i, (n, r) in enumerate(zip(sampler.counts[0], rates)) if n * r > 0)
+    pos1, pos2 = sampler._RejectionFreeSampler__choose(0, rates)
+    assert nkl.val_at_pos(pos1) == 1 and nkl.val_at_pos(pos2) == 0
+    assert nkl.delta_energy(pos1, pos2) == sampler.delta_energies[last]
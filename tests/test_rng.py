@@ -0,0 +1,26 @@
+import numpy as np
+from rng import RandomStream, spawn_streams
+
+
+def test_streams_are_reproducible_and_independent():
+    a, b = spawn_streams(3, 2), spawn_streams(3, 2)
+    first = [[s.random() for i in range(10)] for s in a]
+    assert first == [[s.random() for i in range(10)] for s in b]
+    assert first[0] != first[1]
+
+
+def test_randoms_continue_the_stream():
+    a, b = RandomStream(1, buffer_size=8), RandomStream(1, buffer_size=8)
+    x = [a.random() for i in range(5)] + a.randoms(10).tolist() + [a.random()]
+    y = [b.random() for i in range(5)] + [b.random() for i in range(3)] + b.generator.random(7).tolist()
+    assert x[:15] == y
+
+
+def test_positions_are_uniform_and_follow_the_size():
+    stream = RandomStream(2, buffer_size=1000)
+    positions = [stream.position(7) for i in range(70000)]
+    assert min(positions) == 0 and max(positions) == 6
+    assert np.allclose(np.bincount(positions) / 70000, 1 / 7, atol=0.01)
+    assert max(stream.position(3) for i in range(100)) == 2
+    a, b = RandomStream(4), RandomStream(4)
+    assert [(a.position(10), a.random()) for i in range(5000)] == [(b.position(10), b.random()) for i in range(5000)]
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from necklace_model import Necklace
+from simulated_annealing import Annealer
+from schedules import ArraySchedule, ConstantSchedule, LinearSchedule, ExponentialSchedule, InverseSchedule, \
+    LogarithmicSchedule, PiecewiseSchedule, FeedbackSchedule, AdaptiveSchedule
+from density_of_states import exact_degeneracies
+
+
+@pytest.mark.parametrize('cls', [LinearSchedule, ExponentialSchedule, InverseSchedule, LogarithmicSchedule])
+def test_cooling_schedules_reach_end_temp(cls):
+    temps = cls(50, start_temp=10, end_temp=0.5).to_array()
+    assert len(temps) == 50
+    assert temps[0] == pytest.approx(10) and temps[-1] == pytest.approx(0.5)
+    assert np.all(np.diff(temps) < 0)
+
+
+def test_exponential_matches_assignment_formula():
+    n, t0, t1 = 100, 5., 0.1
+    t = np.arange(n) * n / (n - 1)
+    b = -n / np.log(t1 / t0)
+    assert np.allclose(ExponentialSchedule(n, t0, t1).to_array(), t0 * np.exp(-t / b))
+
+
+def test_schedules_are_lazy_and_restartable():
+    schedule = ConstantSchedule(np.inf)
+    temps = []
+    for T in schedule:
+        temps.append(T)
+        if len(temps) == 1000:
+            schedule.stop('enough')
+    assert len(temps) == 1000 and schedule.stop_reason == 'enough'
+    assert list(ArraySchedule([3, 2, 1])) == [3, 2, 1]
+    piecewise = PiecewiseSchedule([ConstantSchedule(2., 3), LinearSchedule(3, 1, 0.5)])
+    assert list(piecewise) == [2, 2, 2, 1, 0.75, 0.5]
+    assert list(piecewise) == [2, 2, 2, 1, 0.75, 0.5]
+
+
+def test_run_with_schedule_matches_array():
+    results = []
+    for temps in [ExponentialSchedule(100, 5, 0.1), ExponentialSchedule(100, 5, 0.1).to_array()]:
+        annealer = Annealer()
+        annealer.set_model(Necklace(20, 2))
+        annealer.set_temps(temps)
+        results.append(annealer.run(ensemble_size=5, seed=3))
+    assert np.array_equal(results[0][0], results[1][0])
+
+
+def test_target_energy_and_patience_end_the_run():
+    annealer = Annealer()
+    annealer.set_model(Necklace(10, 2))
+    annealer.set_temps(LinearSchedule(5000, 1, 0.1, target_energy=2))
+    e_mean, e_best = annealer.run(ensemble_size=10, seed=1)
+    assert e_best[-1] == 2 and len(e_best) < 5000
+    assert np.all(e_best[:-1] > 2)
+
+    annealer.set_temps(ConstantSchedule(0., 5000, patience=50))
+    e_mean, e_best = annealer.run(ensemble_size=10, seed=1)
+    assert len(e_best) < 5000
+    assert np.all(e_best[-50:] == e_best[-1])
+
+
+def test_feedback_schedule_cools_slower_at_low_acceptance():
+    fast, slow = FeedbackSchedule(10, 1, 0.9, 0.5), FeedbackSchedule(10, 1, 0.9, 0.5)
+    fast.reset(), slow.reset()
+    fast.observe(0, 0, 0, 0.8)
+    slow.observe(0, 0, 0, 0.1)
+    assert fast.T == pytest.approx(9)
+    assert 9 < slow.T < 10
+    schedule, temps = FeedbackSchedule(10, 1, 0.5, 0.5), []
+    for step, T in enumerate(schedule):
+        temps.append(T)
+        schedule.observe(step, 0, 0, 1.)
+    assert temps == [10, 5, 2.5, 1.25]
+    with pytest.raises(ValueError):
+        FeedbackSchedule(n_steps=10).to_array()
+
+
+def test_adaptive_schedule_in_run():
+    model = Necklace(12, 2)
+    schedule = AdaptiveSchedule(model, therm_speed=0.1, start_temp=5, update_steps=10,
+                                degeneracies=exact_degeneracies(model, normalized=True), n_steps=300)
+    annealer = Annealer()
+    annealer.set_model(model)
+    annealer.set_temps(schedule)
+    e_mean, e_best = annealer.run(ensemble_size=20, seed=2)
+    assert len(e_mean) == 300
+    assert schedule.T < 5 and schedule.Q.get_counts().sum() == 300 * 20
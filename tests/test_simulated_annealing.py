@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from necklace_model import Necklace
+from simulated_annealing import Annealer
+from density_of_states import exact_degeneracies
+
+
+def _run_adapted(num_workers, seed=2, vectorized=False):
+    annealer = Annealer()
+    model = Necklace(12, 2)
+    annealer.set_model(model)
+    annealer.set_degeneracies(exact_degeneracies(model, normalized=True))
+    return annealer.run_adapted(ensemble_size=40, therm_speed=0.1, start_temp=5, max_steps=200, update_steps=20,
+                                seed=seed, vectorized=vectorized, num_workers=num_workers)
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_parallel_run_adapted_is_reproducible(vectorized):
+    results = [_run_adapted(2, vectorized=vectorized) for i in range(2)]
+    for x, y in zip(results[0], results[1]):
+        assert np.array_equal(np.asarray(x), np.asarray(y))
+    assert not np.array_equal(results[0][0], _run_adapted(2, seed=3, vectorized=vectorized)[0])
+
+
+def test_parallel_run_adapted_matches_serial_run():
+    # The workers use other random streams than one process, so only the course of the run is compared
+    serial = _run_adapted(1)
+    parallel = _run_adapted(3)
+    for result in [serial, parallel]:
+        e_mean, e_best, temps, degs = result
+        assert len(e_mean) == len(e_best) == len(temps) == 200
+        assert np.all(np.diff(e_best) <= 0)
+        assert np.all(np.diff(temps) <= 0)
+        assert np.mean(e_mean[-50:]) < np.mean(e_mean[:20])
+    assert parallel[2][-1] == pytest.approx(serial[2][-1], rel=0.3)
+    assert np.mean(parallel[0][-50:]) == pytest.approx(np.mean(serial[0][-50:]), rel=0.2)
@@ -0,0 +1,76 @@
+import time
+import numpy as np
+from necklace_model import Necklace
+from necklace_ensemble import NecklaceEnsemble
+from simulated_annealing import Annealer
+from genetic_algorithm import GeneticAlgorithm
+from stopping import TargetEnergy, Stagnation, Diversity, WallClock, AcceptanceFloor, as_list, check_all, \
+    population_diversity
+
+
+def test_target_energy():
+    criterion = TargetEnergy(3)
+    assert criterion.check({}) is None
+    assert criterion.check({'best_energy': 4}) is None
+    assert criterion.check({'best_energy': 3}) is not None
+
+
+def test_stagnation_counts_steps_without_improvement():
+    criterion = Stagnation(3, min_improvement=0.5)
+    reasons = [criterion.check({'best_energy': e}) for e in [10, 9, 8.8, 8.6, 8.6]]
+    assert reasons[:4] == [None] * 4 and reasons[4] is not None
+    criterion.reset()
+    assert criterion.check({'best_energy': 8.4}) is None
+
+
+def test_acceptance_floor_uses_window_mean():
+    criterion = AcceptanceFloor(0.1, window=4)
+    reasons = [criterion.check({'acceptance': a}) for a in [0.5, 0, 0, 0, 0]]
+    assert reasons[:4] == [None] * 4 and reasons[4] is not None
+
+
+def test_wall_clock():
+    criterion = WallClock(0.05)
+    assert criterion.check({}) is None
+    time.sleep(0.06)
+    assert criterion.check({}) is not None
+    criterion.reset()
+    assert criterion.check({}) is None
+
+
+def test_population_diversity_and_helpers():
+    model = Necklace(8, 2)
+    population = [model.get_copy() for k in range(4)]
+    population[0].shuffle_state()
+    assert population_diversity(population) in (0.25, 0.5)
+    ensemble = NecklaceEnsemble(model, 10, rng=np.random.default_rng(0))
+    assert population_diversity(ensemble) == 1
+    assert Diversity(0.5).check({'population': population}) is not None
+    assert as_list(None) == [] and len(as_list(Diversity())) == 1
+    criteria = [TargetEnergy(0), Stagnation(1)]
+    assert check_all(criteria, {'best_energy': 5}) is None
+    assert check_all(criteria, {'best_energy': 5}).startswith('no improvement')
+
+
+def test_annealer_stops_at_target():
+    annealer = Annealer()
+    annealer.set_model(Necklace(10, 2))
+    annealer.set_temps(np.geomspace(3, 0.1, 3000))
+    annealer.set_stopping(TargetEnergy(4))
+    e_mean, e_best = annealer.run(ensemble_size=10, seed=0)
+    assert len(e_best) < 3000 and e_best[-1] <= 4 and np.all(e_best[:-1] > 4)
+    assert annealer.get_stop_reason() is not None
+
+    annealer.set_stopping(None)
+    e_mean, e_best = annealer.run(ensemble_size=10, seed=0)
+    assert len(e_best) == 3000 and annealer.get_stop_reason() is None
+
+
+def test_genetic_algorithm_stops_on_diversity():
+    for vectorized in (False, True):
+        ga = GeneticAlgorithm()
+        ga.set_model(Necklace(8, 2))
+        ga.set_stopping(Diversity(1))
+        e_mean, e_best = ga.run(population_size=20, num_gens=50, vectorized=vectorized, seed=0)
+        assert len(e_mean) == len(e_best) == 1
+        assert ga.get_stop_reason().startswith('population diversity')
@@ -0,0 +1,55 @@
+import os
+import json
+import numpy as np
+from sweep import expand_config, config_key, run_sweep, load_result, make_schedule, make_stopping
+from schedules import ExponentialSchedule, ConstantSchedule
+from stopping import TargetEnergy, AcceptanceFloor
+
+CONFIG = {'runs': [
+    {'optimiser': 'anneal', 'm': 10, 'steps': 30, 'ensemble_size': [2, 4], 'seed': 1,
+     'schedule': [{'family': 'constant', 'temp': 'inf'}, {'family': 'exponential', 'start_temp': 5, 'end_temp': 0.5}]},
+    {'optimiser': 'ga', 'm': 10, 'population_size': 20, 'num_gens': 5, 'seed': 1, 'stopping': {'target_energy': 2}},
+]}
+
+
+def test_expand_config():
+    runs = expand_config(CONFIG)
+    assert len(runs) == 5
+    assert sorted((r['schedule']['family'], r['ensemble_size']) for r in runs[:4]) == \
+        [('constant', 2), ('constant', 4), ('exponential', 2), ('exponential', 4)]
+    assert runs[4]['stopping'] == {'target_energy': 2}
+    assert len(set(config_key(r) for r in runs)) == 5
+    assert config_key(dict(reversed(list(runs[0].items())))) == config_key(runs[0])
+
+
+def test_schedule_and_stopping_factories():
+    assert isinstance(make_schedule('exponential', 10, start_temp=5, end_temp=1), ExponentialSchedule)
+    constant = make_schedule('constant', 10, temp=2.)
+    assert isinstance(constant, ConstantSchedule) and list(constant) == [2.] * 10
+    criteria = make_stopping({'target_energy': 2, 'acceptance_floor': [0.01, 5]})
+    assert [type(c) for c in criteria] == [TargetEnergy, AcceptanceFloor]
+
+
+def test_run_sweep_stores_and_skips_finished_runs(tmp_path, capsys):
+    store = str(tmp_path / 'store')
+    index = run_sweep(CONFIG, store, workers=2)
+    assert len(index) == 5
+    for key, entry in index.items():
+        assert os.path.exists(os.path.join(store, key + '.npz'))
+        result = load_result(store, key)
+        assert entry['best_energy'] == result['best_energies'][-1]
+        assert entry['steps'] == len(result['energies'])
+    anneal = [k for k, e in index.items() if e['config']['optimiser'] == 'anneal']
+    assert all(index[k]['steps'] == 30 for k in anneal)
+
+    # Seeded runs are reproducible and a second sweep only reads the store
+    first = {k: load_result(store, k)['energies'] for k in anneal}
+    os.remove(os.path.join(store, anneal[0] + '.npz'))
+    del index[anneal[0]]
+    with open(os.path.join(store, 'index.json'), 'w') as f:
+        json.dump(index, f)
+    capsys.readouterr()
+    index = run_sweep(CONFIG, store, workers=1)
+    assert 'sweep: 1 runs to execute, 4 in store' in capsys.readouterr().out
+    assert len(index) == 5
+    assert np.array_equal(load_result(store, anneal[0])['energies'], first[anneal[0]])
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from trace_recorder import TraceRecorder
+
+
+def _fill(rec, n=50):
+    for i in range(n):
+        rec.record(energy=float(i), walkers=np.arange(3) + i)
+    rec.extend('energy', np.arange(n, 2 * n, dtype=float))
+
+
+@pytest.mark.parametrize('on_disk', [False, True])
+def test_views_across_chunks(tmp_path, on_disk):
+    rec = TraceRecorder(str(tmp_path / 'traces') if on_disk else None, chunk_size=8)
+    _fill(rec)
+    energy = rec.get('energy')
+    assert len(energy) == 100 and rec.length('walkers') == 50
+    assert np.array_equal(np.asarray(energy), np.arange(100))
+    assert np.array_equal(energy[5:37:3], np.arange(5, 37, 3))
+    assert energy[-1] == 99 and energy[63] == 63
+    assert np.array_equal(energy[::-1], np.arange(100)[::-1])
+    assert np.array_equal(energy.downsample(7), np.arange(0, 100, 7))
+    assert np.array_equal(rec.get('walkers')[49], [49, 50, 51])
+    with pytest.raises(IndexError):
+        energy[100]
+
+
+def test_open_flushed_recorder(tmp_path):
+    path = str(tmp_path / 'traces')
+    rec = TraceRecorder(path, chunk_size=8, walker_every=5)
+    _fill(rec)
+    for step in range(12):
+        rec.record_walkers(step, np.full(4, step))
+    rec.flush()
+    opened = TraceRecorder.open(path)
+    assert sorted(opened.fields()) == ['energy', 'walker_energies', 'walker_step', 'walkers']
+    assert np.array_equal(np.asarray(opened.get('energy')), np.arange(100))
+    assert np.array_equal(np.asarray(opened.get('walker_step')), [0, 5, 10])
+
+
+def test_state_roundtrip_continues_recording(tmp_path):
+    rec = TraceRecorder(chunk_size=8)
+    _fill(rec, 20)
+    with pytest.raises(ValueError):
+        rec.get_state()
+    rec.spill(str(tmp_path / 'traces'))
+    state = rec.get_state()
+    # Only the partly filled chunk is part of the state
+    assert len(state['buffers']['energy']) == 40 % 8
+    assert state['lengths'] == {'energy': 40, 'walkers': 20}
+
+    restored = TraceRecorder.from_state(state)
+    for r in [rec, restored]:
+        r.extend('energy', np.arange(40, 45, dtype=float))
+        r.record(walkers=np.arange(3) + 20)
+    assert np.array_equal(np.asarray(restored.get('energy')), np.asarray(rec.get('energy')))
+    assert np.array_equal(np.asarray(restored.get('walkers')), np.asarray(rec.get('walkers')))
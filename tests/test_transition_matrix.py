@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from scipy.sparse.linalg import ArpackError
+import transition_matrix
+from transition_matrix import TransitionEstimator
+from instrumentation import Profiler
+
+
+def _reversible_counts(dims, seed=1):
+    # Symmetric counts give a reversible chain whose stationary distribution is proportional to the column sums
+    counts = np.random.default_rng(seed).integers(0, 20, [dims, dims])
+    return counts + counts.T
+
+
+def test_add_matches_add_counts():
+    counts = _reversible_counts(6)
+    Q1, Q2 = TransitionEstimator(6), TransitionEstimator(6)
+    Q1.add_counts(counts)
+    cols, rows = np.nonzero(counts.T)
+    for c, r in zip(cols, rows):
+        Q2.add(np.full(counts[r, c], r), np.full(counts[r, c], c))
+    assert np.array_equal(Q1.get_counts().toarray(), Q2.get_counts().toarray())
+
+
+def test_estimate_matches_dense_solution():
+    counts = _reversible_counts(30)
+    Q = TransitionEstimator(30)
+    Q.add_counts(counts)
+    pi, lambda2 = Q.estimate()
+    P = counts / counts.sum(axis=0)
+    assert pi == pytest.approx(counts.sum(axis=0) / counts.sum(), abs=10**-6)
+    assert lambda2 == pytest.approx(np.sort(np.linalg.eigvals(P).real)[-2], abs=10**-6)
+
+
+def test_estimate_falls_back_to_dense_eigenvalues(monkeypatch):
+    counts = _reversible_counts(30)
+    Q = TransitionEstimator(30, dense_states=0)
+    Q.add_counts(counts)
+    expected = Q.estimate()[1]
+
+    def fail(*args, **kwargs):
+        raise ArpackError(3)
+    monkeypatch.setattr(transition_matrix, 'eigsh', fail)
+    Q = TransitionEstimator(30, dense_states=0)
+    Q.add_counts(counts)
+    assert Q.estimate()[1] == pytest.approx(expected, abs=10**-8)
+
+
+def test_dense_and_sparse_eigenvalues_agree_on_decomposable_chain():
+    # Two separate blocks have the eigenvalue 1 twice, the warm start then depends on the returned eigenvectors
+    counts = np.zeros([12, 12], dtype=int)
+    counts[:6, :6] = _reversible_counts(6)
+    counts[6:, 6:] = _reversible_counts(6, seed=2)
+    results = []
+    for dense_states in (200, 0):
+        Q = TransitionEstimator(12, dense_states=dense_states)
+        Q.add_counts(counts)
+        assert Q.estimate()[1] == pytest.approx(1)
+        Q.add_counts(_reversible_counts(12, seed=3))
+        results.append(Q.estimate()[1])
+    assert results[0] == pytest.approx(results[1], abs=10**-8)
+
+
+def test_estimate_is_only_refreshed_after_enough_transitions():
+    Q = TransitionEstimator(4, refresh_transitions=100)
+    Q.add_counts(_reversible_counts(4))
+    pi = Q.estimate()[0].copy()
+    Q.add(np.zeros(10, dtype=int), np.ones(10, dtype=int))
+    assert np.array_equal(Q.estimate()[0], pi)
+
+
+def test_overflow_transitions_are_not_counted():
+    Q = TransitionEstimator(3)
+    Q.add(np.array([0, 3, 1, 2]), np.array([1, 0, 3, 2]))
+    Q.add(1, 0)
+    assert Q.get_counts().sum() == 3
+    assert Q.overflow == 2
+
+
+def test_power_iterations_are_counted_and_bounded():
+    with pytest.raises(SystemExit):
+        TransitionEstimator(6, max_iter=0)
+    Q = TransitionEstimator(6, max_iter=1)
+    Q.profiler = Profiler(print_summary=False)
+    Q.add_counts(_reversible_counts(6))
+    Q.estimate()
+    assert Q.profiler.counts['power_iterations'] == 1
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from necklace_model import Necklace
+from wang_landau import WangLandau
+from density_of_states import exact_degeneracies
+
+
+@pytest.mark.parametrize('vectorized,ensemble_size,log_f_final,tol', [(True, 20, 10**-4, 0.4), (False, 4, 10**-3, 0.6)])
+def test_degeneracies_match_exact(vectorized, ensemble_size, log_f_final, tol):
+    model = Necklace(8, 2)
+    wl = WangLandau()
+    wl.set_model(model)
+    degs = wl.run(ensemble_size=ensemble_size, log_f_final=log_f_final, check_steps=100 if vectorized else 500,
+                  vectorized=vectorized, seed=2)
+    exact = exact_degeneracies(model, normalized=True)
+    assert np.sum(degs) == pytest.approx(1)
+    assert np.max(np.abs(np.log(degs / exact))) < tol
+
+
+def test_resume_from_checkpoint(tmp_path):
+    path = str(tmp_path / 'wl.npz')
+    wl = WangLandau()
+    wl.set_model(Necklace(8, 2))
+    wl.run(ensemble_size=10, check_steps=100, max_steps=300, vectorized=True, seed=1, checkpoint=path)
+    log_g = wl.log_g.copy()
+
+    resumed = WangLandau()
+    resumed.set_model(Necklace(8, 2))
+    resumed.load(path)
+    assert np.array_equal(resumed.log_g, log_g)
+    assert resumed.step == 300
+    resumed.run(ensemble_size=10, check_steps=100, max_steps=500, vectorized=True, seed=1, checkpoint=path,
+                resume=True)
+    assert resumed.step == 500
+    assert np.all(resumed.log_g >= log_g)
@@ -0,0 +1,276 @@
+import os
+import json
+import numpy as np
+
+
+class TraceRecorder:
+    """
+    A class for recording traces of a run (e.g. energy, temperature, acceptance rate per step) in chunks.
+    Every field is appended row by row into a buffer of chunk_size rows. Full buffers are kept in memory,
+    or written as .npy files into a directory if a path is given, so the memory use of a recorder on disk
+    does not grow with the length of the run. Recorded fields are read through lazily loaded TraceViews.
+    """
+
+    def __init__(self, path=None, chunk_size=2**16, walker_every=0):
+        """
+        Initializes an empty recorder
+        :param path: Directory for the chunks, if not set all chunks stay in memory
+        :param chunk_size: Number of rows per chunk
+        :param walker_every: Record the energies of all walkers every walker_every steps, 0 to not record them
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.walker_every = walker_every
+
+        # Buffer of the current chunk, number of rows in it, stored chunks and total length of every field
+        self.__buffers = {}
+        self.__fill = {}
+        self.__chunks = {}
+        self.__lengths = {}
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Opens the traces of a recorder that was written to disk
+        :param path: Directory of the chunks
+        :return: TraceRecorder with all fields of the directory
+        """
+        with open(os.path.join(path, 'index.json')) as f:
+            index = json.load(f)
+        rec = cls(path, index['chunk_size'], index['walker_every'])
+        for name, length in index['lengths'].items():
+            n_chunks = (length + rec.chunk_size - 1) // rec.chunk_size
+            rec.__chunks[name] = [rec.__chunk_file(name, i) for i in range(n_chunks)]
+            rec.__lengths[name] = length
+            rec.__fill[name] = 0
+        return rec
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Restores a recorder on disk from the result of get_state
+        :param state: Dictionary of get_state
+        :return: TraceRecorder that continues after the rows of the state
+        """
+        rec = cls(state['path'], state['chunk_size'], state['walker_every'])
+        for name, rows in state['buffers'].items():
+            rec.__create(name, rows[0] if len(rows) > 0 else np.empty(rows.shape[1:], dtype=rows.dtype))
+            length = state['lengths'][name]
+            rec.__chunks[name] = [rec.__chunk_file(name, i) for i in range(length // rec.chunk_size)]
+            rec.__buffers[name][:len(rows)] = rows
+            rec.__fill[name] = len(rows)
+            rec.__lengths[name] = length
+        return rec
+
+    def get_state(self):
+        """
+        Returns the state of a recorder on disk, e.g. for checkpoints. Stored chunks are only referenced by
+        the number of rows of every field, so the state does not grow with the length of the run.
+        :return: Dictionary with the settings, the number of rows and the rows of the partly filled chunks
+        """
+        if self.path is None:
+            raise ValueError('TraceRecorder: Only recorders on disk have a state, use spill first')
+        return {'path': self.path, 'chunk_size': self.chunk_size, 'walker_every': self.walker_every,
+                'lengths': dict(self.__lengths),
+                'buffers': {name: self.__buffers[name][:self.__fill[name]].copy() for name in self.__buffers}}
+
+    def spill(self, path):
+        """
+        Moves a recorder in memory to disk, all chunks stored so far are written as .npy files
+        :param path: Directory for the chunks
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        for name, chunks in self.__chunks.items():
+            for i, chunk in enumerate(chunks):
+                if not isinstance(chunk, str):
+                    chunks[i] = self.__chunk_file(name, i)
+                    np.save(chunks[i], chunk)
+
+    def record(self, **values):
+        """
+        Appends one row to each of the given fields
+        :param values: Values by field name, scalars or arrays of fixed shape
+        """
+        for name, value in values.items():
+            self.append(name, value)
+
+    def wants_walkers(self, step):
+        """
+        Checks if the energies of the walkers are recorded at a step
+        :param step: Step counter
+        :return: True if walker_every is set and the step is a multiple of it
+        """
+        return self.walker_every > 0 and step % self.walker_every == 0
+
+    def record_walkers(self, step, energies):
+        """
+        Records the energies of all walkers if the step is a multiple of walker_every
+        :param step: Step counter
+        :param energies: Energies of all walkers
+        """
+        if self.wants_walkers(step):
+            self.append('walker_step', step)
+            self.append('walker_energies', energies)
+
+    def append(self, name, value):
+        """
+        Appends one row to a field
+        :param name: Name of the field
+        :param value: Scalar or array of fixed shape
+        """
+        if name not in self.__buffers:
+            self.__create(name, np.asarray(value))
+        fill = self.__fill[name]
+        self.__buffers[name][fill] = value
+        self.__fill[name] = fill + 1
+        self.__lengths[name] += 1
+        if fill + 1 == self.chunk_size:
+            self.__store(name)
+
+    def extend(self, name, values):
+        """
+        Appends several rows to a field
+        :param name: Name of the field
+        :param values: Array of rows
+        """
+        values = np.asarray(values)
+        if len(values) == 0:
+            return
+        if name not in self.__buffers:
+            self.__create(name, values[0])
+        pos = 0
+        while pos < len(values):
+            fill = self.__fill[name]
+            n = min(self.chunk_size - fill, len(values) - pos)
+            self.__buffers[name][fill:fill + n] = values[pos:pos + n]
+            self.__fill[name] = fill + n
+            self.__lengths[name] += n
+            pos += n
+            if fill + n == self.chunk_size:
+                self.__store(name)
+
+    def flush(self):
+        """
+        Writes the partly filled chunks and the index to disk. Does nothing for a recorder in memory.
+        """
+        if self.path is None:
+            return
+        for name in self.__buffers:
+            if self.__fill[name] > 0:
+                np.save(self.__chunk_file(name, len(self.__chunks[name])), self.__buffers[name][:self.__fill[name]])
+        index = {'chunk_size': self.chunk_size, 'walker_every': self.walker_every, 'lengths': self.__lengths}
+        with open(os.path.join(self.path, 'index.json'), 'w') as f:
+            json.dump(index, f)
+
+    def fields(self):
+        """
+        Returns the names of all recorded fields
+        :return: List of names
+        """
+        return list(self.__lengths)
+
+    def length(self, name):
+        """
+        Returns the number of rows of a field
+        :param name: Name of the field
+        :return: Number of rows
+        """
+        return self.__lengths.get(name, 0)
+
+    def get(self, name):
+        """
+        Returns a lazily loaded view of a field
+        :param name: Name of the field
+        :return: TraceView, empty if nothing was recorded for the field
+        """
+        return TraceView(self, name)
+
+    def _rows(self, name, start, stop):
+        """
+        Loads the rows start:stop of a field
+        :return: Array of rows
+        """
+        parts = []
+        stored = len(self.__chunks[name])
+        for c in range(start // self.chunk_size, (stop - 1) // self.chunk_size + 1):
+            lo = max(start - c * self.chunk_size, 0)
+            hi = min(stop - c * self.chunk_size, self.chunk_size)
+            if c < stored:
+                chunk = self.__chunks[name][c]
+                if isinstance(chunk, str):
+                    chunk = np.load(chunk, mmap_mode='r')
+            else:
+                chunk = self.__buffers[name]
+            parts.append(np.asarray(chunk[lo:hi]))
+        return np.concatenate(parts)
+
+    def __create(self, name, first):
+        self.__buffers[name] = np.empty((self.chunk_size,) + first.shape, dtype=first.dtype)
+        self.__fill[name] = 0
+        self.__chunks[name] = []
+        self.__lengths[name] = 0
+
+    def __store(self, name):
+        """
+        Moves the full buffer of a field to the stored chunks
+        """
+        buffer = self.__buffers[name]
+        if self.path is None:
+            self.__chunks[name].append(buffer)
+            self.__buffers[name] = np.empty_like(buffer)
+        else:
+            file = self.__chunk_file(name, len(self.__chunks[name]))
+            np.save(file, buffer)
+            self.__chunks[name].append(file)
+        self.__fill[name] = 0
+
+    def __chunk_file(self, name, i):
+        return os.path.join(self.path, name + '_' + str(i).zfill(5) + '.npy')
+
+
+class TraceView:
+    """
+    A read only view of a recorded field, rows are only loaded when they are indexed
+    """
+
+    def __init__(self, recorder, name):
+        self.__recorder = recorder
+        self.name = name
+
+    def __len__(self):
+        return self.__recorder.length(self.name)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, stride = key.indices(len(self))
+            if stride < 0:
+                return self[:][key]
+            if stop <= start:
+                return np.empty(0)
+            return self.__recorder._rows(self.name, start, stop)[::stride]
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError('TraceView: Index out of range')
+        return self.__recorder._rows(self.name, key, key + 1)[0]
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self[:]
+        return arr if dtype is None else arr.astype(dtype)
+
+    def downsample(self, every):
+        """
+        Returns every n-th row, loading one chunk at a time
+        :param every: Distance of the returned rows
+        :return: Array of rows
+        """
+        size = self.__recorder.chunk_size
+        parts = []
+        for start in range(0, len(self), size):
+            first = (-start) % every
+            parts.append(self[start:min(start + size, len(self))][first::every])
+        return np.concatenate(parts)
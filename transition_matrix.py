@@ -0,0 +1,186 @@
+import sys
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import eigsh, ArpackError
+
+
+class TransitionEstimator:
+    """
+    A class for counting transitions between lumped states in a sparse matrix and estimating the
+    stationary distribution and the second largest eigenvalue of the resulting transition matrix.
+    Estimates are warm started from the previous ones and only refreshed when enough new
+    transitions have been counted.
+    """
+
+    def __init__(self, dims, refresh_transitions=0, tol=10**-8, max_iter=10000, dense_states=200):
+        """
+        Initializes an empty estimator
+        :param dims: Number of lumped states
+        :param refresh_transitions: Number of new transitions needed before the estimates are refreshed
+        :param tol: Tolerance (1-norm) of the stationary distribution
+        :param max_iter: Maximum number of power iterations per refresh
+        :param dense_states: Maximum number of visited states for which the eigenvalues are computed densely
+        """
+        if max_iter < 1:
+            sys.exit('TransitionEstimator: At least one power iteration is needed, max_iter has to be positive')
+        self.dims = dims
+        self.refresh_transitions = refresh_transitions
+        self.tol = tol
+        self.max_iter = max_iter
+        self.dense_states = dense_states
+
+        # Counted transitions, column is the old state and row the new one
+        self.__counts = sp.csr_matrix((dims, dims), dtype=np.int64)
+        self.__new_states = []
+        self.__cur_states = []
+        self.__num_new = 0
+        # Transitions from or into the overflow bin (index dims), which are not counted in the matrix
+        self.overflow = 0
+
+        # Estimates of the last refresh
+        self.__pi = np.full(dims, 1 / dims)
+        self.__v0 = None
+        self.__lambda2 = 0
+        self.__refreshed = False
+
+        # Profiler timing the phases of estimate, if set
+        self.profiler = None
+
+    def add(self, new_state, cur_state):
+        """
+        Counts transitions from cur_state to new_state
+        :param new_state: Index or array of indices of the new states
+        :param cur_state: Index or array of indices of the old states, index dims is the overflow bin
+        """
+        self.__new_states.append(new_state)
+        self.__cur_states.append(cur_state)
+        self.__num_new += np.size(new_state)
+
+    def add_counts(self, counts):
+        """
+        Adds a matrix of transition counts
+        :param counts: Dense or sparse matrix of counts
+        """
+        counts = sp.csr_matrix(counts, dtype=np.int64)
+        self.__flush()
+        self.__counts = self.__counts + counts
+        self.__num_new += counts.sum()
+
+    def get_counts(self):
+        """
+        Returns the counted transitions
+        :return: Sparse matrix of transition counts
+        """
+        self.__flush()
+        return self.__counts
+
+    def get_probabilities(self):
+        """
+        Returns the transition matrix, where each column of the counts is normalized
+        :return: Sparse column stochastic matrix, columns of states never left are zero
+        """
+        counts = self.get_counts().tocsc().astype(float)
+        col_sums = np.asarray(counts.sum(axis=0)).ravel()
+        scale = np.zeros(self.dims)
+        scale[col_sums > 0] = 1 / col_sums[col_sums > 0]
+        return (counts @ sp.diags(scale)).tocsr()
+
+    def estimate(self):
+        """
+        Estimates the stationary distribution and the second largest eigenvalue of the transition matrix.
+        :return: Stationary distribution, second largest eigenvalue
+        """
+        if self.__refreshed and self.__num_new < self.refresh_transitions:
+            return self.__pi, self.__lambda2
+        self.__num_new = 0
+        self.__refreshed = True
+
+        prof = self.profiler
+        if prof is not None:
+            t = prof.clock()
+        P = self.get_probabilities()
+        if prof is not None:
+            t = prof.add('q_normalize', t)
+
+        # Power iteration on the lazy chain, which has the same stationary distribution
+        pi = self.__pi
+        iterations = 0
+        for i in range(self.max_iter):
+            iterations += 1
+            pi_new = 0.5 * (pi + P @ pi)
+            total = pi_new.sum()
+            if total == 0:
+                break
+            pi_new /= total
+            converged = np.sum(np.abs(pi_new - pi)) < self.tol
+            pi = pi_new
+            if converged:
+                break
+        self.__pi = pi
+        if prof is not None:
+            t = prof.add('power_iteration', t)
+            prof.count('power_iterations', iterations)
+
+        # Symmetrize with the stationary distribution on all visited states
+        active = np.flatnonzero(pi > 0)
+        if len(active) < 2:
+            self.__lambda2 = 0
+            return self.__pi, self.__lambda2
+        sq = np.sqrt(pi[active])
+        S = sp.diags(1 / sq) @ P[active][:, active] @ sp.diags(sq)
+        S = 0.5 * (S + S.T)
+
+        if len(active) < 3:
+            self.__lambda2 = np.linalg.eigvalsh(S.toarray())[-2]
+            return self.__pi, self.__lambda2
+
+        # ARPACK restarts from its own random vector, whose seed persists in the process, if the Krylov space
+        # becomes invariant. This happens for few visited states and for decomposable chains, which have a
+        # degenerate eigenvalue 1, and makes the eigenvectors and the next warm start depend on earlier calls.
+        # Few states are solved densely, which is reproducible.
+        if len(active) <= self.dense_states:
+            vals, vecs = self.__eigh_dense(S)
+        else:
+            # Fixed start vector keeps the estimate reproducible
+            v0 = np.ones(len(active))
+            if self.__v0 is not None and np.any(self.__v0[active] != 0):
+                v0 = self.__v0[active]
+            try:
+                vals, vecs = eigsh(S, 2, which='LA', v0=v0)
+            except ArpackError:
+                # ARPACK fails on some nearly decomposable chains
+                vals, vecs = self.__eigh_dense(S)
+        if prof is not None:
+            prof.add('eigsh', t)
+        self.__v0 = np.zeros(self.dims)
+        self.__v0[active] = vecs.sum(axis=1)
+        self.__lambda2 = np.min(vals)
+        return self.__pi, self.__lambda2
+
+    @staticmethod
+    def __eigh_dense(S):
+        """
+        Computes the two largest eigenvalues of a symmetric matrix densely
+        :param S: Sparse symmetric matrix
+        :return: Two largest eigenvalues, their eigenvectors
+        """
+        vals, vecs = np.linalg.eigh(S.toarray())
+        return vals[-2:], vecs[:, -2:]
+
+    def __flush(self):
+        """
+        Moves buffered transitions into the sparse count matrix
+        """
+        if len(self.__new_states) == 0:
+            return
+        rows = np.concatenate([np.atleast_1d(x) for x in self.__new_states])
+        cols = np.concatenate([np.atleast_1d(x) for x in self.__cur_states])
+        self.__new_states = []
+        self.__cur_states = []
+        valid = (rows < self.dims) & (cols < self.dims)
+        if not np.all(valid):
+            self.overflow += int(np.count_nonzero(~valid))
+            rows = rows[valid]
+            cols = cols[valid]
+        new = sp.coo_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(self.dims, self.dims))
+        self.__counts = self.__counts + new.tocsr()
@@ -0,0 +1,166 @@
+import os
+import sys
+import numpy as np
+from necklace_model import Necklace
+from necklace_ensemble import NecklaceEnsemble
+from rng import spawn_streams
+
+
+class WangLandau:
+    """
+    A class for estimating the density of states of a necklace model with the Wang-Landau
+    flat-histogram method on the lumped energy bins (Necklace.get_lumped_index).
+    Several walkers update one shared estimate of log g.
+    """
+
+    def __init__(self):
+        self.__model = Necklace(2,2)
+        self.log_g = np.zeros(0)
+        self.hist = np.zeros(0)
+        self.log_f = 1.
+        self.step = 0
+
+    def set_model(self, model):
+        self.__model = model
+
+    def run(self,ensemble_size=1,log_f=1.,log_f_final=10**-6,flatness=0.8,check_steps=1000,max_steps=10**7,
+            vectorized=False,seed=None,checkpoint=None,resume=False):
+        """
+        Runs the Wang-Landau sampling until log_f is below log_f_final
+        :param ensemble_size: Number of walkers
+        :param log_f: Initial logarithm of the modification factor
+        :param log_f_final: Final logarithm of the modification factor
+        :param flatness: Histogram is flat if every visited bin has at least flatness times the mean count
+        :param check_steps: Number of steps between two flatness checks
+        :param max_steps: Maximum number of steps of every walker
+        :param vectorized: Run all walkers at once with a NecklaceEnsemble
+        :param seed: Seed for the random streams of the walkers
+        :param checkpoint: Path of a .npz file, log g is saved there at every flatness check
+        :param resume: Continue from the checkpoint file if it exists
+        :return: Normalized degeneracies aligned with model.allEnergies
+        """
+        dims = self.__model.dims_lumped
+        self.log_g = np.zeros(dims)
+        self.hist = np.zeros(dims)
+        self.log_f = log_f
+        self.step = 0
+        if resume and checkpoint is not None and os.path.exists(checkpoint):
+            self.load(checkpoint)
+
+        # Create walkers with random initial states
+        if vectorized:
+            walkers = NecklaceEnsemble(self.__model,ensemble_size,rng=np.random.default_rng(seed))
+            bins = walkers.get_lumped_indices()
+        else:
+            walkers = []
+            streams = spawn_streams(seed,ensemble_size) if seed is not None else None
+            for k in range(ensemble_size):
+                nkl = self.__model.get_copy()
+                if streams is not None:
+                    nkl.set_rng(streams[k])
+                nkl.shuffle_state()
+                walkers.append(nkl)
+            bins = np.array([nkl.get_lumped_index() for nkl in walkers])
+
+        while self.log_f > log_f_final and self.step < max_steps:
+            for i in range(check_steps):
+                if vectorized:
+                    bins = self.__step_vectorized(walkers,bins)
+                else:
+                    bins = self.__step_walkers(walkers,bins)
+            self.step += check_steps
+
+            # Reduce the modification factor once the histogram of the visited bins is flat
+            visited = self.hist > 0
+            if np.min(self.hist[visited]) >= flatness * np.mean(self.hist[visited]):
+                self.log_f /= 2
+                self.hist[:] = 0
+
+            if checkpoint is not None:
+                self.save(checkpoint)
+
+        return self.get_degeneracies()
+
+    def __step_walkers(self,walkers,bins):
+        """
+        Performs one Wang-Landau step for each necklace
+        :param walkers: List of necklaces
+        :param bins: Current lumped indices of the walkers
+        :return: New lumped indices of the walkers
+        """
+        for k,nkl in enumerate(walkers):
+            nkl.pair_exchange_random()
+            new_bin = nkl.get_lumped_index()
+            # States in the overflow bin are never accepted
+            if new_bin < len(self.log_g) and nkl._rng.random() < np.exp(min(self.log_g[bins[k]] - self.log_g[new_bin],0)):
+                bins[k] = new_bin
+            else:
+                nkl.undo_random_exchange()
+            self.log_g[bins[k]] += self.log_f
+            self.hist[bins[k]] += 1
+        return bins
+
+    def __step_vectorized(self,walkers,bins):
+        """
+        Performs one Wang-Landau step for all walkers of a NecklaceEnsemble
+        :param walkers: NecklaceEnsemble
+        :param bins: Current lumped indices of the walkers
+        :return: New lumped indices of the walkers
+        """
+        walkers.pair_exchange_random()
+        e_new = walkers.get_energies()
+        new_bins = walkers.get_lumped_indices(e_new)
+        # States in the overflow bin are never accepted
+        inside = new_bins < len(self.log_g)
+        new_bins = np.where(inside,new_bins,bins)
+        accept = walkers.rng.random(len(bins)) < np.exp(np.minimum(self.log_g[bins] - self.log_g[new_bins],0))
+        accept &= inside
+        walkers.undo_random_exchange(~accept)
+        walkers.energies = np.where(accept,e_new,walkers.energies)
+        bins = np.where(accept,new_bins,bins)
+        np.add.at(self.log_g,bins,self.log_f)
+        np.add.at(self.hist,bins,1)
+        return bins
+
+    def get_degeneracies(self):
+        """
+        Returns the estimated degeneracies, normalized to sum one over the visited bins
+        :return: Degeneracies aligned with model.allEnergies
+        """
+        log_g = np.where(self.log_g > 0,self.log_g,-np.inf)
+        if np.all(np.isinf(log_g)):
+            return np.zeros(len(log_g))
+        g = np.exp(log_g - np.max(log_g))
+        return g / np.sum(g)
+
+    def save(self,path):
+        """
+        Saves log g, the histogram, the modification factor and the step counter
+        :param path: Path of the .npz file
+        """
+        tmp = path + '.tmp.npz'
+        np.savez(tmp,log_g=self.log_g,hist=self.hist,log_f=self.log_f,step=self.step)
+        os.replace(tmp,path)
+
+    def load(self,path):
+        """
+        Loads a state saved with save()
+        :param path: Path of the .npz file
+        """
+        data = np.load(path)
+        if len(data['log_g']) != self.__model.dims_lumped:
+            sys.exit('WangLandau: Checkpoint does not match the number of lumped states of the model')
+        self.log_g = data['log_g']
+        self.hist = data['hist']
+        self.log_f = float(data['log_f'])
+        self.step = int(data['step'])
+
+
+if __name__ == '__main__':
+    from density_of_states import exact_degeneracies
+    nkl = Necklace(20,2)
+    wl = WangLandau()
+    wl.set_model(nkl)
+    degs = wl.run(ensemble_size=100,log_f_final=10**-4,vectorized=True,seed=1)
+    print(np.round(degs,5))
+    print(np.round(exact_degeneracies(nkl,normalized=True),5))